@@ -0,0 +1,48 @@
+# app/clients/llm_callbacks.py
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from app.services.tracing import record_llm_call
+
+
+class UsageCallback(BaseCallbackHandler):
+    """
+    Times every chat model call and reports its token usage to the tracing layer. Handlers run
+    in the calling thread, so the usage lands on the graph node span that made the call.
+    """
+    def __init__(self):
+        self._started: dict = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        seconds = time.perf_counter() - started if started is not None else 0.0
+        output = response.llm_output or {}
+        usage = output.get("token_usage") or _usage_metadata(response)
+        model = output.get("model_name") or "unknown"
+        record_llm_call(model, seconds, usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is not None:
+            record_llm_call("error", time.perf_counter() - started)
+
+
+def _usage_metadata(response) -> dict:
+    # Streamed calls carry usage on the message instead of llm_output
+    generations = response.generations[0] if response.generations else []
+    message = getattr(generations[0], "message", None) if generations else None
+    meta = getattr(message, "usage_metadata", None) or {}
+    return {"prompt_tokens": meta.get("input_tokens", 0), "completion_tokens": meta.get("output_tokens", 0)}
+
+usage_callback = UsageCallback()
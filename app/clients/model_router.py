@@ -0,0 +1,80 @@
+# app/clients/model_router.py
+from typing import Any, Callable, Optional
+from app.config import MODEL_ROUTING_ENABLED
+from app.services.metrics import metrics
+from app.services.tracing import annotate
+from app.services.resilience import DeadlineExceeded
+from app.services.output_parsing import StructuredOutput
+
+metrics.describe("assistant_model_calls_total", "counter", "Routed model calls by route and tier (small/large)")
+metrics.describe("assistant_model_escalations_total", "counter", "Small-model results rejected and re-asked on the large model")
+
+def record_route(route: str, tier: str, reason: Optional[str] = None) -> None:
+    """Counts one routed model call; reason is set when it re-asks the large model after a rejected small call"""
+    metrics.inc("assistant_model_calls_total", route=route, tier=tier)
+    annotate(**{f"{route}_model": tier})
+    if reason:
+        metrics.inc("assistant_model_escalations_total", route=route, reason=reason)
+        annotate(**{f"{route}_escalation": reason})
+
+
+class ModelRouter:
+    """
+    Sends a call to the small model first and re-asks the large one when `check` rejects the result
+    or the small call raises (e.g. structured output that could not be repaired locally). With routing off, or
+    small_first=False, the call goes to the `default` tier the node used before routing existed.
+    """
+    def __init__(self, route: str, small=None, large=None, default: str = "large"):
+        self.route = route
+        self.small = small
+        self.large = large
+        self.default = default
+        self._structured: dict = {}
+
+    def _runnable(self, tier: str, schema):
+        client = self.small if tier == "small" else self.large
+        if schema is None:
+            return client
+        key = (tier, schema)
+        if key not in self._structured:
+            self._structured[key] = StructuredOutput(client, schema)
+        return self._structured[key]
+
+    def tier(self, small_first: bool = True) -> str:
+        """Tier a call starts on"""
+        if self.small is None:
+            return "large"
+        if self.large is None or (MODEL_ROUTING_ENABLED and small_first):
+            return "small"
+        return self.default
+
+    def invoke(self, messages, check: Optional[Callable[[Any], Optional[str]]] = None, schema=None,
+               small_first: bool = True, escalation: Optional[str] = None):
+        """
+        check(result) returns None to accept the result, or a short reason label to escalate.
+        `escalation` marks a call re-made on the large model because a later step rejected the
+        small model's output (e.g. generated code that failed to run). Errors from the large
+        model propagate to the caller.
+        """
+        if escalation and self.large is not None:
+            record_route(self.route, "large", escalation)
+            return self._runnable("large", schema).invoke(messages)
+        tier = self.tier(small_first)
+        if tier == "large" or self.large is None or not MODEL_ROUTING_ENABLED:
+            record_route(self.route, tier)
+            return self._runnable(tier, schema).invoke(messages)
+
+        try:
+            result = self._runnable("small", schema).invoke(messages)
+            reason = check(result) if check else None
+        except DeadlineExceeded:
+            raise   # no time left for the large model either
+        except Exception as e:
+            print(f"{self.route}: small model failed ({type(e).__name__}: {e})")
+            result, reason = None, "error"
+        record_route(self.route, "small")
+        if reason is None:
+            return result
+        print(f"{self.route}: escalating to the large model ({reason})")
+        record_route(self.route, "large", reason)
+        return self._runnable("large", schema).invoke(messages)
@@ -1,6 +1,96 @@
 # app/clients/openAI_client.py
-from app.config import OPENAI_API_KEY
-from langchain_openai import ChatOpenAI
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING
+import httpx
+from app.config import (
+    OPENAI_API_KEY, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, OPENAI_KEEPALIVE_SECONDS,
+    OPENAI_TIMEOUT_SECONDS, OPENAI_CONNECT_TIMEOUT_SECONDS, OPENAI_MAX_RETRIES,
+)
 
-def get_client(api_key: str = OPENAI_API_KEY, model: str = "gpt-4o", temperature: float = 0.3):
-    return ChatOpenAI(model=model, api_key=api_key, temperature=temperature)
\ No newline at end of file
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
+    from langchain_openai import ChatOpenAI
+
+_lock = threading.Lock()
+_chat_clients: dict[tuple, "ChatOpenAI"] = {}
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_SECONDS,
+    )
+
+def _timeout() -> httpx.Timeout:
+    # No longer than the resilience layer waits for an attempt: an abandoned call then ends
+    # (and frees its worker) when its attempt does
+    from app.services.resilience import policy
+    read = min(OPENAI_TIMEOUT_SECONDS, policy("openai").timeout_seconds)
+    return httpx.Timeout(read, connect=min(OPENAI_CONNECT_TIMEOUT_SECONDS, read))
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide keep-alive connection pool for every sync OpenAI call
+    """
+    return httpx.Client(limits=_limits(), timeout=_timeout())
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Process-wide keep-alive connection pool for every async OpenAI call
+    """
+    return httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+
+@lru_cache(maxsize=None)
+def get_openai_client(api_key: str = OPENAI_API_KEY) -> "OpenAI":
+    """
+    Shared OpenAI SDK client (embeddings, moderation) on the pooled HTTP client
+    """
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, http_client=get_http_client(), max_retries=OPENAI_MAX_RETRIES)
+
+@lru_cache(maxsize=None)
+def get_async_openai_client(api_key: str = OPENAI_API_KEY) -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=api_key, http_client=get_async_http_client(), max_retries=OPENAI_MAX_RETRIES)
+
+def get_client(api_key: str = OPENAI_API_KEY, model: str = "gpt-4o", temperature: float = 0.3) -> "ChatOpenAI":
+    """
+    Returns the shared ChatOpenAI for (model, temperature). All chat clients reuse the same
+    sync/async connection pools, so TLS handshakes only happen when a pool opens a new connection.
+    """
+    key = (api_key, model, float(temperature))
+    client = _chat_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _chat_clients.get(key)
+            if client is None:
+                from langchain_openai import ChatOpenAI
+                from app.clients.llm_callbacks import usage_callback
+                client = ChatOpenAI(
+                    model=model,
+                    api_key=api_key,
+                    temperature=temperature,
+                    timeout=_timeout(),
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=get_http_client(),
+                    http_async_client=get_async_http_client(),
+                    callbacks=[usage_callback],
+                )
+                _chat_clients[key] = client
+    return client
+
+def close_clients() -> None:
+    """
+    Closes the shared sync pool and forgets cached clients (called on shutdown)
+    """
+    with _lock:
+        _chat_clients.clear()
+    if get_http_client.cache_info().currsize:
+        get_http_client().close()
+    get_http_client.cache_clear()
+    get_async_http_client.cache_clear()
+    get_openai_client.cache_clear()
+    get_async_openai_client.cache_clear()
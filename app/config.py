@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -6,14 +7,36 @@ from pathlib import Path
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Shared OpenAI HTTP pools (app/clients/openAI_client.py)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "60"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENV = os.getenv("PINECONE_ENV")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX")
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "test")
+# Shared namespace, always searched; "" is Pinecone's default namespace, where documents were always indexed
+PINECONE_SHARED_NAMESPACE = os.getenv("PINECONE_SHARED_NAMESPACE", "")
+# Namespace routing (app/services/namespaces.py), active only once PINECONE_TEAM_NAMESPACES is set: each
+# project is then indexed into its own namespace and a request searches the shared namespace plus those
+# mapped to the user's department (the users table the frontend writes at signup). Without a mapping everything stays in the shared one
+PINECONE_NAMESPACE_ROUTING = os.getenv("PINECONE_NAMESPACE_ROUTING", "true").lower() == "true"
+PINECONE_TEAM_NAMESPACES = json.loads(os.getenv("PINECONE_TEAM_NAMESPACES", "{}"))  # {"<department>" | "*": ["<namespace>", ...]}
+PINECONE_QUERY_WORKERS = int(os.getenv("PINECONE_QUERY_WORKERS", "8"))
+USERS_TABLE = os.getenv("USERS_TABLE", "users")  # holds each user's department (id, department, ...)
+NAMESPACE_LOOKUP_TTL_SECONDS = int(os.getenv("NAMESPACE_LOOKUP_TTL_SECONDS", "300"))
 
 
 # Excel Config
 EXCEL_PATH = Path(os.getenv("EXCEL_PATH"))
+# Arrow IPC copy of the RFI log that every process memory-maps read-only
+EXCEL_ARROW_PATH = Path(os.getenv("EXCEL_ARROW_PATH", str(EXCEL_PATH.with_suffix(".arrow"))))
+# By default text columns stay in the shared mapping and only numeric/date columns are copied to NumPy;
+# true keeps every column as pd.ArrowDtype, which breaks common generated code such as .dt.to_period
+# and date differences (python -m benchmarks.memory_bench compares the two)
+EXCEL_ZERO_COPY = os.getenv("EXCEL_ZERO_COPY", "false").lower() == "true"
 REMOVE_COLS = [
     "Total Days",
     "Priority",
@@ -32,6 +55,98 @@ SHEET_NAME = "RFIs"
 HEADER_ROW = 11 #5
 USECOLS = "A:N"
 
+# Generated code cache
+CODE_CACHE_MAX_ENTRIES = int(os.getenv("CODE_CACHE_MAX_ENTRIES", "256"))
+CODE_CACHE_TTL_SECONDS = int(os.getenv("CODE_CACHE_TTL_SECONDS", "86400"))
+
+# Generated code execution: "subprocess" (sandboxed worker pool) or "inprocess"
+EXECUTOR_MODE = os.getenv("EXECUTOR_MODE", "subprocess")
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", "2"))
+EXECUTOR_TIMEOUT_SECONDS = int(os.getenv("EXECUTOR_TIMEOUT_SECONDS", "120"))
+EXECUTOR_CPU_SECONDS = int(os.getenv("EXECUTOR_CPU_SECONDS", "60"))
+EXECUTOR_MEMORY_MB = int(os.getenv("EXECUTOR_MEMORY_MB", "4096"))
+
+# Plot rendering and transport
+PLOT_FORMAT = os.getenv("PLOT_FORMAT", "webp")        # png | webp | svg
+PLOT_DPI = int(os.getenv("PLOT_DPI", "100"))
+# "url" serves plots from this instance's local disk: with several instances behind one host, share
+# PLOT_STORE_DIR between them or set PLOT_TRANSPORT=inline
+PLOT_TRANSPORT = os.getenv("PLOT_TRANSPORT", "url")   # url (served from /plots) | inline (base64 data URLs)
+PLOT_STORE_DIR = Path(os.getenv("PLOT_STORE_DIR", "./plot_store"))
+PLOT_STORE_MAX_MB = int(os.getenv("PLOT_STORE_MAX_MB", "512"))
+PLOT_STORE_MAX_AGE_SECONDS = int(os.getenv("PLOT_STORE_MAX_AGE_SECONDS", str(7 * 86400)))
+
+# RFI folder reading
+EXTRACTION_CACHE_MAX_FILES = int(os.getenv("EXTRACTION_CACHE_MAX_FILES", "512"))
+RFI_READ_WORKERS = int(os.getenv("RFI_READ_WORKERS", "8"))
+RFI_MAX_FILES_PER_FOLDER = int(os.getenv("RFI_MAX_FILES_PER_FOLDER", "25"))
+RFI_MAX_FOLDERS = int(os.getenv("RFI_MAX_FOLDERS", "20"))  # Top matched RFIs whose chunks/folders are searched (an unfiltered list matches ~2000)
+RFI_CONTEXT_MAX_TOKENS = int(os.getenv("RFI_CONTEXT_MAX_TOKENS", "6000"))
+RFI_VECTOR_TOP_K = int(os.getenv("RFI_VECTOR_TOP_K", "10"))
+RFI_READ_FOLDERS = os.getenv("RFI_READ_FOLDERS", "fallback")  # Read RFI folders from the network drive: fallback (only when vector search finds nothing) | always | never
+
+# Guardrail verdict caches: "memory" (per process) or "sqlite" (shared by all workers on the host)
+GUARD_CACHE_MAX_ENTRIES = int(os.getenv("GUARD_CACHE_MAX_ENTRIES", "1024"))
+GUARD_CACHE_TTL_SECONDS = int(os.getenv("GUARD_CACHE_TTL_SECONDS", "3600"))
+GUARD_CACHE_BACKEND = os.getenv("GUARD_CACHE_BACKEND", "sqlite")
+GUARD_CACHE_PATH = Path(os.getenv("GUARD_CACHE_PATH", "./cache/guardrails.sqlite3"))
+
+# Prompt token budget for generate_answer
+GENERATE_MAX_PROMPT_TOKENS = int(os.getenv("GENERATE_MAX_PROMPT_TOKENS", "16000"))
+GENERATE_SUMMARY_MAX_TOKENS = int(os.getenv("GENERATE_SUMMARY_MAX_TOKENS", "800"))
+GENERATE_HISTORY_MAX_TOKENS = int(os.getenv("GENERATE_HISTORY_MAX_TOKENS", "1500"))
+
+# Write-behind cache for the Supabase threads table
+THREAD_CACHE_MAX_THREADS = int(os.getenv("THREAD_CACHE_MAX_THREADS", "1000"))
+THREAD_CACHE_TTL_SECONDS = float(os.getenv("THREAD_CACHE_TTL_SECONDS", "5"))  # Other workers write the same threads: trust a cached row only briefly
+THREAD_FLUSH_INTERVAL_SECONDS = float(os.getenv("THREAD_FLUSH_INTERVAL_SECONDS", "0.5"))
+THREAD_SPOOL_DIR = Path(os.getenv("THREAD_SPOOL_DIR", "./cache/thread_spool"))
+
+# Batched message inserts and listing page sizes (app/routes/chat.py)
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "50"))
+MESSAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("MESSAGE_FLUSH_INTERVAL_SECONDS", "0.2"))
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Semantic answer cache for the document (Pinecone) path
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+
+# Model routing (app/clients/model_router.py): simple calls go to the small model first and are re-asked
+# on the large one when a validation check fails (parse error, missing citations, code execution error)
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+MODEL_SMALL = os.getenv("MODEL_SMALL", "gpt-4o-mini")
+MODEL_LARGE = os.getenv("MODEL_LARGE", "gpt-4o")
+MODEL_SMALL_FIRST_CLASSES = [c.strip() for c in os.getenv("MODEL_SMALL_FIRST_CLASSES", "general,rfi_lookup").split(",") if c.strip()]
+MODEL_SMALL_MAX_CONTEXT_TOKENS = int(os.getenv("MODEL_SMALL_MAX_CONTEXT_TOKENS", "4000"))
+
+# Single-flight coalescing (app/graph/nodes/coalesce.py): concurrent requests with the same rewritten query,
+# class, namespaces and data version wait for one execution instead of each running the graph
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+COALESCE_WAIT_SECONDS = float(os.getenv("COALESCE_WAIT_SECONDS", "120"))
+
+# Resilience (app/services/resilience.py): per-dependency deadline, jittered retries, hedged idempotent reads
+# and a circuit breaker around every OpenAI, embedding, Pinecone and Supabase call
+RESILIENCE_ENABLED = os.getenv("RESILIENCE_ENABLED", "true").lower() == "true"
+# OpenAI SDK-level retries: none while the resilience layer retries (they would multiply), the SDK's default of 2 without it
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0" if RESILIENCE_ENABLED else "2"))
+RESILIENCE_WORKERS = int(os.getenv("RESILIENCE_WORKERS", "64"))
+RESILIENCE_POLICIES = json.loads(os.getenv("RESILIENCE_POLICIES", "{}"))  # {"pinecone": {"timeout_seconds": 3, "hedge_after_seconds": 0.3}, ...}
+
+# Request deadline (app/services/deadline.py): the API sets one budget per request in the graph config; nodes
+# shrink their work as it runs out and the API returns a best-effort answer once it has passed
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "45"))
+DEADLINE_GRACE_SECONDS = float(os.getenv("DEADLINE_GRACE_SECONDS", "3"))            # API waits this long past the deadline
+DEADLINE_TIGHT_SECONDS = float(os.getenv("DEADLINE_TIGHT_SECONDS", "15"))           # below: smaller top_k, small model, no folder reads
+DEADLINE_RERANK_MIN_SECONDS = float(os.getenv("DEADLINE_RERANK_MIN_SECONDS", "10")) # below: keep retrieval order instead of the LLM rerank
+DEADLINE_FORMAT_MIN_SECONDS = float(os.getenv("DEADLINE_FORMAT_MIN_SECONDS", "5"))  # below: return the raw code output unformatted
+DEADLINE_TOP_K = int(os.getenv("DEADLINE_TOP_K", "6"))
+
+# Request tracing (app/services/tracing.py): one JSON log line per request with node spans
+TRACE_LOG_ENABLED = os.getenv("TRACE_LOG_ENABLED", "true").lower() == "true"
+
 JSON_DESCRIPTION = {
   "RFI #": {
     "description": "Unique identifier for each Request for Information (RFI). Follow-up RFIs are denoted using a decimal format (e.g., 0016.1, 0016.2) to indicate continuation of the original RFI.",
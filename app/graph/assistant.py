@@ -1,117 +1,255 @@
 # app/graph/assistant.py
 
-from pathlib import Path
-from langgraph.graph import StateGraph
-from app.graph.state import AssistantState
-from app.graph.nodes.classify import classify_and_rewrite_query
-from app.graph.nodes.excel_insight import generate_code, execute_code
-from app.graph.nodes.rfi_lookup import match_rfis, rfi_combine_context
-from app.graph.nodes.generate import generate_answer
-from app.graph.nodes.respond import respond
-from app.services.excel_cache import get_excel_dataframe
-from app.config import EXCEL_PATH, REMOVE_COLS, RENAME_COLS, SHEET_NAME, HEADER_ROW, USECOLS
-from app.graph.nodes.rag import retrieve_pinecone, rerank_chunks
-from app.clients.openAI_client import get_client
-from app.graph.nodes.guardrails import check_query, check_query_llm
+import asyncio
+import threading
+import time
+from app.config import MODEL_SMALL, MODEL_LARGE, EXCEL_PATH, EXCEL_ARROW_PATH, EXCEL_ZERO_COPY, REMOVE_COLS, RENAME_COLS, SHEET_NAME, HEADER_ROW, USECOLS
+
+# The graph (Excel frame, LLM clients, Pinecone handle, executor pool) is built on first use
+# or by the API's background warm-up, so importing this module stays cheap.
+_graph = None
+_graph_lock = threading.Lock()
+_status = {"state": "cold", "error": None, "seconds": None}
 
 def _route_after_check(s):
+    from app.services.rfi_query import RFIQuery, is_supported
     print("Routing after check...")
-    return "error" if "error" in s else s.get("query_class", "general")
-
-# Load prerequisites
-try:
-    #print("Loading Excel file...")
-    #print(f"Excel path: {EXCEL_PATH}")
-    excel_df = get_excel_dataframe(parquet_path=EXCEL_PATH.with_suffix(".parquet"), excel_path=EXCEL_PATH, 
-    sheet_name=SHEET_NAME, header_row=HEADER_ROW, removeCols=REMOVE_COLS, renameCols=RENAME_COLS, usecols=USECOLS,verbose=False)
-except Exception as e:
-    print(f"Failed to load Excel file: {e}")
-    exit(1)
-
-classify_llm_client = get_client(model="gpt-4o-mini",temperature=0.2)
-base_llm_client = get_client(model="gpt-4o",temperature=0.7)
-codegen_llm_client = get_client(model="gpt-4o",temperature=0.3)
-fast_classifier = get_client(model="gpt-4o-mini", temperature=0)
-
-# Bind Excel nodes with LLM and df
-generate_code_node = generate_code(codegen_llm_client, excel_df)
-execute_code_node = execute_code(fast_classifier, excel_df)
-match_rfis_node = match_rfis(codegen_llm_client)
-rfi_combine_context_node = rfi_combine_context(codegen_llm_client)
-
-# Bind LLM client
-classify_and_refine_node = classify_and_rewrite_query(classify_llm_client)
-rerank_chunks_node = rerank_chunks(codegen_llm_client)
-#rewrite_query_node = rewrite_query(classify_llm_client)
-generate_answer_node = generate_answer(codegen_llm_client)
-retrieve_pinecone_node = retrieve_pinecone(codegen_llm_client)
-
-# Define LangGraph
-builder = StateGraph(AssistantState)
-
-# Add all nodes
-builder.add_node("check_query", check_query)
-builder.add_node("check_query_llm", check_query_llm)
-builder.add_node("classify_and_refine_query", classify_and_refine_node)
-builder.add_node("generate_code", generate_code_node)
-builder.add_node("execute_code", execute_code_node)
-builder.add_node("match_rfis", match_rfis_node)
-builder.add_node("rfi_combine_context", rfi_combine_context_node)
-builder.add_node("generate_answer", generate_answer_node)
-builder.add_node("respond", respond)
-builder.add_node("retrieve_pinecone", retrieve_pinecone_node)
-#builder.add_node("rewrite_query", rewrite_query_node)
-builder.add_node("rerank_chunks", rerank_chunks_node)
-
-# Define graph structure
-builder.set_entry_point("check_query")
-builder.add_conditional_edges(
-    "check_query", 
-    lambda state: "error" in state,{
-        True: "respond",
-        False: "classify_and_refine_query"
-    }
-)
-
-builder.add_edge("classify_and_refine_query", "check_query_llm")
-
-builder.add_conditional_edges(
-    "check_query_llm", 
-    _route_after_check,
-    {
-        "error": "respond",
-        "excel_insight": "generate_code",
-        "rfi_lookup": "generate_code",
-        "building_code_query": "retrieve_pinecone",
-        "general": "retrieve_pinecone"
-    }
-)
-
-builder.add_conditional_edges("retrieve_pinecone", lambda state: "error" in state,{
-        True: "respond",
-        False: "rerank_chunks"
-    }
-)
-
-# Excel path
-builder.add_edge("generate_code", "execute_code")
-
-builder.add_conditional_edges("execute_code", lambda state: state["query_class"], {
-        "excel_insight": "generate_answer",
-        "rfi_lookup": "match_rfis",
-    })
-
-# RFI path
-builder.add_edge("match_rfis", "rfi_combine_context")
-builder.add_edge("rfi_combine_context", "generate_answer")
-
-# General Path
-builder.add_edge("rerank_chunks", "generate_answer")
-
-builder.add_edge("generate_answer", "respond")
-
-# Final node
-builder.set_finish_point("respond")
-
-# Compile
-assistant_graph = builder.compile()
+    if "error" in s:
+        return "error"
+    query_class = s.get("query_class", "general")
+    structured = s.get("structured_query")
+    if structured and is_supported(RFIQuery(**structured), query_class, s.get("query_subclass")):
+        return "structured_query"
+    return query_class
+
+def _route_after_coalesce(s):
+    if s.get("coalesced"):
+        return "coalesced"
+    return _route_after_check(s)
+
+def _route_after_execute(s):
+    if "error" in s:
+        return "error"
+    # Small-model code that failed to run is regenerated once on the large model
+    if not s.get("executed") and s.get("codegen_escalation"):
+        return "retry"
+    return s["query_class"]
+
+def _route_after_structured_query(s):
+    if not s.get("structured_query"):
+        return "fallback"
+    return s["query_class"]
+
+def build_assistant_graph():
+    """
+    Loads the RFI log, binds the LLM clients and executor to the nodes and compiles the graph
+    """
+    from langgraph.graph import StateGraph
+    from langchain_core.runnables import RunnableLambda
+    from app.graph.state import AssistantState
+    from app.graph.nodes.classify import classify_and_rewrite_query
+    from app.graph.nodes.excel_insight import generate_code, execute_code, run_structured_query
+    from app.graph.nodes.rfi_lookup import match_rfis, rfi_combine_context
+    from app.graph.nodes.generate import generate_answer
+    from app.graph.nodes.respond import respond
+    from app.graph.nodes.answer_cache import lookup_cached_answer, cache_answer
+    from app.graph.nodes.coalesce import coalesce_request, acoalesce_request
+    from app.services.excel_cache import get_excel_dataframe
+    from app.services.code_executor import create_executor
+    from app.graph.nodes.rag import retrieve_pinecone, rerank_chunks
+    from app.clients.openAI_client import get_client
+    from app.services.resilience import ResilientModel
+    from app.graph.nodes.guardrails import check_query, check_query_llm
+    from app.services.tracing import traced_node
+
+    # Load prerequisites
+    try:
+        #print("Loading Excel file...")
+        #print(f"Excel path: {EXCEL_PATH}")
+        excel_df = get_excel_dataframe(parquet_path=EXCEL_PATH.with_suffix(".parquet"), excel_path=EXCEL_PATH, 
+        sheet_name=SHEET_NAME, header_row=HEADER_ROW, removeCols=REMOVE_COLS, renameCols=RENAME_COLS, usecols=USECOLS,verbose=False,
+        arrow_path=EXCEL_ARROW_PATH, zero_copy=EXCEL_ZERO_COPY)
+    except Exception as e:
+        print(f"Failed to load Excel file: {e}")
+        raise
+
+    # Every model call goes through the resilience layer (timeout, jittered retries, circuit breaker)
+    def llm(model: str, temperature: float):
+        return ResilientModel(get_client(model=model, temperature=temperature))
+
+    classify_llm_client = llm("gpt-4o-mini", 0.2)
+    base_llm_client = llm("gpt-4o", 0.7)
+    codegen_llm_client = llm("gpt-4o", 0.3)
+    fast_classifier = llm("gpt-4o-mini", 0)
+    # Small-first routing (app/clients/model_router.py): small models tried first, the ones above on escalation
+    codegen_small_client = llm(MODEL_SMALL, 0.3)
+    formatter_large_client = llm(MODEL_LARGE, 0)
+
+    # Sandboxed executor for generated code
+    code_executor = create_executor(excel_df, frame_path=EXCEL_ARROW_PATH)
+
+    # Bind Excel nodes with LLM and df
+    structured_query_node = run_structured_query(excel_df)
+    generate_code_node = generate_code(codegen_llm_client, excel_df, small_client=codegen_small_client)
+    execute_code_node = execute_code(fast_classifier, code_executor, large_client=formatter_large_client)
+    match_rfis_node = match_rfis(codegen_llm_client)
+    rfi_combine_context_node = rfi_combine_context(codegen_llm_client)
+
+    # Bind LLM client
+    classify_and_refine_node = classify_and_rewrite_query(classify_llm_client)
+    rerank_chunks_node = rerank_chunks(codegen_llm_client, small_client=codegen_small_client)
+    #rewrite_query_node = rewrite_query(classify_llm_client)
+    generate_answer_node = generate_answer(codegen_llm_client, small_client=codegen_small_client)
+    retrieve_pinecone_node = retrieve_pinecone(codegen_llm_client)
+
+    # Define LangGraph
+    builder = StateGraph(AssistantState)
+
+    # Add all nodes, each wrapped in a tracing span
+    def add_node(name, fn):
+        builder.add_node(name, traced_node(name, fn))
+
+    add_node("check_query", check_query)
+    add_node("check_query_llm", check_query_llm)
+    add_node("classify_and_refine_query", classify_and_refine_node)
+    # Sync and async variants: under astream/ainvoke a waiting request must not hold a worker thread
+    builder.add_node("coalesce", RunnableLambda(traced_node("coalesce", coalesce_request), afunc=traced_node("coalesce", acoalesce_request), name="coalesce"))
+    add_node("structured_query", structured_query_node)
+    add_node("generate_code", generate_code_node)
+    add_node("execute_code", execute_code_node)
+    add_node("match_rfis", match_rfis_node)
+    add_node("rfi_combine_context", rfi_combine_context_node)
+    add_node("generate_answer", generate_answer_node)
+    add_node("respond", respond)
+    add_node("retrieve_pinecone", retrieve_pinecone_node)
+    add_node("lookup_cached_answer", lookup_cached_answer)
+    add_node("cache_answer", cache_answer)
+    #builder.add_node("rewrite_query", rewrite_query_node)
+    add_node("rerank_chunks", rerank_chunks_node)
+
+    # Define graph structure
+    builder.set_entry_point("check_query")
+    builder.add_conditional_edges(
+        "check_query", 
+        lambda state: "error" in state,{
+            True: "respond",
+            False: "classify_and_refine_query"
+        }
+    )
+
+    builder.add_edge("classify_and_refine_query", "check_query_llm")
+
+    builder.add_edge("check_query_llm", "coalesce")
+
+    builder.add_conditional_edges(
+        "coalesce",
+        _route_after_coalesce,
+        {
+            "error": "respond",
+            "coalesced": "generate_answer",
+            "structured_query": "structured_query",
+            "excel_insight": "generate_code",
+            "rfi_lookup": "generate_code",
+            "building_code_query": "retrieve_pinecone",
+            "general": "retrieve_pinecone"
+        }
+    )
+
+    builder.add_conditional_edges("retrieve_pinecone", lambda state: "error" in state,{
+            True: "respond",
+            False: "lookup_cached_answer"
+        }
+    )
+    builder.add_conditional_edges("lookup_cached_answer", lambda state: bool(state.get("answer_cache_hit")), {
+            True: "generate_answer",
+            False: "rerank_chunks"
+        }
+    )
+
+    # Excel path
+    builder.add_conditional_edges("structured_query", _route_after_structured_query, {
+            "fallback": "generate_code",
+            "excel_insight": "generate_answer",
+            "rfi_lookup": "match_rfis",
+        })
+    builder.add_edge("generate_code", "execute_code")
+
+    builder.add_conditional_edges("execute_code", _route_after_execute, {
+            "error": "respond",
+            "retry": "generate_code",
+            "excel_insight": "generate_answer",
+            "rfi_lookup": "match_rfis",
+        })
+
+    # RFI path
+    builder.add_edge("match_rfis", "rfi_combine_context")
+    builder.add_edge("rfi_combine_context", "generate_answer")
+
+    # General Path
+    builder.add_edge("rerank_chunks", "generate_answer")
+
+    builder.add_edge("generate_answer", "cache_answer")
+    builder.add_edge("cache_answer", "respond")
+
+    # Final node
+    builder.set_finish_point("respond")
+
+    # Compile
+    return builder.compile()
+
+
+def get_assistant_graph():
+    """
+    Returns the compiled graph, building it once (thread-safe) on first call
+    """
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _status.update(state="warming", error=None)
+                t0 = time.monotonic()
+                try:
+                    _graph = build_assistant_graph()
+                except Exception as e:
+                    _status.update(state="failed", error=str(e) or type(e).__name__)
+                    raise
+                _status.update(state="ready", seconds=round(time.monotonic() - t0, 3))
+                print(f"Assistant graph ready in {_status['seconds']}s")
+    return _graph
+
+async def aget_assistant_graph():
+    """
+    Async accessor: builds the graph off the event loop if it is not ready yet
+    """
+    if _graph is not None:
+        return _graph
+    return await asyncio.to_thread(get_assistant_graph)
+
+async def arun_within_deadline(graph, state: dict, cfg: dict) -> dict:
+    """
+    Runs the graph under the request deadline stamped in `cfg` (see deadline.with_deadline). Nodes
+    degrade as it nears; if one overruns it anyway, the state of the last finished step is returned
+    with a best-effort answer built from whatever it had retrieved, marked degraded and with an error
+    """
+    from app.config import DEADLINE_GRACE_SECONDS
+    from app.services.deadline import seconds_left, exceeded
+    from app.graph.nodes.generate import partial_answer
+    latest = dict(state)
+    try:
+        async with asyncio.timeout(seconds_left(cfg) + DEADLINE_GRACE_SECONDS):
+            async for values in graph.astream(state, config=cfg, stream_mode="values"):
+                latest = values
+        return latest
+    except TimeoutError:
+        exceeded("api")
+        answer = latest.get("final_answer") if "error" not in latest else None
+        return {**latest, "final_answer": answer or partial_answer(latest), "degraded": "deadline", "error": "request deadline exceeded"}
+
+def warmup_status() -> dict:
+    return dict(_status, ready=_graph is not None)
+
+def __getattr__(name):
+    # Backwards compatible `from app.graph.assistant import assistant_graph` (builds on access)
+    if name == "assistant_graph":
+        return get_assistant_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
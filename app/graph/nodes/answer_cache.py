@@ -0,0 +1,28 @@
+# File: app/graph/nodes/answer_cache.py
+from app.graph.state import AssistantState
+from app.services.answer_cache import answer_cache
+from app.services.tracing import record_cache
+from app.config import ANSWER_CACHE_ENABLED
+
+# Semantic answer cache around rerank + generate on the document path. Only the answer is cached:
+# a hit still goes through generate_answer's summary-only branch to update this thread's summary/preview
+
+def lookup_cached_answer(state: AssistantState) -> AssistantState:
+    print("Checking answer cache...")
+    if not ANSWER_CACHE_ENABLED or not state.get("query_embedding"):
+        return state
+    cached = answer_cache.lookup(state["query_embedding"], state.get("retrieved_chunks", []))
+    record_cache("answer", cached is not None)
+    if cached:
+        print(f"Answer cache hit (similarity {cached['similarity']:.3f})")
+        state["final_answer"] = cached["answer"]
+        state["answer_cache_hit"] = True
+    return state
+
+def cache_answer(state: AssistantState) -> AssistantState:
+    # Best-effort answers written past the deadline are for this request only
+    if not ANSWER_CACHE_ENABLED or state.get("answer_cache_hit") or "error" in state or state.get("degraded"):
+        return state
+    if state.get("query_embedding") and state.get("retrieved_chunks") and state.get("final_answer"):
+        answer_cache.store(state["query_embedding"], state["retrieved_chunks"], state["final_answer"])
+    return state
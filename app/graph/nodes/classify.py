@@ -4,6 +4,8 @@ from typing import Literal, Optional, List
 from langchain_openai import ChatOpenAI
 from app.graph.state import AssistantState
 from app.config import JSON_DESCRIPTION
+from app.services.rfi_query import RFIQuery
+from app.services.output_parsing import StructuredOutput
 from app.utils import helper
 
 class ClassifyAndRewrite(BaseModel):
@@ -19,9 +21,13 @@ class ClassifyAndRewrite(BaseModel):
         None,
         description="A concise, retrieval-ready reformulation that preserves all acronyms, editions, and section/table/figure numbers."
     )
+    structured_query: Optional[RFIQuery] = Field(
+        None,
+        description="Structured form of the query over the RFI log, only applicable if the query_class is 'excel_insight' with query_subclass 'no_llm', or 'rfi_lookup'"
+    )
 
 def classify_and_rewrite_query(client: ChatOpenAI):
-    structured_llm = client.with_structured_output(ClassifyAndRewrite)
+    structured_llm = StructuredOutput(client, ClassifyAndRewrite)
 
     def _node(state: AssistantState) -> AssistantState:
         if state.get("error") or not state.get("guardrails", {}).get("allowed", True):
@@ -77,6 +83,13 @@ def classify_and_rewrite_query(client: ChatOpenAI):
 
         Use this to decide whether the query is answerable from structured Excel data or requires direct access to the document text.
 
+        3) Fill **structured_query** only if query_class is "excel_insight" with query_subclass "no_llm", or query_class is "rfi_lookup":
+            - Map the REWRITTEN query onto the structured fields (filters on Status, Ball in Court, RFI #, a date range, and one of list/count/group_count/top_n).
+            - Status codes: U = Unanswered, IP = In Progress, W - Arch = Waiting on Architect, W - Contr = Waiting on Contractor, A = Answered. "Open" means every code except A.
+            - Set supported = true ONLY if these fields capture the whole query. Plots, averages, durations, text matching on descriptions/comments, or any other computation must set supported = false.
+              Example (supported): "How many RFIs are open with the architect?" -> operation "count", status ["W - Arch"]
+              Example (not supported): "Plot the monthly trend of RFIs received"
+
         Respond only with a JSON object matching the schema.
         """
 
@@ -95,6 +108,7 @@ def classify_and_rewrite_query(client: ChatOpenAI):
         state["query_class"] = response.query_class
         state["query_subclass"] = response.query_subclass
         state["rewritten_query"] = response.rewritten
+        state["structured_query"] = response.structured_query.model_dump() if response.structured_query else None
         print(state["previous_rewrites"])
         state["previous_rewrites"].append(response.rewritten)
         state["previous_rewrites"] = state["previous_rewrites"][-10:]
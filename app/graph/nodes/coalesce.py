@@ -0,0 +1,92 @@
+# File: app/graph/nodes/coalesce.py
+import asyncio
+import hashlib
+from typing import Optional
+from app.graph.state import AssistantState
+from app.config import COALESCE_ENABLED, EXCEL_ARROW_PATH
+from app.services.code_cache import normalize_query
+from app.services.deadline import remaining
+from app.services.namespaces import lookup_pending, request_namespaces
+from app.services.single_flight import single_flight, lead
+from app.services.tracing import record_cache
+
+# Single-flight coalescing after classification: concurrent requests for the same question wait for
+# the first one and reuse its answer. Each follower then runs generate_answer's summary-only branch,
+# so its own thread summary and preview are still updated.
+
+# Parts of the leader's final state handed to followers
+SHARED_FIELDS = ("final_answer", "ranked_chunks", "source_paths", "plot_images", "code", "output", "executed", "rfi_matches")
+
+def data_version() -> str:
+    """The RFI log snapshot in use; a refresh starts new flights rather than joining old ones"""
+    try:
+        return str(EXCEL_ARROW_PATH.stat().st_mtime_ns)
+    except OSError:
+        return ""
+
+def coalesce_key(state: AssistantState) -> Optional[str]:
+    query = normalize_query(state.get("rewritten_query"))
+    if not query or "error" in state:
+        return None
+    parts = [
+        query,
+        state.get("query_class") or "",
+        state.get("query_subclass") or "",
+        ",".join(sorted(request_namespaces(state))),
+        data_version(),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def _join(state: AssistantState):
+    """Returns (future, seconds to wait) for a follower, None when this request runs the graph itself"""
+    key = coalesce_key(state) if COALESCE_ENABLED else None
+    if key is None:
+        return None
+    token, future, wait = single_flight.join(key)
+    if token is not None:
+        state["coalesce_token"] = token
+        lead(token)
+        record_cache("coalesce", False)
+        return None
+    # A follower waits no longer than its own request deadline allows
+    left = remaining()
+    return future, max(wait if left is None else min(wait, left), 0.0)
+
+def _adopt(state: AssistantState, shared: Optional[dict]) -> AssistantState:
+    record_cache("coalesce", bool(shared))
+    if shared:
+        print("Reusing the answer of an identical in-flight request")
+        state.update(shared)
+        state["coalesced"] = True
+    return state
+
+def coalesce_request(state: AssistantState) -> AssistantState:
+    print("Checking in-flight requests...")
+    waiting = _join(state)
+    if waiting is None:
+        return state
+    future, wait = waiting
+    try:
+        shared = future.result(timeout=wait)
+    except TimeoutError:
+        shared = None
+    return _adopt(state, shared)
+
+async def acoalesce_request(state: AssistantState) -> AssistantState:
+    # Async variant for astream/ainvoke: waiting must not hold one of the worker threads the
+    # leader's own nodes need
+    print("Checking in-flight requests...")
+    waiting = await asyncio.to_thread(_join, state) if lookup_pending(state) else _join(state)
+    if waiting is None:
+        return state
+    future, wait = waiting
+    done, _ = await asyncio.wait({asyncio.wrap_future(future)}, timeout=wait)
+    return _adopt(state, done.pop().result() if done else None)
+
+def finish_flight(state: AssistantState) -> None:
+    """Publishes the leader's answer to its followers; errors and best-effort answers are not shared (followers retry)"""
+    token = state.get("coalesce_token")
+    if token is None:
+        return
+    ok = "error" not in state and not state.get("degraded") and bool(state.get("final_answer"))
+    single_flight.finish(token, {k: state[k] for k in SHARED_FIELDS if k in state} if ok else None)
@@ -3,51 +3,84 @@ import sys
 import io, base64
 import re
 import json
-from typing import Callable, List, Literal
+from typing import Callable, List, Literal, Optional
 import pandas as pd
 from langchain_openai import ChatOpenAI
 from app.graph.state import AssistantState
-from app.config import JSON_DESCRIPTION
+from app.config import JSON_DESCRIPTION, DEADLINE_TIGHT_SECONDS, DEADLINE_FORMAT_MIN_SECONDS
+from app.services.deadline import DEADLINE_MESSAGE, is_tight, degrade, exceeded
+from app.services.resilience import DeadlineExceeded
+from app.services.code_cache import code_cache, schema_version
+from app.services.code_executor import SubprocessExecutor, InProcessExecutor
+from app.services.tracing import record_cache, record_retrieval
+from app.clients.model_router import ModelRouter
+from app.services.output_parsing import SECTIONS, parse_sections, record_parse, strip_code_fences
+from app.services.rfi_query import RFIQuery, UnsupportedQuery, run_rfi_query, format_result, to_records
 from datetime import datetime
 import ast
 from pandas import Timestamp, NaT, ExcelWriter
 from io import BytesIO
 import asyncio
-import matplotlib.pyplot as plt
-import fuzzywuzzy
-import matplotlib
-matplotlib.use("Agg")
-
-def _capture_figures_to_data_urls():
-    images = []
-    for num in plt.get_fignums():
-        fig = plt.figure(num)
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png", bbox_inches="tight")
-        plt.close(fig)
-        buf.seek(0)
-        images.append("data:image/png;base64," + base64.b64encode(buf.read()).decode("utf-8"))
-    return images
-
-
-def generate_code(client: ChatOpenAI, df: pd.DataFrame) -> Callable[[AssistantState], AssistantState]:
+
+def run_structured_query(df: pd.DataFrame) -> Callable[[AssistantState], AssistantState]:
+    def _node(state: AssistantState) -> AssistantState:
+        print("Running structured query...")
+        try:
+            query = RFIQuery(**state["structured_query"])
+            result = run_rfi_query(df, query)
+        except (UnsupportedQuery, KeyError, TypeError, ValueError) as e:
+            # Fall back to code generation
+            print(f"Structured query not supported: {e}")
+            state["structured_query"] = None
+            return state
+
+        state["executed"] = True
+        state["plot_images"] = []
+        if state.get("query_class") == "rfi_lookup":
+            state["rfi_matches"] = to_records(result)
+            record_retrieval("rfi_rows", len(state["rfi_matches"]))
+            return state
+
+        state["output"] = str(result) if isinstance(result, int) else result.to_string(index=False)
+        state["final_answer"] = format_result(result, query)
+        return state
+    return _node
+
+
+def generate_code(client: ChatOpenAI, df: pd.DataFrame, small_client: ChatOpenAI = None) -> Callable[[AssistantState], AssistantState]:
+    # Plain pandas tasks (no_llm) are written by the small model first; execute_code sends them
+    # back here for the large model if the code fails to run
+    router = ModelRouter("codegen", small=small_client, large=client)
     sample_records = df.head(5).to_dict(orient="records")
     metadata = JSON_DESCRIPTION
+    dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    schema = schema_version(df)
 
     def _node(state: AssistantState) -> AssistantState:
         instruction = state.get("rewritten_query", "")
         print("Generating code...")
 
+        cache_key = code_cache.make_key(instruction, state.get("query_class"), state.get("query_subclass"), schema)
+        state["code_cache_key"] = cache_key
+        cached_code = code_cache.get(cache_key)
+        record_cache("code", cached_code is not None)
+        if cached_code is not None:
+            print("Using cached code...")
+            state["code"] = cached_code
+            return state
+
         if state.get("query_class") == "rfi_lookup":
             instruction += """
             The user is looking for information about specific RFIs.
-            Return all information about the RFIs that match the user's query from the dataframe in form of list of dictionaries.
+            Select all columns of the RFIs that match the user's query from the dataframe and pass the resulting DataFrame to the
+            predefined `emit(...)` function (e.g. `emit(matches)`). Do not print the rows and do not define or import `emit`.
             """
             
         if state.get("query_subclass") == "no_llm":
             prompt = f"""
             You are given a pandas dataframe called `df`
             Context:
+            - Column dtypes: {dtypes}
             - Sample records: {sample_records}
             - Metadata: {json.dumps(metadata)}
 
@@ -82,6 +115,7 @@ def generate_code(client: ChatOpenAI, df: pd.DataFrame) -> Callable[[AssistantSt
             FOLLOW THE GUIDELINES EXACTLY BELOW. NO DEVIATIONS ARE ALLOWED.
 
             Context:
+            - Column dtypes: {dtypes}
             - Sample records: {sample_records}
             - Metadata: {json.dumps(metadata)}
 
@@ -118,64 +152,121 @@ def generate_code(client: ChatOpenAI, df: pd.DataFrame) -> Callable[[AssistantSt
             Return ONLY valid, executable Python code. Do not include markdown, explanations, sample data, or test code.
         """
 
-        completion = client.invoke([
-                {"role": "system", "content": "You are a helpful python data scientist. Use the context to answer clearly and professionally."},
-                {"role": "user", "content": prompt.strip()}
-        ])
+        escalation = state.get("codegen_escalation")
+        small_first = state.get("query_subclass") == "no_llm"
+        if not small_first and not escalation and is_tight(DEADLINE_TIGHT_SECONDS):
+            degrade("small_model")
+            small_first = True
+        state["code_model"] = "large" if escalation else router.tier(small_first)
+        try:
+            completion = router.invoke([
+                    {"role": "system", "content": "You are a helpful python data scientist. Use the context to answer clearly and professionally."},
+                    {"role": "user", "content": prompt.strip()}
+            ], small_first=small_first, escalation=escalation)
+        except DeadlineExceeded:
+            exceeded("generate_code")
+            state["error"] = DEADLINE_MESSAGE
+            return state
         answer = completion.content.strip()
-        clean_code = re.sub(r"^```(?:python)?|```$", "", answer.strip(), flags=re.MULTILINE)
+        clean_code = strip_code_fences(answer)
         state["code"] = clean_code
         return state
     return _node
 
-def extract_final_answer(text: str) -> str:
-    # Remove leading/trailing whitespace
+def _layout(final_answer: str, analysis: str, code: str) -> str:
+    return f"=== FINAL ANSWER ===\n{final_answer}\n\n=== ANALYSIS ===\n{analysis}\n\n=== CODE ===\n{code}"
+
+def extract_final_answer(text: str, code: str = "") -> str:
+    """
+    Normalizes the formatter's reply to the FINAL ANSWER / ANALYSIS / CODE layout whatever the
+    section order or header style; a missing CODE section is filled with the executed code.
+    A reply without a FINAL ANSWER section is returned as-is
+    """
     text = text.strip()
-    pattern = r"=== CODE ===\s*(.*?)\s*=== FINAL ANSWER ===\s*(.*?)\s*=== ANALYSIS ===\s*(.*)"
-    match = re.search(pattern, text, re.DOTALL)
-    if match:
-        code = match.group(1).strip()
-        final_answer = match.group(2).strip()
-        analysis = match.group(3).strip()
-        return f"=== CODE ===\n{code}\n\n=== FINAL ANSWER ===\n{final_answer}\n\n=== ANALYSIS ===\n{analysis}"
-
-    else:
-        return text.strip()  # fallback
-
-def execute_code(client: ChatOpenAI, df: pd.DataFrame) -> Callable[[AssistantState], AssistantState]:
+    sections = parse_sections(text)
+    if "FINAL ANSWER" not in sections:
+        record_parse("sections", "failed")
+        return text
+    clean = list(sections) == list(SECTIONS) and all(f"=== {name} ===" in text for name in SECTIONS)
+    record_parse("sections", "clean" if clean else "repaired")
+    return _layout(sections["FINAL ANSWER"], sections.get("ANALYSIS", ""), sections.get("CODE") or code.strip())
+
+def _parse_printed_records(output: str) -> list[dict]:
+    """
+    Fallback for code that printed a list of dicts instead of calling emit(...)
+    """
+    cleaned = re.sub(r"Timestamp\('([^']*)'\)", r"'\1'", output)
+    cleaned = re.sub(r"\bNaT\b", "None", cleaned)
+    return ast.literal_eval(cleaned.strip())
+
+def unformatted_answer(output: str, code: str) -> str:
+    """The formatter's three sections filled in without a model call (used when time is short)"""
+    return _layout(output.strip(), "Raw output of the generated code; formatting was skipped to answer in time.", code.strip())
+
+def format_problem(text: str) -> Optional[str]:
+    """Validation for the formatter: the FINAL ANSWER section must be recoverable"""
+    return None if "FINAL ANSWER" in parse_sections(text) else "format"
+
+def execute_code(client: ChatOpenAI, executor: SubprocessExecutor | InProcessExecutor, large_client: ChatOpenAI = None) -> Callable[[AssistantState], AssistantState]:
+    # `client` (the small model) formats the result; large_client re-formats output it gets wrong
+    formatter = ModelRouter("format", small=client, large=large_client, default="small")
     def _node(state: AssistantState) -> AssistantState:
         print("Executing code...")
-        if state.get("executed"):
+        if state.get("executed") or "error" in state:
             return state
         state["executed"] = True
 
         code = state["code"]
         instruction = state.get("rewritten_query", "")
 
-        # Clear the figure cache
-        plt.close('all')
-
-        old_stdout = sys.stdout
-        redirected_output = sys.stdout = io.StringIO()
-
-        try:
-            local_vars = {"df": df, "client": client}
-            exec(code, local_vars)
-            output = redirected_output.getvalue()
-        except Exception as e:
-            output = f"❌ Error during execution: {str(e)}"
-        finally:
-            sys.stdout = old_stdout
+        result = executor.run(code, client=client)
+        output = result.output
+        succeeded = result.succeeded
 
         state["output"] = output
-        state["plot_images"] = _capture_figures_to_data_urls()
+        state["plot_images"] = result.plot_images
+        cache_key = state.get("code_cache_key")
+
+        if not succeeded and state.get("code_model") == "small" and not state.get("codegen_escalation"):
+            # Small-model code failed: regenerate it on the large model (routed back to generate_code)
+            print("Generated code failed; escalating code generation")
+            if cache_key:
+                code_cache.evict(cache_key)
+            state["executed"] = False
+            state["codegen_escalation"] = "execution"
+            return state
 
         if state.get("query_class") == "rfi_lookup":
-            data_str_clean = output.replace("Timestamp(", "").replace(")", "").replace("NaT", "None")
-            state["rfi_matches"] = ast.literal_eval(data_str_clean)
+            # Failed code has no matches to read: report it (routed to respond) instead of parsing the traceback
+            try:
+                if not succeeded:
+                    raise ValueError(output.strip() or "no output")
+                state["rfi_matches"] = result.records() if result.emitted else _parse_printed_records(output)
+            except (ValueError, SyntaxError) as e:
+                if cache_key:
+                    code_cache.evict(cache_key)
+                state["error"] = f"❌ Failed to find the matching RFIs: {e}"
+                return state
+            record_retrieval("rfi_rows", len(state["rfi_matches"]))
+            if cache_key:
+                code_cache.put(cache_key, code)
+            return state
+
+        if cache_key:
+            if succeeded:
+                code_cache.put(cache_key, code)
+            else:
+                code_cache.evict(cache_key)
+
+        if result.emitted and not output.strip():
+            output = result.to_frame().to_string(index=False)
+            state["output"] = output
+
+        if is_tight(DEADLINE_FORMAT_MIN_SECONDS):
+            degrade("skip_format")
+            state["final_answer"] = unformatted_answer(output, code)
             return state
 
-        
         prompt = f"""
             The user instruction was: 
             {instruction}
@@ -217,11 +308,17 @@ def execute_code(client: ChatOpenAI, df: pd.DataFrame) -> Callable[[AssistantSta
             print("hello")
         """
 
-        summary = client.invoke([
-                {"role": "system", "content": "You are a strict formatter. Only return the FINAL ANSWER, ANALYSIS and CODE sections. Do not return any markdown."},
-                {"role": "user", "content": prompt.strip()}
-            ])
-        answer = extract_final_answer(summary.content.strip())
+        try:
+            summary = formatter.invoke([
+                    {"role": "system", "content": "You are a strict formatter. Only return the FINAL ANSWER, ANALYSIS and CODE sections. Do not return any markdown."},
+                    {"role": "user", "content": prompt.strip()}
+                ], check=lambda r: format_problem(r.content))
+        except DeadlineExceeded:
+            exceeded("execute_code")
+            state["final_answer"] = unformatted_answer(output, code)
+            state["degraded"] = "deadline"
+            return state
+        answer = extract_final_answer(summary.content, code)
         state["final_answer"] = answer
         return state
     return _node
@@ -1,10 +1,14 @@
 # File: app/graph/nodes/generate.py
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 from app.graph.state import AssistantState
 from app.utils import helper
+from app.utils.prompt_budget import PromptBudget
+from app.config import GENERATE_MAX_PROMPT_TOKENS, GENERATE_SUMMARY_MAX_TOKENS, GENERATE_HISTORY_MAX_TOKENS, MODEL_SMALL_FIRST_CLASSES, MODEL_SMALL_MAX_CONTEXT_TOKENS, DEADLINE_TIGHT_SECONDS
+from app.clients.model_router import ModelRouter
+from app.services.deadline import DEADLINE_MESSAGE, is_tight, degrade, exceeded
+from app.services.resilience import DeadlineExceeded
 from langchain_openai import ChatOpenAI
-from pydantic import BaseModel, Field, ValidationError
-import json
+from pydantic import BaseModel, Field
 import re
 
 class ResponsePayload(BaseModel):
@@ -16,30 +20,58 @@ class CompactResponsePayload(BaseModel):
     updated_summary: str = Field(..., description="Compact running summary (<=300 words)")
     thread_preview: str = Field(..., description="Compact running conversation history (5 words)")
 
-def _strip_code_fences(text: str) -> str:
-    t = text.strip()
-    if t.startswith("```"):
-        t = re.sub(r"^```(?:json)?\n?|\n?```$", "", t, flags=re.IGNORECASE)
-    return t.strip()
-
-def generate_answer(client: ChatOpenAI) -> Callable[[AssistantState], AssistantState]:
-    structured = client.with_structured_output(ResponsePayload)
-    compact_structured = client.with_structured_output(CompactResponsePayload)
+NOT_FOUND = "Not found in provided sources."
+
+def citation_problem(answer: str, source_count: int) -> Optional[str]:
+    """
+    Validation for small-model answers: every answer must cite [n] with n in 1..source_count,
+    unless it is the explicit not-found reply
+    """
+    if NOT_FOUND.lower() in answer.lower():
+        return None
+    refs = [int(r) for r in re.findall(r"\[(\d+)\]", answer)]
+    if not refs:
+        return "citations"
+    if any(r < 1 or r > source_count for r in refs):
+        return "bad_citation"
+    return None
+
+def best_effort_answer(context_blocks: List[str], sources: str, limit: int = 3) -> str:
+    """Answer used when the deadline passes before the model replies: the top passages, cited"""
+    if not context_blocks:
+        return DEADLINE_MESSAGE
+    passages = "\n\n".join(context_blocks[:limit])
+    return f"{DEADLINE_MESSAGE}\n\nMost relevant passages found:\n\n{passages}\n\nSources:\n{sources}"
+
+def partial_answer(state: AssistantState) -> str:
+    """best_effort_answer from the passages a request had retrieved (or ranked) when its deadline passed"""
+    path_to_index: Dict[str, int] = {}
+    context_blocks: List[str] = []
+    for doc in state.get("ranked_chunks") or state.get("retrieved_chunks") or []:
+        path = doc['metadata']['file_path']
+        index = path_to_index.setdefault(path, len(path_to_index) + 1)
+        context_blocks.append(f"[{index}] {doc['snippet']}")
+    sources = "\n".join(f"[{i}] {path}" for path, i in path_to_index.items())
+    return best_effort_answer(context_blocks, sources)
+
+def generate_answer(client: ChatOpenAI, small_client: ChatOpenAI = None) -> Callable[[AssistantState], AssistantState]:
+    # Summaries and short, well-grounded answers go to the small model first (see ModelRouter)
+    router = ModelRouter("generate", small=small_client, large=client)
     def _node(state: AssistantState) -> AssistantState:
         print("Generating answer...")
 
-        if state.get("query_class")=="excel_insight":
+        # Excel, coalesced and cached answers already exist: only the thread summary is written here
+        if state.get("query_class")=="excel_insight" or state.get("coalesced") or state.get("answer_cache_hit"):
             print("Generating answer for excel insight...")
             state["final_answer"] = state.get("final_answer", "[No final answer generated]")
 
-            recent_history = helper.render_message_summary(state.get('messages', []), window_size=5)
-
             system_msg = (
             "You answer STRICTLY using the provided context only. "
             "Return ONLY the schema fields (updated_summary, thread_preview)."
             )
 
-            user_msg = f"""
+            def _render(summary: str, recent_history: str) -> str:
+                return f"""
             Update the thread_preview, AND update a compact running summary (<=300 words), focus on decisions, assumptions, sources, constraints, and any unresolved issues.
 
             Guidelines for the "thread_preview" field:
@@ -68,7 +100,7 @@ def generate_answer(client: ChatOpenAI) -> Callable[[AssistantState], AssistantS
 
             ----
             Current Summary (may be "(none)"):
-            {state.get('history', '(none)')}
+            {summary}
 
             Recent turns:
             {recent_history}
@@ -77,40 +109,28 @@ def generate_answer(client: ChatOpenAI) -> Callable[[AssistantState], AssistantS
             {state.get('rewritten_query', "")}
             """
 
+            turns = helper.render_message_lines(state.get('messages', []), window_size=5)
+            summary, turns, _ = PromptBudget(GENERATE_MAX_PROMPT_TOKENS, GENERATE_SUMMARY_MAX_TOKENS, GENERATE_HISTORY_MAX_TOKENS).fit(
+                system_msg + _render("", ""), state.get('history', '(none)'), turns)
+            user_msg = _render(summary, "\n".join(turns))
+
             try:
                 print("Input Summary")
                 print(state.get('history', '(none)'))
-                compact_response: CompactResponsePayload = compact_structured.invoke([
+                compact_response: CompactResponsePayload = router.invoke([
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_msg}
-                ])
+                ], schema=CompactResponsePayload)
                 state["history"] = compact_response.updated_summary
                 state["thread_preview"] = compact_response.thread_preview
-            except ValidationError as e:
+            except ValueError as e:
                 state["error"] = f"❌ Failed to parse the response: {e}"
+            except DeadlineExceeded:
+                # The answer already exists; only the thread summary update is dropped
+                exceeded("summary")
             return state
         else:
             print("Not Excel Route")
-            #Inputs
-            ranked_chunks = state.get("ranked_chunks", [])
-            # Deduplicate sources
-            path_to_index: Dict[str, int] = {}
-            unique_sources: List[str] = []
-            context_blocks: List[str] = []
-            for doc in ranked_chunks:
-                snippet = doc['snippet']
-                path = doc['metadata']['file_path']
-                if path not in path_to_index:
-                    path_to_index[path] = len(unique_sources)+1
-                    unique_sources.append(path)
-                index = path_to_index[path]
-                context_blocks.append(f"[{index}] {snippet}")
-
-            sources = "\n".join(f"[{i+1}] {path}" for i, path in enumerate(unique_sources))
-            context = "\n\n".join(context_blocks)
-
-            recent_history = helper.render_message_summary(state.get('messages', []), window_size=5)
-
             system_msg = (
             "You answer STRICTLY using the provided context only. "
             "If the answer is not fully supported by the context, say exactly: "
@@ -120,7 +140,8 @@ def generate_answer(client: ChatOpenAI) -> Callable[[AssistantState], AssistantS
             "Return ONLY the schema fields (answer, updated_summary, thread_preview)."
             )
 
-            user_msg = f"""
+            def _render(summary: str, recent_history: str, context: str, sources: str) -> str:
+                return f"""
             Answer the user, update the thread_preview, AND update a compact running summary (<=300 words), focus on decisions, assumptions, sources, constraints, and any unresolved issues.
 
             Guidelines for the "answer" field:
@@ -154,7 +175,7 @@ def generate_answer(client: ChatOpenAI) -> Callable[[AssistantState], AssistantS
 
             ----
             Current Summary (may be "(none)"):
-            {state.get('history', '(none)')}
+            {summary}
 
             Recent turns:
             {recent_history}
@@ -169,32 +190,55 @@ def generate_answer(client: ChatOpenAI) -> Callable[[AssistantState], AssistantS
             {state.get('rewritten_query', "")}
             """
 
+            # Budget summary, recent turns and context; sources are reserved at their worst case
+            ranked_chunks = state.get("ranked_chunks", [])
+            all_sources = "\n".join(f"[{i+1}] {path}" for i, path in enumerate(dict.fromkeys(d['metadata']['file_path'] for d in ranked_chunks)))
+            turns = helper.render_message_lines(state.get('messages', []), window_size=5)
+            budget = PromptBudget(GENERATE_MAX_PROMPT_TOKENS, GENERATE_SUMMARY_MAX_TOKENS, GENERATE_HISTORY_MAX_TOKENS)
+            summary, turns, ranked_chunks = budget.fit(system_msg + _render("", "", "", all_sources), state.get('history', '(none)'), turns, ranked_chunks)
+            print(f"Prompt budget: {budget.used}")
+
+            # Deduplicate sources
+            path_to_index: Dict[str, int] = {}
+            unique_sources: List[str] = []
+            context_blocks: List[str] = []
+            for doc in ranked_chunks:
+                snippet = doc['snippet']
+                path = doc['metadata']['file_path']
+                if path not in path_to_index:
+                    path_to_index[path] = len(unique_sources)+1
+                    unique_sources.append(path)
+                index = path_to_index[path]
+                context_blocks.append(f"[{index}] {snippet}")
+
+            sources = "\n".join(f"[{i+1}] {path}" for i, path in enumerate(unique_sources))
+            context = "\n\n".join(context_blocks)
+            user_msg = _render(summary, "\n".join(turns), context, sources)
+
             try:
                 print("Input Summary")
                 print(state.get('history', '(none)'))
-                response: ResponsePayload = structured.invoke([
+                small_first = state.get("query_class") in MODEL_SMALL_FIRST_CLASSES and budget.used["context"] <= MODEL_SMALL_MAX_CONTEXT_TOKENS
+                if not small_first and is_tight(DEADLINE_TIGHT_SECONDS):
+                    degrade("small_model")
+                    small_first = True
+                response: ResponsePayload = router.invoke([
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_msg}
-                ])
+                ], schema=ResponsePayload, check=lambda r: citation_problem(r.answer, len(unique_sources)), small_first=small_first)
                 print("Response")
                 state["history"] = response.updated_summary
                 state["final_answer"] = response.answer
                 state["thread_preview"] = response.thread_preview
                 return state
-            except ValidationError as e:
-                # Extremely rare: try one cheap repair pass on raw content
-                raw = client.invoke([
-                    {"role": "system", "content": "You are a strict JSON emitter. Output a JSON object with keys: answer, updated_summary. No prose, no fences."},
-                    {"role": "user", "content": user_msg}
-                ]).content
-                raw = _strip_code_fences(raw)
-                try:
-                    data = json.loads(raw)
-                    state["history"] = data["updated_summary"]
-                    state["final_answer"] = data["answer"]
-                    state["thread_preview"] = data["thread_preview"]
-                except Exception as e:
-                    state["error"] = f"❌ Failed to parse JSON: {e}"
+            except DeadlineExceeded:
+                exceeded("generate_answer")
+                state["final_answer"] = best_effort_answer(context_blocks, sources)
+                state["degraded"] = "deadline"
+                return state
+            except ValueError as e:
+                # Output the local parser could not repair (see output_parsing.parse_structured)
+                state["error"] = f"❌ Failed to parse the response: {e}"
             return state
     return _node
 
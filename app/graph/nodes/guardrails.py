@@ -3,13 +3,18 @@
 import re
 import time
 import logging
-from typing import Dict, Tuple
+from dataclasses import asdict, dataclass
+from typing import Optional
 
 from langchain_openai import ChatOpenAI
-from openai import OpenAI
 from app.graph.state import AssistantState
 from app.utils.helper import _last_user_text
-from app.config import OPENAI_API_KEY
+from app.clients.openAI_client import get_client
+from app.config import GUARD_CACHE_MAX_ENTRIES, GUARD_CACHE_TTL_SECONDS, GUARD_CACHE_BACKEND, GUARD_CACHE_PATH
+from app.services.ttl_cache import create_cache
+from app.services.tracing import record_cache
+from app.services.resilience import ResilientModel
+from app.services.output_parsing import StructuredOutput
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +32,6 @@ INJECTION_PATTERNS = [
     r"change your role",
     r"reveal (system|developer) prompt|show (hidden|internal) rules",
 ]
-INJECTION_REGEX = [re.compile(p, re.IGNORECASE) for p in INJECTION_PATTERNS]
 
 ALLOWLIST_PATTERNS = [
     r"\b(RFI|request for information|submittal|transmittal|spec(?:ification)?s?)\b",
@@ -40,7 +44,6 @@ ALLOWLIST_PATTERNS = [
     r"\b(NYA|NYASE)\b",
     r"\b([A-Z]{2,}-\d{2,}|\d{4}-\d{3,})\b",
 ]
-ALLOWLIST_REGEX = [re.compile(p, re.IGNORECASE) for p in ALLOWLIST_PATTERNS]
 
 OFF_TOPIC_PATTERNS = [
     r"\b(weather|forecast|news|headlines|stock|bitcoin|crypto|price|market|sports|nba|nfl|ipl)\b",
@@ -49,47 +52,101 @@ OFF_TOPIC_PATTERNS = [
     r"\b(poem|song|lyrics|rap|joke|story|fanfic|game|riddle|puzzle)\b",
     r"\b(translate|translation)\b",
 ]
-OFF_TOPIC_REGEX = [re.compile(p, re.IGNORECASE) for p in OFF_TOPIC_PATTERNS]
-
-# --- Simple TTL cache ---
-_CACHE: Dict[str, Tuple[bool, float]] = {}
-_TTL_SECONDS = 3600
-_MAX_CACHE = 1024
-
-def _get_cache(key: str):
-    now = time.monotonic()
-    rec = _CACHE.get(key)
-    if rec and (now - rec[1] < _TTL_SECONDS):
-        return rec[0]
-    if rec:
-        _CACHE.pop(key, None)
-    return None
-
-def _set_cache(key: str, val: bool):
-    if len(_CACHE) >= _MAX_CACHE:
-        # drop ~10% oldest
-        for k,_ in list(_CACHE.items())[: int(_MAX_CACHE*0.1) ]:
-            _CACHE.pop(k, None)
-    _CACHE[key] = (val, time.monotonic())
+
+# --- Compiled matcher ---
+@dataclass(frozen=True)
+class GuardVerdict:
+    allowed: bool
+    category: str                   # blocked_keyword | injection | allowlist | off_topic | ambiguous
+    rule: Optional[str] = None      # named group that fired, e.g. "injection_2"
+    match: Optional[str] = None     # matched text
+
+def _keyword_trie(words) -> str:
+    r"""
+    Folds the keywords into a prefix trie and emits it as one regex, e.g.
+    p(?:a(?:ssw(?:d|ord)|yroll)|rivate\ key), so matching walks the trie once per position
+    (the regex-engine equivalent of an Aho-Corasick automaton) instead of testing every keyword
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def _emit(node: dict) -> str:
+        alts = [re.escape(ch) + _emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 and "" not in node else "(?:" + "|".join(alts) + ")"
+        return body + ("?" if "" in node else "")
+
+    return _emit(trie)
+
+def _lower_pattern(pattern: str) -> str:
+    # Lowercase literals and classes ([A-Z] -> [a-z]) but leave escapes like \b, \d alone
+    return re.sub(r"\\.|[^\\]+", lambda m: m.group() if m.group().startswith("\\") else m.group().lower(), pattern)
+
+def _alternation(category: str, patterns: list[str]) -> str:
+    """
+    One alternation per category with a named group per pattern ("<category>_<i>"). A shared
+    \b...\b wrapper is hoisted out so most positions fail on the boundary check alone.
+    Patterns are lowercased to run against the normalized query without IGNORECASE,
+    which keeps the engine's literal-prefix fast paths.
+    """
+    patterns = [_lower_pattern(p) for p in patterns]
+    bounded = all(p.startswith(r"\b") and p.endswith(r"\b") for p in patterns)
+    groups = [f"(?P<{category}_{i}>{p[2:-2] if bounded else p})" for i, p in enumerate(patterns)]
+    body = "|".join(groups)
+    return rf"\b(?:{body})\b" if bounded else body
+
+class GuardMatcher:
+    """
+    All guardrail heuristics compiled once: a keyword trie plus one regex per category, checked
+    in priority order (blocked keyword > injection > allowlist > off-topic) on the normalized query
+    """
+    def __init__(self):
+        self.rules = [
+            ("blocked_keyword", False, re.compile(f"(?P<blocked_keyword>{_keyword_trie(BLOCKED_KEYWORDS)})")),
+            ("injection", False, re.compile(_alternation("injection", INJECTION_PATTERNS))),
+            ("allowlist", True, re.compile(_alternation("allowlist", ALLOWLIST_PATTERNS))),
+            ("off_topic", False, re.compile(_alternation("off_topic", OFF_TOPIC_PATTERNS))),
+        ]
+
+    def match(self, query: str) -> GuardVerdict:
+        key = _norm(query)
+        for category, allowed, regex in self.rules:
+            m = regex.search(key)
+            if m:
+                rule = m.lastgroup
+                return GuardVerdict(allowed=allowed, category=category, rule=rule, match=m.group(rule))
+        return GuardVerdict(allowed=True, category="ambiguous")
+
+GUARD_MATCHER = GuardMatcher()
+
+def match_rules(query: str) -> GuardVerdict:
+    """
+    Classifies a query with the compiled heuristics and reports which rule fired
+    """
+    return GUARD_MATCHER.match(query)
+
+# --- Verdict caches ---
+# Rule and LLM verdicts are kept apart so a cached heuristic "allow" never skips the LLM check
+RULE_CACHE = create_cache("guard_rules", GUARD_CACHE_MAX_ENTRIES, GUARD_CACHE_TTL_SECONDS, GUARD_CACHE_BACKEND, GUARD_CACHE_PATH)
+LLM_CACHE = create_cache("guard_llm", GUARD_CACHE_MAX_ENTRIES, GUARD_CACHE_TTL_SECONDS, GUARD_CACHE_BACKEND, GUARD_CACHE_PATH)
 
 def _norm(s: str) -> str:
     return re.sub(r"\s+", " ", s.strip().lower())
 
 # --- Slow checks (rare) ---
-def _flagged_by_moderation_api(query: str) -> bool:
-    try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        result = client.moderations.create(input=query)
-        return bool(result.results[0].flagged)
-    except Exception as e:
-        logger.warning(f"Moderation API failed: {e}")
-        return False
-
-def _flagged_by_llm_classifier(client: ChatOpenAI, query: str) -> bool:
+def _flagged_by_llm_classifier(client: ChatOpenAI, query: str) -> Optional[bool]:
+    """
+    True/False from the model, or None when no verdict came back (outage, open circuit, deadline, bad output)
+    """
     from pydantic import BaseModel, Field
     class GuardrailsClassification(BaseModel):
         blocked: bool = Field(...)
-    structured = client.with_structured_output(GuardrailsClassification)
+    structured = StructuredOutput(client, GuardrailsClassification)
     try:
         result = structured.invoke([
             {"role":"system","content":(
@@ -104,52 +161,45 @@ def _flagged_by_llm_classifier(client: ChatOpenAI, query: str) -> bool:
         return bool(result.blocked)
     except Exception as e:
         logger.warning(f"LLM classifier failed: {e}")
-        return False
+        return None
 
 # --- Public API ---
-def is_query_allowed(query: str, client: ChatOpenAI | None) -> bool:
+def check_rules(query: str) -> GuardVerdict:
+    """
+    Cached heuristic verdict: blocked keyword > injection > allowlist > off-topic, else ambiguous (allowed)
+    """
     key = _norm(query)
-    cached = _get_cache(key)
+    cached = RULE_CACHE.get(key)
+    record_cache("guard_rules", cached is not None)
     if cached is not None:
-        return cached
+        return GuardVerdict(**cached)
 
     t0 = time.monotonic()
+    verdict = match_rules(query)
+    RULE_CACHE.set(key, asdict(verdict))
+    logger.info("Guard %s: %s (%s) | %.3fs | %r",
+                "allow" if verdict.allowed else "block", verdict.category, verdict.rule,
+                time.monotonic()-t0, query)
+    return verdict
 
-    # 1) Hard PII (always block)
-    if any(k in key for k in BLOCKED_KEYWORDS):
-        _set_cache(key, False); logger.info("Guard block: blocked_keyword | %.3fs | %r", time.monotonic()-t0, query); return False
-
-    # 2) Injection (always block)
-    if any(r.search(query) for r in INJECTION_REGEX):
-        _set_cache(key, False); logger.info("Guard block: injection | %.3fs | %r", time.monotonic()-t0, query); return False
-
-    # 3) Domain allowlist (instant allow)
-    if any(r.search(query) for r in ALLOWLIST_REGEX):
-        _set_cache(key, True);  logger.info("Guard allow: allowlist | %.3fs | %r", time.monotonic()-t0, query); return True
-
-    # 4) Obvious off-topic (but DO NOT punish continuations)
-    if any(r.search(query) for r in OFF_TOPIC_REGEX):
-        _set_cache(key, False); logger.info("Guard block: off_topic | %.3fs | %r", time.monotonic()-t0, query); return False
-
-    # 5) PII suspicion → moderation (still applies even for continuation)
-    if any(k in key for k in ("ssn","password","credit card","token","private key")) and _flagged_by_moderation_api(query):
-        _set_cache(key, False); logger.info("Guard block: moderation | %.3fs | %r", time.monotonic()-t0, query); return False
-
-    # 6) Ambiguous: Continue for now
-    _set_cache(key, True); logger.info("Guard allow: ambiguous | %.3fs | %r", time.monotonic()-t0, query)
-    return True
+def is_query_allowed(query: str, client: ChatOpenAI | None) -> bool:
+    return check_rules(query).allowed
 
 def is_query_flagged_by_llm(query: str) -> bool:
     key = _norm(query)
-    cached = _get_cache(key)
+    cached = LLM_CACHE.get(key)
+    record_cache("guard_llm", cached is not None)
     if cached is not None:
         return cached
     t0 = time.monotonic()
-    from app.clients.openAI_client import get_client
-    client = get_client(model="gpt-4o-mini", temperature=0)
+    client = ResilientModel(get_client(model="gpt-4o-mini", temperature=0))
 
     blocked = _flagged_by_llm_classifier(client, query)
-    _set_cache(key, not blocked)
+    if blocked is None:
+        # Fail open for this request only; caching it would keep allowing the query after the model recovers
+        logger.info("Guard allow: llm_unavailable | %.3fs | %r", time.monotonic()-t0, query)
+        return True
+    LLM_CACHE.set(key, not blocked)
     logger.info("Guard %s: llm_%s | %.3fs | %r",
                 "allow" if not blocked else "block",
                 "allow" if not blocked else "block",
@@ -160,10 +210,10 @@ def check_query(state: AssistantState) -> AssistantState:
     print("Checking query for guardrails...")
     query = _last_user_text(state["messages"])
 
-    # Build LLM client only inside is_query_allowed if needed (ambiguous path)
-    allowed = is_query_allowed(query, client=None)
+    verdict = check_rules(query)
+    allowed = verdict.allowed
 
-    state["guardrails"] = {"allowed": allowed}
+    state["guardrails"] = {"allowed": allowed, "category": verdict.category, "rule": verdict.rule}
     if not allowed:
         state["error"] = ("🚫 This query is restricted or off-topic. "
                           "I can help with RFIs, submittals, drawings, calculations, project knowledge, "
@@ -1,11 +1,17 @@
 # File: app/graph/nodes/rag.py
-from typing import Callable
+from typing import Callable, Optional
 from app.graph.state import AssistantState
 from langchain_openai import ChatOpenAI
-from app.services.pinecone_index import retrieve_docs
+from app.services.pinecone_index import query_namespaces
+from app.services.namespaces import request_namespaces
+from app.services.embedding import embed_text
 from app.utils import helper
+from app.services.tracing import record_retrieval, annotate
+from app.clients.model_router import ModelRouter
+from app.config import DEADLINE_TIGHT_SECONDS, DEADLINE_RERANK_MIN_SECONDS, DEADLINE_TOP_K
+from app.services.deadline import is_tight, degrade
+from app.services.output_parsing import extract_json, record_parse
 import json
-import re
 
 def rewrite_query(client: ChatOpenAI) -> Callable[[AssistantState], AssistantState]:
     def _node(state: AssistantState) -> AssistantState:
@@ -39,11 +45,56 @@ def rewrite_query(client: ChatOpenAI) -> Callable[[AssistantState], AssistantSta
     return _node
 
 
-def rerank_chunks(client: ChatOpenAI) -> Callable[[AssistantState], AssistantState]:
+def _read_ranking(content: str, count: int) -> tuple[list[int], bool]:
+    indices, repaired = extract_json(content)
+    if isinstance(indices, dict) and len(indices) == 1:
+        indices = next(iter(indices.values()))    # {"indices": [...]}
+    if not isinstance(indices, list):
+        raise ValueError("expected a JSON list of integers")
+    try:
+        indices = [int(i) for i in indices]
+    except (TypeError, ValueError):
+        raise ValueError("expected a JSON list of integers")
+    valid = [i for i in indices if 0 < i <= count]
+    if count and not valid:
+        raise ValueError("no index in range")
+    return valid, repaired
+
+def parse_ranking(content: str, count: int) -> list[int]:
+    """
+    Reads the JSON list of 1-based indices returned by the reranker, tolerating fences, prose
+    around the list, quoted numbers and a list cut off mid-way; raises ValueError if there is
+    no list of integers or none of them is in range
+    """
+    try:
+        valid, repaired = _read_ranking(content, count)
+    except ValueError:
+        record_parse("ranking", "failed")
+        raise
+    record_parse("ranking", "repaired" if repaired else "clean")
+    return valid
+
+def _ranking_problem(count: int):
+    def _check(result) -> Optional[str]:
+        try:
+            _read_ranking(result.content, count)
+        except ValueError:
+            return "parse"
+        return None
+    return _check
+
+def rerank_chunks(client: ChatOpenAI, small_client: ChatOpenAI = None) -> Callable[[AssistantState], AssistantState]:
+    router = ModelRouter("rerank", small=small_client, large=client)
     def _node(state: AssistantState) -> AssistantState:
         print("Reranking chunks...")
         query = state.get("rewritten_query", [])
         docs = state.get("retrieved_chunks", [])
+        if is_tight(DEADLINE_RERANK_MIN_SECONDS):
+            # No time for an LLM pass: keep the vector search order (already by score)
+            degrade("skip_rerank")
+            state["ranked_chunks"] = docs[:DEADLINE_TOP_K]
+            record_retrieval("ranked", len(state["ranked_chunks"]))
+            return state
 
         # Prepare input as numbered snippet list for ranking
         doc_texts = [doc.get("snippet", "") for doc in docs]
@@ -54,21 +105,17 @@ def rerank_chunks(client: ChatOpenAI) -> Callable[[AssistantState], AssistantSta
             - Do not return any explanations or commentary. Just a JSON list like: [3, 1, 7, 2, 5, ...]
         """
 
-        result = client.invoke([
+        result = router.invoke([
             {"role": "system", "content": "You are a ranking assistant. Return only the JSON list of indices."},
             {"role": "user", "content": rerank_prompt.strip()}
-        ])
+        ], check=_ranking_problem(len(docs)))
 
         try:
-            raw_output = result.content.strip()
-            # Remove markdown code block if present
-            if raw_output.startswith("```") and raw_output.endswith("```"):
-                raw_output = re.sub(r"^```(?:json)?\n|\n```$", "", raw_output.strip(), flags=re.IGNORECASE)
-
-            top_indices = json.loads(raw_output)
+            top_indices = parse_ranking(result.content, len(docs))
             # Adjust for 0-based indexing and preserve original metadata
-            ranked_docs = [docs[i - 1] for i in top_indices if 0 < i <= len(docs)]
+            ranked_docs = [docs[i - 1] for i in top_indices]
             state["ranked_chunks"] = ranked_docs
+            record_retrieval("ranked", len(ranked_docs))
         except Exception as e:
             state["ranked_chunks"] = []
             state["error"] = f"❌ Failed to parse reranked output: {str(e)}"
@@ -82,7 +129,18 @@ def retrieve_pinecone(client: ChatOpenAI) -> Callable[[AssistantState], Assistan
     def _node(state: AssistantState) -> AssistantState:
         print("Retrieving documents...")
         query = state.get("rewritten_query", [])
-        results = retrieve_docs(query, top_k=15).get("matches", [])
+        # Embed once: the vector is reused as the semantic answer cache key
+        query_embedding = embed_text(query)
+        state["query_embedding"] = query_embedding
+        # Only the shared namespace and the user's team/project namespaces are searched
+        namespaces = request_namespaces(state)
+        annotate(namespaces=len(namespaces))
+        top_k = 15
+        if is_tight(DEADLINE_TIGHT_SECONDS):
+            degrade("top_k")
+            top_k = DEADLINE_TOP_K
+        results = query_namespaces(query_embedding, namespaces, top_k=top_k).get("matches", [])
+        record_retrieval("pinecone", len(results))
         if not results:
             state["retrieved_chunks"] = []
             state["source_paths"] = []
@@ -90,6 +148,7 @@ def retrieve_pinecone(client: ChatOpenAI) -> Callable[[AssistantState], Assistan
             return state
         state["retrieved_chunks"] = [
             {
+                "id": result["id"],
                 "snippet": result["metadata"].get("snippet", ""),
                 "metadata": result["metadata"] 
             }
@@ -1,6 +1,7 @@
 # File: app/graph/nodes/respond.py
 from app.graph.state import AssistantState
 from typing import Callable
+from app.graph.nodes.coalesce import finish_flight
 
 # This node is responsible for formatting the final output for the user
 
@@ -10,4 +11,5 @@ def respond(state: AssistantState) -> AssistantState:
         state["final_answer"] = state["error"]
     elif "final_answer" not in state:
         state["final_answer"] = "⚠️ Something went wrong. Please try again later."
+    finish_flight(state)
     return state
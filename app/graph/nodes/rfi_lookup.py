@@ -1,28 +1,186 @@
 # File: app/graph/nodes/rfi_lookup.py
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PureWindowsPath, PurePosixPath
 from typing import Callable
-import pandas as pd
-from app.graph.state import AssistantState
 from langchain_openai import ChatOpenAI
+from app.graph.state import AssistantState
+from app.config import RFI_READ_WORKERS, RFI_MAX_FILES_PER_FOLDER, RFI_MAX_FOLDERS, RFI_CONTEXT_MAX_TOKENS, RFI_VECTOR_TOP_K, RFI_READ_FOLDERS, DEADLINE_TIGHT_SECONDS, DEADLINE_TOP_K
+from app.services.deadline import is_tight, degrade
+from app.services.extraction_cache import extraction_cache
+from app.services.utils import SUPPORTED_EXTENSIONS
+from app.utils.tokens import count_tokens, truncate_to_tokens
+from app.services.tracing import record_retrieval
+from app.services.namespaces import request_namespaces
+
+SUMMARY_FIELDS = ["RFI #", "Status", "RFI Description", "Sheet #/Reference", "Date Received", "Date Sent", "Ball in Court", "SSK #", "Internal NYA Comments"]
+
+def rfi_tag(link: str) -> str:
+    """
+    RFI folder name (e.g. '0016.2'), which the indexer also uses as the RFI tag
+    """
+    link = str(link or "").strip().rstrip("\\/")
+    path = PureWindowsPath(link) if "\\" in link else PurePosixPath(link)
+    return path.name
+
+def _list_files(folder: str) -> list[str]:
+    files = []
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                files.append(os.path.join(root, name))
+    return sorted(files)[:RFI_MAX_FILES_PER_FOLDER]
+
+def read_rfi_folders(folder_paths: list[str], workers: int = RFI_READ_WORKERS) -> list[dict]:
+    """
+    Reads every supported file in the RFI folders concurrently through the extraction cache
+    """
+    jobs = []
+    for folder in folder_paths:
+        if folder and os.path.isdir(folder):
+            jobs.extend((rfi_tag(folder), path) for path in _list_files(folder))
+        else:
+            print(f"RFI folder not reachable: {folder}")
+    if not jobs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        results = list(pool.map(lambda job: extraction_cache.get_chunks(job[1]), jobs))
+
+    return [
+        {"rfi": tag, "file_path": path, "chunks": chunks}
+        for (tag, path), chunks in zip(jobs, results) if chunks
+    ]
+
+def _rfi_summary(rfi: dict) -> str:
+    lines = []
+    for field in SUMMARY_FIELDS:
+        value = next((v for k, v in rfi.items() if str(k).strip() == field), None)
+        if value is None or str(value).strip() in ("", "NaT", "nan", "None"):
+            continue
+        lines.append(f"{field}: {str(value).strip()}")
+    return "\n".join(lines)
+
+def tag_variants(tag: str) -> list[str]:
+    """
+    Folder names are zero-padded inconsistently ('004' vs '0004'), so match all common forms
+    """
+    variants = [tag]
+    base, dot, suffix = tag.partition(".")
+    if base.isdigit():
+        for width in (0, 3, 4):
+            variant = base.lstrip("0").zfill(width) + dot + suffix
+            if variant and variant not in variants:
+                variants.append(variant)
+    return variants
+
+def query_rfi_chunks(query: str, rfi_tags: list[str], top_k: int = RFI_VECTOR_TOP_K, namespaces: list[str] = None) -> list[dict]:
+    """
+    Runs a single vector search restricted to chunks tagged with any of the matched RFI numbers
+    and returns them ranked by score, in the ranked_chunks shape
+    """
+    if not query or not rfi_tags:
+        return []
+    variants = {v: tag for tag in rfi_tags for v in tag_variants(tag)}
+    rfi_filter = {"doc_type": {"$eq": "RFI"}, "tags": {"$in": list(variants)}}
+    try:
+        from app.services.pinecone_index import retrieve_docs
+        matches = retrieve_docs(query, top_k=top_k, filter=rfi_filter, namespaces=namespaces).get("matches", [])
+    except Exception as e:
+        print(f"RFI vector search failed: {e}")
+        return []
 
-# Temporary stubs for RFI lookup nodes
+    chunks = []
+    for match in sorted(matches, key=lambda m: m.get("score", 0), reverse=True):
+        metadata = dict(match.get("metadata") or {})
+        tag = next((variants[t] for t in metadata.get("tags", []) if t in variants), "")
+        metadata["rfi"] = tag
+        chunks.append({"id": match.get("id"), "score": match.get("score"), "snippet": metadata.get("snippet", ""), "metadata": metadata})
+    return chunks
+
+def build_rfi_context(rfi_matches: list[dict], folder_contents: list[dict], max_tokens: int = RFI_CONTEXT_MAX_TOKENS, rfi_chunks: list[dict] = None) -> tuple[str, list[dict]]:
+    """
+    Packs RFI log entries, then vector-search chunks in rank order, then folder chunks
+    (round-robin across RFIs so no single RFI crowds out the rest) into at most max_tokens
+    tokens. Returns the context text and the chunks in the ranked_chunks shape used by
+    generate_answer.
+    """
+    budget = max_tokens
+    selected: list[dict] = []
+
+    def _take(snippet: str, metadata: dict) -> bool:
+        nonlocal budget
+        cost = count_tokens(snippet)
+        if cost > budget:
+            snippet = truncate_to_tokens(snippet, budget)
+            cost = count_tokens(snippet)
+            if not snippet.strip():
+                return False
+        budget -= cost
+        selected.append({"snippet": snippet, "metadata": metadata})
+        return budget > 0
+
+    for rfi in rfi_matches:
+        link = str(rfi.get("Link", "") or "")
+        summary = _rfi_summary(rfi)
+        if summary and not _take(summary, {"file_path": link or "RFI log", "rfi": rfi_tag(link), "doc_type": "RFI log entry"}):
+            break
+
+    for chunk in rfi_chunks or []:
+        if budget <= 0 or not _take(chunk["snippet"], chunk["metadata"]):
+            break
+
+    queues: dict[str, deque] = {}
+    for entry in folder_contents:
+        queue = queues.setdefault(entry["rfi"], deque())
+        queue.extend((entry["file_path"], i, chunk) for i, chunk in enumerate(entry["chunks"]))
+
+    while budget > 0 and any(queues.values()):
+        for tag, queue in queues.items():
+            if not queue:
+                continue
+            file_path, chunk_id, chunk = queue.popleft()
+            if not _take(chunk, {"file_path": file_path, "rfi": tag, "chunk_id": chunk_id, "doc_type": "RFI"}):
+                break
+
+    context = "\n\n".join(f"[RFI {c['metadata']['rfi']}] {c['metadata']['file_path']}\n{c['snippet']}" for c in selected)
+    return context, selected
 
 def match_rfis(client: ChatOpenAI) -> Callable[[AssistantState], AssistantState]:
     def _node(state: AssistantState) -> AssistantState:
+        print("Matching RFIs...")
         folder_paths = []
-        for rfi in state["rfi_matches"]:
-            folder_paths.append(rfi['Link'])
+        for rfi in state.get("rfi_matches", []):
+            link = rfi.get("Link")
+            if link and link not in folder_paths:
+                folder_paths.append(link)
+        if len(folder_paths) > RFI_MAX_FOLDERS:
+            # Bounds the tag filter and the network drive walk; matches come ranked from the query
+            print(f"Searching the first {RFI_MAX_FOLDERS} of {len(folder_paths)} matched RFI folders")
+            folder_paths = folder_paths[:RFI_MAX_FOLDERS]
         state["rfi_folder_paths"] = folder_paths
-        #print(state["rfi_matches"])
-        #print(state["rfi_folder_paths"])
-        state["folder_contents"] = []
+
+        # Short on time: fewer vector hits and no network drive reads
+        tight = is_tight(DEADLINE_TIGHT_SECONDS)
+        if tight:
+            degrade("rfi_top_k")
+        top_k = DEADLINE_TOP_K if tight else RFI_VECTOR_TOP_K
+        rfi_chunks = query_rfi_chunks(state.get("rewritten_query", ""), [rfi_tag(p) for p in folder_paths], top_k=top_k, namespaces=request_namespaces(state))
+        state["rfi_chunks"] = rfi_chunks
+        record_retrieval("rfi_chunks", len(rfi_chunks))
+
+        read_folders = not tight and (RFI_READ_FOLDERS == "always" or (RFI_READ_FOLDERS == "fallback" and not rfi_chunks))
+        state["folder_contents"] = read_rfi_folders(folder_paths) if read_folders else []
+        record_retrieval("rfi_files", len(state["folder_contents"]))
         return state
     return _node
 
 def rfi_combine_context(client: ChatOpenAI) -> Callable[[AssistantState], AssistantState]:
     def _node(state: AssistantState) -> AssistantState:
-        state["context"] = ""
+        print("Combining RFI context...")
+        context, chunks = build_rfi_context(state.get("rfi_matches", []), state.get("folder_contents", []), rfi_chunks=state.get("rfi_chunks", []))
+        state["context"] = context
+        state["ranked_chunks"] = chunks
         return state
     return _node
-
-def query_rfi_chunks(query:str, top_k:int = 10):
-    pass
\ No newline at end of file
@@ -14,9 +14,17 @@ class AssistantState(TypedDict, total=False):
     thread_preview: str             # compact running conversation history (5 words)
     rewritten_query: Optional[str]  # Rewritten vague query
     previous_rewrites: Optional[str] # Previous rewritten queries (if any)
+    structured_query: Optional[dict] # RFIQuery fields for the no-codegen fast path
+    namespaces: List[str]           # Pinecone namespaces this request searches (shared + user's team)
+    coalesce_token: Optional[str]   # Set when this request leads a single-flight execution
+    coalesced: bool                 # final_answer was reused from an identical in-flight request
+    degraded: Optional[str]         # Why final_answer is a best-effort answer ('deadline'); never cached or shared
 
     # Excel analysis
     code: str                       # Generated pandas code
+    code_cache_key: Optional[str]   # Key of the generated code in the code cache
+    code_model: Optional[str]       # Model tier that wrote `code` ('small' | 'large')
+    codegen_escalation: Optional[str] # Why code generation was re-run on the large model
     output: str                     # Output from code execution
     plot_images: List[str]          # Base64 encoded plot images
     executed: bool                  # Whether the code has been executed
@@ -24,11 +32,14 @@ class AssistantState(TypedDict, total=False):
     # RFI-specific path
     rfi_matches: List[dict]         # Matching rows from Excel
     rfi_folder_paths: List[str]     # File paths to RFI folders
-    folder_contents: List[str]      # Read text from files
+    rfi_chunks: List[dict]          # Indexed chunks of the matched RFIs from vector search
+    folder_contents: List[dict]     # Extracted chunks per RFI file ({rfi, file_path, chunks})
     context: str                    # Aggregated metadata + folder text
 
     # General search context (Pinecone-based)
-    retrieved_chunks: List[str]     # Contextual chunks from semantic search
+    query_embedding: List[float]    # Embedding of rewritten_query (semantic answer cache key)
+    answer_cache_hit: bool          # final_answer was served from the answer cache
+    retrieved_chunks: List[dict]    # Contextual chunks from semantic search ({id, snippet, metadata})
     source_paths: List[str]         # Source file paths from Pinecone
     ranked_chunks: List[str]        # Ranked chunks from semantic search
 
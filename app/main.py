@@ -1,14 +1,48 @@
 # app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Literal, Dict, Any
+from contextlib import asynccontextmanager
+import asyncio
 import json
-from app.graph.assistant import assistant_graph  # your LangGraph pipeline
+from app.graph.assistant import aget_assistant_graph, arun_within_deadline, get_assistant_graph, warmup_status  # your LangGraph pipeline (built lazily)
+from app.graph.nodes.generate import partial_answer
 from app.db.supabase_client import supabase_client
+from app.services.plot_store import PlotStore, absolute_plot_urls, media_type
+from app.services.thread_store import ThreadStore
+from app.routes.chat import router as chat_router, message_writer
+from app.clients.openAI_client import close_clients, get_async_http_client
+from app.services.metrics import metrics
+from app.services.tracing import trace_request
+from app.services.single_flight import flight_scope
+from app.services.resilience import DependencyError, circuit_states, unavailable_message
+from app.services.deadline import DEADLINE_MESSAGE, with_deadline, seconds_left, exceeded
+from app.config import DEADLINE_GRACE_SECONDS
 
-app = FastAPI()
+thread_store = ThreadStore(supabase_client)
+
+async def _warm_up():
+    try:
+        await asyncio.to_thread(get_assistant_graph)
+    except Exception as e:
+        print(f"Assistant warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await thread_store.start()
+    # Build the graph in the background so /health answers immediately; /ready reports progress
+    warmup = asyncio.create_task(_warm_up())
+    yield
+    warmup.cancel()
+    # Flush pending thread and message writes, then release the shared OpenAI connection pools
+    await thread_store.close()
+    await message_writer.close()
+    await get_async_http_client().aclose()
+    close_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for your frontend (adjust allowed origins in prod)
 app.add_middleware(
@@ -19,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /chat, /threads and /messages
+app.include_router(chat_router)
+
 # Input model from frontend
 class Message(BaseModel):
     role: Literal["user", "assistant"]
@@ -34,7 +71,9 @@ STEP_LABELS: Dict[str, str] = {
     "rewrite_query": "Rewriting Query...",
     "classify_query": "Classify Query...",
     "retrieve_pinecone": "Retrieving info...",
+    "lookup_cached_answer": "Checking answer cache...",
     "rerank_chunks": "Reranking chunks...",
+    "structured_query": "Querying RFI log...",
     "generate_code": "Generating code...",
     "execute_code": "Executing code...",
     "match_rfis": "Matching RFIs...",
@@ -42,10 +81,11 @@ STEP_LABELS: Dict[str, str] = {
     "generate_answer": "Drafting Answer...",
     "respond": "Responding...",
     "check_query": "Checking query...",
+    "coalesce": "Checking in-flight requests...",
 }
 
 
-def ndjson(event_type: str, data: Dict[str, Any]) -> str:
+def _ndjson(event_type: str, data: Dict[str, Any]) -> str:
     return json.dumps({"type": event_type, "data": data}) + "\n"
 
 def normalize_rewrites(raw):
@@ -57,20 +97,20 @@ def normalize_rewrites(raw):
         return [item.strip("'\"") for item in items if item.strip()]
     return []
 
+plot_store = PlotStore()
+
 @app.post("/generate-stream")
-async def generate_stream(payload: RequestPayload):
+async def generate_stream(payload: RequestPayload, request: Request):
+    base_url = str(request.base_url)
     try:
+        # The request's time budget starts now and travels with the graph config
+        cfg = with_deadline({"configurable": {"id": payload.thread_id, "user_id": payload.user_id}})
+
         # 1) Fetch prior summary/preview (same as /generate)
-        prior = (
-            supabase_client.table("threads")
-            .select("summary", "thread_preview")
-            .eq("user_id", payload.user_id)
-            .eq("id", payload.thread_id)
-            .maybe_single()
-            .execute()
-        )
-        prior_summary = (prior.data or {}).get("summary", "") or ""
-        prior_preview = (prior.data or {}).get("thread_preview", "") or ""
+        prior = await thread_store.get(payload.user_id, payload.thread_id)
+        prior_summary = prior.get("summary", "") or ""
+        prior_preview = prior.get("thread_preview", "") or ""
+        previous_rewrites = normalize_rewrites(prior.get("previous_rewrites", ""))
 
         # 2) Trim messages to last 5 (same as /generate)
         last_n = 5
@@ -83,8 +123,8 @@ async def generate_stream(payload: RequestPayload):
             "id": payload.thread_id,
             "messages": trimmed_msgs,
             "history": prior_summary or "(none)",
+            "previous_rewrites": previous_rewrites,
         }
-        cfg = {"configurable": {"id": payload.thread_id, "user_id": payload.user_id}}
 
         # 4) Stream LangGraph updates as NDJSON
         async def gen():
@@ -92,46 +132,75 @@ async def generate_stream(payload: RequestPayload):
 
             last_history = prior_summary
             last_preview = prior_preview
+            last_rewrites = previous_rewrites
             last_answer = None
+            latest = dict(state)
+
+            # NOTE: .astream(...) yields per-node updates/diffs; sync nodes run in a thread pool.
+            # The full state after each step ("values") is kept for a best-effort answer on timeout
+            assistant_graph = await aget_assistant_graph()
+            with trace_request("generate-stream", thread_id=payload.thread_id) as trace, flight_scope():
+                try:
+                    # Nodes degrade as the deadline nears; this only fires if one overruns it anyway
+                    async with asyncio.timeout(seconds_left(cfg) + DEADLINE_GRACE_SECONDS):
+                        async for mode, update in assistant_graph.astream(state, config=cfg, stream_mode=["updates", "values"]):
+                            if mode == "values":
+                                latest = update
+                                continue
+                            # update may be {"node_name": {...}} or include a "path"
+                            if isinstance(update, dict):
+                                for node_name, data in update.items():
+                                    label = STEP_LABELS.get(str(node_name), str(node_name))
+                                    # announce node progress, with the node's timing once it has finished
+                                    event = {"stage": "node", "node": node_name, "label": label}
+                                    span = trace.last_span(str(node_name))
+                                    if span is not None:
+                                        event["timing"] = span.to_dict()
+                                    yield _ndjson("status", event)
 
-            # NOTE: .stream(...) should yield per-node updates/diffs
-            for update in assistant_graph.stream(state, config=cfg, stream_mode="updates"):
-                # update may be {"node_name": {...}} or include a "path"
-                if isinstance(update, dict):
-                    for node_name, data in update.items():
-                        label = STEP_LABELS.get(str(node_name), str(node_name))
-                        # announce node progress
-                        yield _ndjson("status", {"stage": "node", "node": node_name, "label": label})
-
-                        if isinstance(data, dict):
-                            # forward interesting partials if present
-                            if "analysis" in data:
-                                yield _ndjson("analysis_partial", {"text": data["analysis"]})
-                            if "code" in data:
-                                yield _ndjson("code_partial", {"code": data["code"]})
-                            if "output" in data:
-                                yield _ndjson("output_partial", {"text": data["output"]})
-                            if "plot_images" in data:
-                                yield _ndjson("plots", {"images": data["plot_images"]})
-                            if "final_answer" in data:
-                                last_answer = data["final_answer"]
-                                yield _ndjson("final_partial", {"text": last_answer})
-                            if "history" in data:
-                                last_history = data["history"] or last_history
-                            if "thread_preview" in data:
-                                last_preview = data["thread_preview"] or last_preview
-
-            # 5) Persist summary/preview at the end (same as /generate)
-            supabase_client.table("threads").upsert({
-                "user_id": payload.user_id,
-                "id": payload.thread_id,
-                "summary": last_history or prior_summary or "",
-                "thread_preview": last_preview or prior_preview or "",
-            }).execute()
+                                    if isinstance(data, dict):
+                                        # forward interesting partials if present
+                                        if "analysis" in data:
+                                            yield _ndjson("analysis_partial", {"text": data["analysis"]})
+                                        if "code" in data:
+                                            yield _ndjson("code_partial", {"code": data["code"]})
+                                        if "output" in data:
+                                            yield _ndjson("output_partial", {"text": data["output"]})
+                                        if "plot_images" in data:
+                                            yield _ndjson("plots", {"images": absolute_plot_urls(data["plot_images"], base_url)})
+                                        if "final_answer" in data:
+                                            last_answer = data["final_answer"]
+                                            yield _ndjson("final_partial", {"text": last_answer})
+                                        if "history" in data:
+                                            last_history = data["history"] or last_history
+                                        if "thread_preview" in data:
+                                            last_preview = data["thread_preview"] or last_preview
+                                        if "previous_rewrites" in data:
+                                            last_rewrites = data["previous_rewrites"] or last_rewrites
+                except TimeoutError:
+                    # Best effort from the steps that finished; their summary and rewrites are still persisted below
+                    exceeded("api")
+                    last_answer = last_answer or partial_answer(latest)
+                    yield _ndjson("final_partial", {"text": last_answer})
+                    yield _ndjson("error", {"message": DEADLINE_MESSAGE, "partial": True})
+                except DependencyError as e:
+                    # Fast-fail: a dependency is down (circuit open or retries exhausted)
+                    yield _ndjson("error", {"message": unavailable_message(e), "dependency": e.dependency})
+                    yield _ndjson("done", {"timings": trace.timings()})
+                    return
+
+            # 5) Persist summary/preview at the end (written behind, same as /generate)
+            thread_store.put(
+                payload.user_id, payload.thread_id,
+                summary=last_history or prior_summary or "",
+                thread_preview=last_preview or prior_preview or "",
+                previous_rewrites=last_rewrites,
+            )
 
             yield _ndjson("done", {
                 "thread_preview": last_preview or "",
                 "updated_summary": last_history or "",
+                "timings": trace.timings(),
                 # you can echo last_answer if you want a final payload too
             })
 
@@ -156,21 +225,37 @@ def root():
 def health_check():
     return {"ok": True}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    # Prometheus text format; values are per worker process
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready_check():
+    status = warmup_status()
+    # Circuit breaker states per dependency (informational; an open circuit does not fail readiness)
+    status["circuits"] = circuit_states()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/plots/{name}")
+def get_plot(name: str):
+    path = plot_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Plot not found")
+    # Names are content hashes, so the blob never changes
+    return FileResponse(path, media_type=media_type(name), headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 @app.post("/generate")
-async def generate_response(payload: RequestPayload):
+async def generate_response(payload: RequestPayload, request: Request):
     try:
+        # The request's time budget starts now and travels with the graph config
+        cfg = with_deadline({"configurable": {"id": payload.thread_id, "user_id": payload.user_id}})
+
         # Get prior summary
-        prior = (
-            supabase_client.table("threads")
-            .select("summary", "thread_preview", "previous_rewrites")
-            .eq("user_id", payload.user_id)
-            .eq("id", payload.thread_id)
-            .maybe_single()
-            .execute()
-        )
-        prior_summary = (prior.data or {}).get("summary", "")
-        prior_preview = (prior.data or {}).get("thread_preview", "")
-        previous_rewrites = (prior.data or {}).get("previous_rewrites", "")
+        prior = await thread_store.get(payload.user_id, payload.thread_id)
+        prior_summary = prior.get("summary", "") or ""
+        prior_preview = prior.get("thread_preview", "") or ""
+        previous_rewrites = prior.get("previous_rewrites", "") or ""
         print("Main (previous_rewrites)", previous_rewrites)
         previous_rewrites = normalize_rewrites(previous_rewrites)
         print("Main (previous_rewrites)", previous_rewrites)
@@ -189,30 +274,40 @@ async def generate_response(payload: RequestPayload):
             "previous_rewrites": previous_rewrites
         }
 
-        cfg = {"configurable": {"id": payload.thread_id, "user_id": payload.user_id}}
-        result = assistant_graph.invoke(state, config=cfg)
+        assistant_graph = await aget_assistant_graph()
+        with trace_request("generate", thread_id=payload.thread_id), flight_scope():
+            # Past the deadline this is a best-effort answer from the last finished step (result["error"] is set)
+            result = await arun_within_deadline(assistant_graph, state, cfg)
         updated_summary = result.get("history", prior_summary or "")
         preview = result.get("thread_preview", prior_preview or "")
         previous_rewrites = result.get("previous_rewrites", previous_rewrites or "")
         
-        supabase_client.table("threads").upsert({
-            "user_id": payload.user_id,
-            "id": payload.thread_id,
-            "summary": updated_summary,
-            "thread_preview": preview,
-            "previous_rewrites": previous_rewrites
-        }).execute()
+        thread_store.put(
+            payload.user_id, payload.thread_id,
+            summary=updated_summary,
+            thread_preview=preview,
+            previous_rewrites=previous_rewrites,
+        )
 
         
-        return {
+        response = {
             "final_answer": result.get("final_answer", "[No answer generated]"),
             "analysis": result.get("analysis", "[No analysis generated]"),
             "code": result.get("code", "[No code generated]"),
-            "plot_images": result.get("plot_images", []),
+            "plot_images": absolute_plot_urls(result.get("plot_images", []), str(request.base_url)),
             "thread_preview": preview,
             "updated_summary": updated_summary
         }
+        if result.get("degraded"):
+            response["error"] = result.get("error") or "request deadline exceeded"
+        return response
 
+    except DependencyError as e:
+        # Fast-fail: a dependency is down (circuit open or retries exhausted)
+        return {
+            "final_answer": unavailable_message(e),
+            "error": str(e)
+        }
     except Exception as e:
         return {
             "final_answer": "[Error in assistant graph]",
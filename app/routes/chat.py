@@ -1,46 +1,70 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from app.models.schemas import ChatRequest, ThreadCreate
 from app.db.supabase_client import supabase_client
-from app.graph.assistant import assistant_graph
+from app.graph.assistant import aget_assistant_graph, arun_within_deadline
+from app.services.tracing import trace_request
+from app.services.single_flight import flight_scope
+from app.services.resilience import DependencyError, call, unavailable_message
+from app.services.message_store import MessageWriter, fetch_page
+from app.services.deadline import with_deadline
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+# Flushed by the app's lifespan (app/main.py) before the worker exits
+message_writer = MessageWriter(supabase_client)
 
 router = APIRouter()
 
 @router.post("/chat")
-def chat(req: ChatRequest):
-    supabase_client.table("messages").insert({
+async def chat(req: ChatRequest):
+    cfg = with_deadline({"configurable": {"id": req.thread_id, "user_id": req.user_id}})
+    message_writer.enqueue({
         "thread_id": req.thread_id,
         "user_id": req.user_id,
         "role": "user",
         "content": req.message
-    }).execute()
+    })
 
     state = {
         "user_id": req.user_id,
         "thread_id": req.thread_id,
-        "messages": [{"role": "user", "content": req.message}]
+        "messages": [{"role": "user", "content": req.message}],
+        "previous_rewrites": [],
     }
 
-    result = assistant_graph.invoke(state)
-    answer = result.get("final_answer", "")
+    assistant_graph = await aget_assistant_graph()
+    try:
+        with trace_request("chat", thread_id=req.thread_id), flight_scope():
+            result = await arun_within_deadline(assistant_graph, state, cfg)
+        answer = result.get("final_answer", "")
+    except DependencyError as e:
+        answer = unavailable_message(e)
 
-    supabase_client.table("messages").insert({
+    message_writer.enqueue({
         "thread_id": req.thread_id,
         "user_id": req.user_id,
         "role": "assistant",
         "content": answer
-    }).execute()
+    })
 
     return {"answer": answer}
 
 @router.post("/threads")
-def create_thread(thread: ThreadCreate):
-    supabase_client.table("threads").insert(thread.model_dump()).execute()
+async def create_thread(thread: ThreadCreate):
+    await asyncio.to_thread(call, "supabase", lambda: supabase_client.table("threads").insert(thread.model_dump()).execute(), retries=0)
     return {"status": "created", "thread_id": thread.thread_id}
 
+async def _page(query, limit: int, cursor: Optional[str]) -> dict:
+    try:
+        return await asyncio.to_thread(fetch_page, query, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/threads")
-def get_threads(user_id: str):
-    return supabase_client.table("threads").select("*").eq("user_id", user_id).order("created_at").execute().data
+async def get_threads(user_id: str, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None):
+    return await _page(supabase_client.table("threads").select("*").eq("user_id", user_id), limit, cursor)
 
 @router.get("/messages")
-def get_messages(thread_id: str):
-    return supabase_client.table("messages").select("*").eq("thread_id", thread_id).order("created_at").execute().data
+async def get_messages(thread_id: str, limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX), cursor: Optional[str] = None):
+    return await _page(supabase_client.table("messages").select("*").eq("thread_id", thread_id), limit, cursor)
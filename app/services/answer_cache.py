@@ -0,0 +1,130 @@
+# app/services/answer_cache.py
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from app.config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY
+from app.services.ttl_cache import TTLCache
+
+MAX_ENTRIES_PER_SOURCES = 8
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    answer: str
+    expires_at: float
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+def sources_key(chunks: list[dict]) -> Optional[str]:
+    """
+    Fingerprint of the retrieved chunk set: ids plus a hash of each snippet, so a chunk that is
+    reindexed with new text (same id) no longer matches. None if any chunk has no id.
+    """
+    parts = []
+    for chunk in chunks:
+        chunk_id = chunk.get("id")
+        if not chunk_id:
+            return None
+        snippet_hash = hashlib.sha1(chunk.get("snippet", "").encode("utf-8")).hexdigest()
+        parts.append(f"{chunk_id}:{snippet_hash}")
+    if not parts:
+        return None
+    return hashlib.sha256("\n".join(sorted(parts)).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of cited answers. Entries are grouped by the retrieved sources; within a group
+    a query embedding whose cosine similarity to a stored one is at least `threshold` reuses that answer.
+    """
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS, threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        # Groups by sources key, LRU with a TTL refreshed on every store; each answer also expires on its own.
+        # Every access happens under self._lock, which the eviction hook relies on.
+        self._groups = TTLCache(max_entries, ttl_seconds, on_evict=lambda key, _: self._drop_group_locked(key))
+        self._chunk_groups: dict[str, set[str]] = {}
+        self._group_chunks: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding, chunks: list[dict]) -> Optional[dict]:
+        key = sources_key(chunks)
+        if key is None:
+            return None
+        query = _unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            entries = [e for e in self._groups.get(key, []) if e.expires_at > now]
+            best, best_score = None, self.threshold
+            for entry in entries:
+                score = float(np.dot(query, entry.vector))
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"answer": best.answer, "similarity": best_score}
+
+    def store(self, embedding, chunks: list[dict], answer: str) -> bool:
+        key = sources_key(chunks)
+        if key is None or not answer:
+            return False
+        entry = _Entry(_unit(embedding), answer, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            now = time.monotonic()
+            entries = [e for e in self._groups.get(key, []) if e.expires_at > now] + [entry]
+            if key not in self._group_chunks:
+                ids = [c["id"] for c in chunks]
+                self._group_chunks[key] = ids
+                for chunk_id in ids:
+                    self._chunk_groups.setdefault(chunk_id, set()).add(key)
+            self._groups.set(key, entries[-MAX_ENTRIES_PER_SOURCES:])
+        return True
+
+    def invalidate_chunks(self, chunk_ids) -> int:
+        """
+        Drops every cached answer built on any of these chunks (call when they are reindexed)
+        """
+        dropped = 0
+        with self._lock:
+            for chunk_id in chunk_ids:
+                for key in list(self._chunk_groups.get(chunk_id, ())):
+                    if self._groups.delete(key):
+                        dropped += 1
+                    self._drop_group_locked(key)
+        return dropped
+
+    def _drop_group_locked(self, key: str) -> None:
+        for chunk_id in self._group_chunks.pop(key, []):
+            groups = self._chunk_groups.get(chunk_id)
+            if groups is not None:
+                groups.discard(key)
+                if not groups:
+                    del self._chunk_groups[chunk_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._groups.clear()
+            self._chunk_groups.clear()
+            self._group_chunks.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"groups": len(self._groups), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,87 @@
+# app/services/code_cache.py
+import ast
+import hashlib
+import re
+import threading
+from typing import Optional
+import pandas as pd
+from app.config import CODE_CACHE_MAX_ENTRIES, CODE_CACHE_TTL_SECONDS
+from app.services.ttl_cache import TTLCache
+
+def schema_version(df: pd.DataFrame) -> str:
+    """
+    Computes a short fingerprint of the DataFrame columns and dtypes
+    """
+    schema = "|".join(f"{col}:{dtype}" for col, dtype in df.dtypes.items())
+    return hashlib.sha1(schema.encode("utf-8")).hexdigest()[:12]
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a rewritten query so trivially different phrasings share a cache entry
+    """
+    text = (query or "").lower()
+    text = re.sub(r"[\"'`]", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .?!")
+
+def is_valid_code(code: str) -> bool:
+    """
+    Checks that the code parses as Python
+    """
+    try:
+        ast.parse(code)
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
+class CodeCache:
+    """
+    LRU cache of generated pandas code keyed by normalized intent and DataFrame schema version
+    """
+    def __init__(self, max_entries: int = CODE_CACHE_MAX_ENTRIES, ttl_seconds: float = CODE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = TTLCache(max_entries, ttl_seconds)
+        self._schema: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, query_class: Optional[str], query_subclass: Optional[str], schema: str) -> str:
+        raw = "\x1f".join([normalize_query(query), query_class or "", query_subclass or "", schema])
+        return f"{schema}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def put(self, key: str, code: str) -> bool:
+        """
+        Stores code that executed successfully. Returns False if the code is rejected.
+        """
+        if not code.strip() or not is_valid_code(code):
+            return False
+        schema = key.split(":", 1)[0]
+        with self._lock:
+            # Code written for another schema would run against the wrong columns
+            if schema != self._schema:
+                self._entries.clear()
+                self._schema = schema
+            self._entries.set(key, code)
+        return True
+
+    def evict(self, key: str) -> None:
+        self._entries.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._schema = None
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+code_cache = CodeCache()
@@ -0,0 +1,374 @@
+# app/services/code_executor.py
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+import traceback
+import asyncio
+import multiprocessing as mp
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+import pandas as pd
+import pyarrow as pa
+from app.config import (
+    EXECUTOR_MODE,
+    EXECUTOR_WORKERS,
+    EXECUTOR_TIMEOUT_SECONDS,
+    EXECUTOR_CPU_SECONDS,
+    EXECUTOR_MEMORY_MB,
+    EXCEL_ZERO_COPY,
+)
+from app.services.excel_cache import publish_arrow, load_arrow
+from app.services.plot_store import capture_figures
+
+@dataclass
+class ExecutionResult:
+    output: str = ""
+    error: Optional[str] = None
+    plot_images: list[str] = field(default_factory=list)
+    duration: float = 0.0
+    tables: list[pa.Table] = field(default_factory=list)  # Results passed to emit(...)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    @property
+    def emitted(self) -> bool:
+        return bool(self.tables)
+
+    def records(self) -> list[dict]:
+        """
+        Returns every emitted row as a plain dict (timestamps as datetime, missing values as None)
+        """
+        rows = []
+        for table in self.tables:
+            rows.extend(table.to_pylist())
+        return rows
+
+    def to_frame(self) -> pd.DataFrame:
+        frames = [table.to_pandas() for table in self.tables]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def to_arrow_table(obj: Any) -> pa.Table:
+    """
+    Converts a value passed to emit(...) into an Arrow table
+    """
+    if isinstance(obj, pa.Table):
+        return obj
+    if isinstance(obj, pd.Series):
+        obj = obj.reset_index() if obj.index.name or not isinstance(obj.index, pd.RangeIndex) else obj.to_frame()
+    if isinstance(obj, pd.DataFrame):
+        frame = obj if isinstance(obj.index, pd.RangeIndex) else obj.reset_index()
+        frame = frame.rename(columns=str)
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    if isinstance(obj, dict):
+        obj = [obj]
+    if isinstance(obj, (list, tuple)):
+        if all(isinstance(row, dict) for row in obj):
+            return pa.Table.from_pandas(pd.DataFrame(list(obj)), preserve_index=False)
+        return pa.table({"value": list(obj)})
+    return pa.table({"value": [obj]})
+
+
+class _Emitter:
+    """
+    The `emit(df_or_records)` hook exposed to generated code
+    """
+    def __init__(self):
+        self.tables: list[pa.Table] = []
+
+    def __call__(self, obj: Any) -> None:
+        self.tables.append(to_arrow_table(obj))
+
+
+def client_spec(client: Any) -> Optional[dict]:
+    """
+    Describes a ChatOpenAI client so a worker process can build an equivalent one
+    """
+    if client is None:
+        return None
+    return {
+        "model": getattr(client, "model_name", None) or getattr(client, "model", "gpt-4o-mini"),
+        "temperature": getattr(client, "temperature", 0) or 0,
+    }
+
+def _run_code(code: str, namespace: dict) -> ExecutionResult:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    plt.close("all")
+    buf = io.StringIO()
+    emitter = _Emitter()
+    namespace["emit"] = emitter
+    t0 = time.monotonic()
+    error = None
+    try:
+        with redirect_stdout(buf):
+            exec(code, namespace)
+    except Exception as e:
+        error = f"❌ Error during execution: {str(e) or type(e).__name__}"
+    output = buf.getvalue() if error is None else error
+    return ExecutionResult(output=output, error=error, plot_images=capture_figures(),
+                           duration=time.monotonic() - t0, tables=emitter.tables if error is None else [])
+
+
+# --- Worker process ---
+def _apply_limits(memory_mb: int):
+    try:
+        import resource
+    except ImportError:  # Windows: no rlimits, rely on the wall-clock timeout
+        return
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _set_cpu_budget(cpu_seconds: int):
+    try:
+        import resource
+    except ImportError:
+        return
+    if cpu_seconds > 0:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime) + 1
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _worker_main(conn, frame_path: str, zero_copy: bool, memory_mb: int, cpu_seconds: int):
+    import matplotlib
+    matplotlib.use("Agg")
+    df = load_arrow(Path(frame_path), zero_copy=zero_copy)
+    # The client stack is imported before the memory limit applies: its imports reserve far more
+    # address space than they use and would fail under RLIMIT_AS on the first job with a client
+    from app.clients.openAI_client import get_client
+    import langchain_openai  # noqa: F401
+    _apply_limits(memory_mb)
+    clients: dict[tuple, Any] = {}
+    conn.send({"ready": True})
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        namespace = {"df": df.copy(deep=False)}
+        spec = job.get("client")
+        if spec:
+            key = (spec["model"], spec["temperature"])
+            if key not in clients:
+                clients[key] = get_client(model=spec["model"], temperature=spec["temperature"])
+            namespace["client"] = clients[key]
+
+        _set_cpu_budget(cpu_seconds)
+        try:
+            result = _run_code(job["code"], namespace)
+        except BaseException:
+            result = ExecutionResult(error=f"❌ Error during execution: {traceback.format_exc(limit=1)}")
+            result.output = result.error
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self, ctx, frame_path: str, zero_copy: bool, memory_mb: int, cpu_seconds: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, frame_path, zero_copy, memory_mb, cpu_seconds),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = bool(self.conn.recv().get("ready"))
+        return self.ready
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        finally:
+            self.conn.close()
+
+
+class SubprocessExecutor:
+    """
+    Pool of pre-warmed worker processes that each hold the DataFrame and run generated code
+    under CPU / wall-clock / memory limits. Results come back over a pipe, so concurrent
+    requests never share stdout or matplotlib state.
+
+    Workers memory-map `frame_path` (the Arrow file published by the Excel cache); if none is
+    given the frame is published to a temporary file owned by the pool.
+    """
+    def __init__(self, df: pd.DataFrame, workers: int = EXECUTOR_WORKERS, timeout: float = EXECUTOR_TIMEOUT_SECONDS,
+                 cpu_seconds: int = EXECUTOR_CPU_SECONDS, memory_mb: int = EXECUTOR_MEMORY_MB, frame_path: Optional[Path] = None,
+                 zero_copy: bool = EXCEL_ZERO_COPY):
+        self.timeout = timeout
+        self.zero_copy = zero_copy
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._ctx = mp.get_context("spawn")
+        self._owns_frame = frame_path is None
+        self._frame_path = str(frame_path) if frame_path else self._write_frame(df)
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._busy: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._size = max(1, workers)
+        for _ in range(self._size):
+            self._idle.put(self._spawn())
+
+    @staticmethod
+    def _write_frame(df: pd.DataFrame) -> str:
+        fd, path = tempfile.mkstemp(prefix="rfi_frame_", suffix=".arrow")
+        os.close(fd)
+        return str(publish_arrow(df, Path(path)))
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self._frame_path, self.zero_copy, self.memory_mb, self.cpu_seconds)
+
+    def run(self, code: str, client: Any = None, timeout: Optional[float] = None) -> ExecutionResult:
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        if self._closed:
+            return _closed_result()
+        try:
+            # Every worker busy: wait for one only as long as the run itself may take
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            error = f"❌ Error during execution: no worker became free within {timeout:.0f}s"
+            return ExecutionResult(output=error, error=error, duration=timeout)
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._busy.add(worker)
+        if closed:
+            # close() ran while this call waited for the worker
+            worker.kill()
+            return _closed_result()
+        try:
+            if not worker.wait_ready(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError
+            worker.conn.send({"code": code, "client": client_spec(client)})
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError
+            result = worker.conn.recv()
+        except TimeoutError:
+            worker.kill()
+            worker = self._respawn(worker)
+            error = f"❌ Error during execution: timed out after {timeout:.0f}s"
+            return ExecutionResult(output=error, error=error, duration=timeout)
+        except (EOFError, OSError):
+            if self._closed:
+                # Killed by close() mid-run
+                worker = None
+                return _closed_result()
+            # Worker died (memory or CPU limit exceeded)
+            worker.process.join(1)
+            exitcode = worker.process.exitcode
+            worker.kill()
+            worker = self._respawn(worker)
+            error = f"❌ Error during execution: worker exited (code {exitcode}), resource limit exceeded"
+            return ExecutionResult(output=error, error=error)
+        finally:
+            self._release(worker)
+        return result
+
+    def _respawn(self, dead: _Worker) -> Optional[_Worker]:
+        with self._lock:
+            self._busy.discard(dead)
+            if self._closed:
+                return None
+            worker = self._spawn()
+            self._busy.add(worker)
+            return worker
+
+    def _release(self, worker: Optional[_Worker]):
+        if worker is None:
+            return
+        with self._lock:
+            self._busy.discard(worker)
+            if not self._closed:
+                self._idle.put(worker)
+                return
+        worker.kill()
+
+    async def arun(self, code: str, client: Any = None, timeout: Optional[float] = None) -> ExecutionResult:
+        return await asyncio.to_thread(self.run, code, client, timeout)
+
+    def close(self):
+        """
+        Stops every worker. Runs still in flight get up to `timeout` to finish; whatever is still
+        busy after that is killed, and later run() calls return an error instead of using the pool
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                # Busy workers are stopped by their run() when it finishes
+                with self._lock:
+                    running = bool(self._busy)
+                if not running or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.05)
+                continue
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+        with self._lock:
+            busy, self._busy = list(self._busy), set()
+        for worker in busy:
+            worker.kill()
+        if self._owns_frame:
+            Path(self._frame_path).unlink(missing_ok=True)
+
+
+def _closed_result() -> ExecutionResult:
+    error = "❌ Error during execution: the executor has been shut down"
+    return ExecutionResult(output=error, error=error)
+
+
+class InProcessExecutor:
+    """
+    Runs generated code in the server process. Executions are serialized because stdout
+    capture and pyplot state are process-global.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._lock = threading.Lock()
+
+    def run(self, code: str, client: Any = None, timeout: Optional[float] = None) -> ExecutionResult:
+        with self._lock:
+            return _run_code(code, {"df": self.df, "client": client})
+
+    async def arun(self, code: str, client: Any = None, timeout: Optional[float] = None) -> ExecutionResult:
+        return await asyncio.to_thread(self.run, code, client, timeout)
+
+    def close(self):
+        pass
+
+
+def create_executor(df: pd.DataFrame, mode: str = EXECUTOR_MODE, frame_path: Optional[Path] = None):
+    if mode == "inprocess":
+        return InProcessExecutor(df)
+    return SubprocessExecutor(df, frame_path=frame_path)
@@ -0,0 +1,45 @@
+# app/services/deadline.py
+import time
+from typing import Optional
+from app.config import REQUEST_DEADLINE_SECONDS
+from app.services.metrics import metrics
+from app.services.tracing import annotate
+
+metrics.describe("assistant_deadline_degradations_total", "counter", "Steps shortened or skipped because the request deadline was near")
+metrics.describe("assistant_deadline_exceeded_total", "counter", "Requests answered best-effort after their deadline passed")
+
+DEADLINE_MESSAGE = "⏱️ This request ran out of time before a full answer was ready. Please try again or narrow the question."
+
+
+def with_deadline(cfg: dict, seconds: float = REQUEST_DEADLINE_SECONDS) -> dict:
+    """Stamps the request's deadline (epoch seconds) into the graph config's configurable section"""
+    cfg.setdefault("configurable", {})["deadline"] = time.time() + seconds
+    return cfg
+
+def seconds_left(cfg: dict) -> Optional[float]:
+    deadline = (cfg.get("configurable") or {}).get("deadline")
+    return None if deadline is None else deadline - time.time()
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left for the graph run this is called from (nodes and the dependency calls they make);
+    None outside a graph run or when the request has no deadline
+    """
+    from langgraph.config import get_config
+    try:
+        return seconds_left(get_config())
+    except RuntimeError:
+        return None
+
+def is_tight(threshold: float) -> bool:
+    left = remaining()
+    return left is not None and left < threshold
+
+def degrade(step: str) -> None:
+    """Records that a node shortened its work to fit the deadline"""
+    print(f"Deadline near: {step}")
+    metrics.inc("assistant_deadline_degradations_total", step=step)
+    annotate(deadline=step, seconds_left=round(remaining() or 0.0, 2))
+
+def exceeded(where: str) -> None:
+    metrics.inc("assistant_deadline_exceeded_total", where=where)
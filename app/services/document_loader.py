@@ -8,6 +8,7 @@ from langchain_community.document_loaders import (
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import pandas as pd
+from app.services.index_stats import stage
 
 def find_likely_header(df: pd.DataFrame, max_rows_to_check=10):
     for i in range(max_rows_to_check):
@@ -15,18 +16,22 @@ def find_likely_header(df: pd.DataFrame, max_rows_to_check=10):
             return i
     return 0
 
-def extract_pdf_chunks(file_path: str, batch_size: int = 30, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
-    try:
-        loader = PyMuPDFLoader(file_path)
-        docs = loader.load()
-
+def _split_documents(docs: list[Document], batch_size: int, chunk_size: int, overlap: int) -> list[str]:
+    with stage("split"):
         splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
         chunks = []
         for i in range(0, len(docs), batch_size):
-            batch_docs = docs[i:i + batch_size]
-            batch_chunks = splitter.split_documents(batch_docs)
+            batch_chunks = splitter.split_documents(docs[i:i + batch_size])
             chunks.extend([chunk.page_content for chunk in batch_chunks])
         return chunks
+
+def extract_pdf_chunks(file_path: str, batch_size: int = 30, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+    try:
+        loader = PyMuPDFLoader(file_path)
+        with stage("parse"):
+            docs = loader.load()
+
+        return _split_documents(docs, batch_size, chunk_size, overlap)
     except Exception as e:
         print(f"❌ PDF error in {file_path}: {e}")
         return []
@@ -37,15 +42,11 @@ def extract_docx_chunk(file_path: str, batch_size: int = 30, chunk_size: int = 1
         print(f"Loading {file_path}...")
         loader = Docx2txtLoader(file_path)
         print("Loading...")
-        docs = loader.load()
+        with stage("parse"):
+            docs = loader.load()
         print("Loading Successful")
 
-        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-        chunks = []
-        for i in range(0, len(docs), batch_size):
-            batch_docs = docs[i:i + batch_size]
-            batch_chunks = splitter.split_documents(batch_docs)
-            chunks.extend([chunk.page_content for chunk in batch_chunks])
+        chunks = _split_documents(docs, batch_size, chunk_size, overlap)
         print(f"🔍 Extracted {len(chunks)} chunks from {file_path}")
         return chunks
     except Exception as e:
@@ -56,15 +57,10 @@ def extract_docx_chunk(file_path: str, batch_size: int = 30, chunk_size: int = 1
 def extract_txt_chunk(file_path: str, batch_size: int = 30, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
     try:
         loader = TextLoader(file_path, encoding="utf-8")
-        docs = loader.load()
+        with stage("parse"):
+            docs = loader.load()
 
-        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-        chunks = []
-        for i in range(0, len(docs), batch_size):
-            batch_docs = docs[i:i + batch_size]
-            batch_chunks = splitter.split_documents(batch_docs)
-            chunks.extend([chunk.page_content for chunk in batch_chunks])
-        return chunks
+        return _split_documents(docs, batch_size, chunk_size, overlap)
     except Exception as e:
         print(f"❌ TXT error in {file_path}: {e}")
         return []
@@ -72,15 +68,10 @@ def extract_txt_chunk(file_path: str, batch_size: int = 30, chunk_size: int = 10
 def extract_msg_chunk(file_path: str, batch_size: int = 30, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
     try:
         loader = OutlookMessageLoader(file_path)
-        docs = loader.load()  # returns a single Document usually
+        with stage("parse"):
+            docs = loader.load()  # returns a single Document usually
 
-        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-        chunks = []
-        for i in range(0, len(docs), batch_size):
-            batch_docs = docs[i:i + batch_size]
-            batch_chunks = splitter.split_documents(batch_docs)
-            chunks.extend([chunk.page_content for chunk in batch_chunks])
-        return chunks
+        return _split_documents(docs, batch_size, chunk_size, overlap)
     except Exception as e:
         print(f"❌ MSG error in {file_path}: {e}")
         return []
@@ -1,8 +1,9 @@
-import openai
-from openai import OpenAI
-from app.config import OPENAI_API_KEY
+import time
+from app.clients.openAI_client import get_openai_client
+from app.services.tracing import record_llm_call
+from app.services.resilience import call
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = get_openai_client()
 embedding_model = "text-embedding-3-small"
 
 def embed_text(text: str) -> list[float]:
@@ -18,8 +19,11 @@ def embed_text(text: str) -> list[float]:
     if not text.strip():
         raise ValueError("Input text cannot be empty or whitespace.")
     
-    response = client.embeddings.create(
+    t0 = time.perf_counter()
+    response = call("embedding", lambda: client.embeddings.create(
         input=[text],
         model=embedding_model
-    )
+    ), hedge=True)
+    usage = getattr(response, "usage", None)
+    record_llm_call(embedding_model, time.perf_counter() - t0, getattr(usage, "prompt_tokens", 0) or 0)
     return response.data[0].embedding
\ No newline at end of file
@@ -1,7 +1,61 @@
+import os
 from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+def publish_arrow(df: pd.DataFrame, arrow_path: Path) -> Path:
+    """
+    Writes the frame as an Arrow IPC (Feather v2, uncompressed) file that other processes can memory-map.
+    The file is written next to the target and renamed into place so readers never see a partial file.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # large_string is the layout pandas' pyarrow strings use, so readers can wrap the mapped columns as-is
+    table = table.cast(pa.schema([
+        field.with_type(pa.large_string()) if pa.types.is_string(field.type) else field for field in table.schema
+    ], metadata=table.schema.metadata))
+    tmp_path = arrow_path.with_name(f".{arrow_path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+def _string_dtype(arrow_type: pa.DataType):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def load_arrow(arrow_path: Path, zero_copy: bool = False) -> pd.DataFrame:
+    """
+    Memory-maps a published Arrow IPC file read-only (no parquet decode). Text columns become
+    pyarrow-backed strings over the mapped pages, so every process reading the file shares one
+    copy of them; numeric and date columns are converted to NumPy for the usual .dt/arithmetic API.
+    With zero_copy every column stays pyarrow-backed, but pd.ArrowDtype lacks parts of the .dt
+    API generated code relies on.
+    """
+    source = pa.memory_map(str(arrow_path), "r")
+    table = ipc.open_file(source).read_all()
+    if zero_copy:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(types_mapper=_string_dtype, split_blocks=True)
+
+def _is_fresh(arrow_path: Path, source_path: Path) -> bool:
+    if not arrow_path.exists():
+        return False
+    if not source_path.exists():
+        return True
+    return arrow_path.stat().st_mtime >= source_path.stat().st_mtime
+
+def get_excel_dataframe(parquet_path: Path, excel_path: Path, sheet_name: str, header_row: int, removeCols: list[str], renameCols: dict[str, str], verbose: bool = False, usecols: str = None, arrow_path: Path = None, zero_copy: bool = False) -> pd.DataFrame:
+    source_path = parquet_path if parquet_path.exists() else excel_path
+    if arrow_path is not None and _is_fresh(arrow_path, source_path):
+        print("Arrow file exists. Memory-mapping...")
+        df = load_arrow(arrow_path, zero_copy=zero_copy)
+        if verbose:
+            print("Columns:", df.columns.tolist())
+            print("Number of records:", len(df))
+        return df
 
-def get_excel_dataframe(parquet_path: Path, excel_path: Path, sheet_name: str, header_row: int, removeCols: list[str], renameCols: dict[str, str], verbose: bool = False, usecols: str = None) -> pd.DataFrame:
     if parquet_path.exists():
         print("Parquet file exists. Loading from parquet...")
         df = pd.read_parquet(parquet_path)
@@ -25,4 +79,10 @@ def get_excel_dataframe(parquet_path: Path, excel_path: Path, sheet_name: str, h
             print("Columns:", df.columns.tolist())
             print("Number of records:", len(df))
         df.to_parquet(parquet_path, index=False)
-    return df
\ No newline at end of file
+
+    if arrow_path is not None:
+        publish_arrow(df, arrow_path)
+        print(f"Published Arrow file: {arrow_path}")
+        # Serve this process from the shared mapping as well
+        df = load_arrow(arrow_path, zero_copy=zero_copy)
+    return df
@@ -0,0 +1,44 @@
+# app/services/extraction_cache.py
+import os
+from typing import Callable
+from app.config import EXTRACTION_CACHE_MAX_FILES
+from app.services.ttl_cache import TTLCache
+from app.services.utils import extract_chunks
+
+class ExtractionCache:
+    """
+    LRU cache of extracted text chunks keyed by file path + mtime + size, so a file is
+    only re-parsed after it changes on disk
+    """
+    def __init__(self, max_files: int = EXTRACTION_CACHE_MAX_FILES, extractor: Callable[[str], list[str]] = extract_chunks):
+        self.max_files = max_files
+        self.extractor = extractor
+        # No TTL: an entry stays valid until the file changes (a changed file gets a new key)
+        self._entries = TTLCache(max_files, float("inf"))
+
+    @property
+    def hits(self) -> int:
+        return self._entries.hits
+
+    @property
+    def misses(self) -> int:
+        return self._entries.misses
+
+    def get_chunks(self, file_path: str) -> list[str]:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return []
+        key = f"{file_path}\x1f{st.st_mtime_ns}\x1f{st.st_size}"
+        chunks = self._entries.get(key)
+        if chunks is None:
+            # Parsed outside any lock so different files extract in parallel
+            chunks = self.extractor(file_path)
+            self._entries.set(key, chunks)
+        return chunks
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,88 @@
+# app/services/index_stats.py
+import contextvars
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+STAGES = ("hash", "parse", "split", "embed", "upsert")
+
+
+@dataclass
+class IndexStats:
+    """
+    Counters and per-stage wall time for one indexing run. Stage times are filled in by
+    `stage(...)` blocks in the indexer and loaders while the stats are being collected.
+    """
+    files: int = 0
+    skipped: int = 0
+    empty: int = 0
+    failed: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    stage_seconds: dict = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    by_extension: dict = field(default_factory=dict)
+
+    def add_file(self, ext: str, size: int, chunks: Optional[int], seconds: float, failed: bool = False) -> None:
+        """chunks is None for files skipped as unchanged"""
+        if chunks is None and not failed:
+            self.skipped += 1
+            return
+        row = self.by_extension.setdefault(ext, {"files": 0, "bytes": 0, "chunks": 0, "seconds": 0.0, "empty": 0, "failed": 0})
+        row["files"] += 1
+        row["bytes"] += size
+        row["seconds"] += seconds
+        self.files += 1
+        self.bytes += size
+        if failed:
+            self.failed += 1
+            row["failed"] += 1
+        elif not chunks:
+            self.empty += 1
+            row["empty"] += 1
+        else:
+            self.chunks += chunks
+            row["chunks"] += chunks
+
+    def summary(self) -> dict:
+        def rate(n):
+            return round(n / self.seconds, 2) if self.seconds else 0.0
+        return {
+            "files": self.files, "skipped": self.skipped, "empty": self.empty, "failed": self.failed,
+            "chunks": self.chunks, "mb": round(self.bytes / 2**20, 3), "seconds": round(self.seconds, 3),
+            "files_per_s": rate(self.files), "chunks_per_s": rate(self.chunks), "mb_per_s": rate(self.bytes / 2**20),
+            "stage_seconds": {k: round(v, 4) for k, v in self.stage_seconds.items()},
+            "by_extension": self.by_extension,
+        }
+
+    def format(self) -> str:
+        s = self.summary()
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in s["stage_seconds"].items())
+        return (f"{s['files']} files ({s['skipped']} unchanged, {s['empty']} empty, {s['failed']} failed), "
+                f"{s['chunks']} chunks, {s['mb']} MB in {s['seconds']}s | {s['files_per_s']} files/s, "
+                f"{s['chunks_per_s']} chunks/s, {s['mb_per_s']} MB/s | {stages}")
+
+
+_current: contextvars.ContextVar[Optional[IndexStats]] = contextvars.ContextVar("index_stats", default=None)
+
+@contextmanager
+def collect(stats: IndexStats):
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def stage(name: str):
+    """Adds the block's wall time to `name` on the stats being collected (no-op otherwise)"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.stage_seconds[name] = stats.stage_seconds.get(name, 0.0) + time.perf_counter() - t0
@@ -0,0 +1,127 @@
+# app/services/message_store.py
+import asyncio
+import base64
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from app.config import MESSAGE_BATCH_SIZE, MESSAGE_FLUSH_INTERVAL_SECONDS
+from app.services.resilience import call
+
+MAX_BACKOFF_SECONDS = 30.0
+_INTEGER_ID = re.compile(r"^\d{1,20}$")
+
+
+class MessageWriter:
+    """
+    Async, batched inserts into a Supabase table. Rows are queued without blocking the request;
+    a background task inserts them in batches of up to batch_size with one call, retrying a
+    failed batch with backoff. created_at is stamped at enqueue time so ordering (and cursor
+    pagination) does not depend on when the batch lands.
+    """
+    def __init__(self, client, table: str = "messages", batch_size: int = MESSAGE_BATCH_SIZE, flush_interval: float = MESSAGE_FLUSH_INTERVAL_SECONDS):
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: list[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.inserted = 0
+        self.failures = 0
+
+    def enqueue(self, row: dict) -> None:
+        row = {**row}
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        self._queue.append(row)
+        self._ensure_started()
+        self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self) -> int:
+        """
+        Inserts queued rows batch by batch; stops at the first failure and keeps the rest queued.
+        Returns the number of rows still queued.
+        """
+        while self._queue:
+            batch = self._queue[: self.batch_size]
+            try:
+                # Inserts are not idempotent: no inline retries, the batch stays queued instead
+                await asyncio.to_thread(call, "supabase", lambda: self.client.table(self.table).insert(batch).execute(), retries=0)
+            except Exception as e:
+                self.failures += 1
+                print(f"Message insert failed ({len(batch)} rows), will retry: {e}")
+                break
+            del self._queue[: len(batch)]
+            self.inserted += len(batch)
+        return len(self._queue)
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        delay = self.flush_interval
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                break
+            # Give the rest of the burst a moment to join this batch
+            if len(self._queue) < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            if await self.flush():
+                delay = min(max(delay, self.flush_interval) * 2, MAX_BACKOFF_SECONDS)
+            else:
+                delay = self.flush_interval
+
+
+def encode_cursor(row: dict, order_column: str = "created_at", id_column: str = "id") -> str:
+    raw = json.dumps([row.get(order_column), row.get(id_column)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """
+    (timestamp, id) of a cursor. Both are checked (ISO timestamp; UUID or integer id) because
+    they are placed in a PostgREST filter expression; anything else raises ValueError
+    """
+    try:
+        order_value, id_value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        order_value, id_value = str(order_value), str(id_value)
+        datetime.fromisoformat(order_value)
+        if not _INTEGER_ID.match(id_value):
+            uuid.UUID(id_value)
+        return order_value, id_value
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def fetch_page(query, limit: int, cursor: Optional[str] = None, order_column: str = "created_at", id_column: str = "id") -> dict:
+    """
+    Keyset pagination over (order_column, id_column) ascending. `query` is a filtered Supabase
+    select; returns {"items": [...], "next_cursor": str | None}.
+    """
+    if cursor:
+        order_value, id_value = decode_cursor(cursor)
+        query = query.or_(
+            f'{order_column}.gt."{order_value}",'
+            f'and({order_column}.eq."{order_value}",{id_column}.gt."{id_value}")'
+        )
+    request = query.order(order_column).order(id_column).limit(limit + 1)
+    rows = call("supabase", request.execute, hedge=True).data or []
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1], order_column, id_column) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,77 @@
+# app/services/namespaces.py
+import re
+from typing import Optional
+from app.config import (
+    PINECONE_SHARED_NAMESPACE, PINECONE_NAMESPACE_ROUTING, PINECONE_TEAM_NAMESPACES,
+    USERS_TABLE, NAMESPACE_LOOKUP_TTL_SECONDS,
+)
+from app.services.ttl_cache import TTLCache
+from app.services.resilience import call
+
+DEFAULT_PROJECT = "Internal Doc"  # run_indexing's default project; indexed into the shared namespace
+
+# user_id -> department, so a request does not hit Supabase for every retrieval
+_departments = TTLCache(max_entries=4096, ttl_seconds=NAMESPACE_LOOKUP_TTL_SECONDS)
+
+
+def routing_active() -> bool:
+    """
+    Projects get their own namespaces only when a team mapping says who searches them; otherwise
+    a project namespace could never be retrieved
+    """
+    return PINECONE_NAMESPACE_ROUTING and bool(PINECONE_TEAM_NAMESPACES)
+
+def project_namespace(project_name: Optional[str]) -> str:
+    """
+    Namespace a project's documents are indexed into: a slug of the project name
+    ("Century City JMB Tower" -> "century-city-jmb-tower"), or the shared namespace for internal
+    documents and when routing is not active
+    """
+    if not routing_active() or not project_name or project_name == DEFAULT_PROJECT:
+        return PINECONE_SHARED_NAMESPACE
+    slug = re.sub(r"[^a-z0-9]+", "-", project_name.lower()).strip("-")
+    return slug or PINECONE_SHARED_NAMESPACE
+
+def user_department(user_id: str) -> Optional[str]:
+    """
+    Department from the user's row in the users table; None when there is no row or the lookup fails
+    """
+    cached = _departments.get(user_id, "")
+    if cached != "":
+        return cached
+    try:
+        from app.db.supabase_client import supabase_client
+        row = call("supabase", lambda: supabase_client.table(USERS_TABLE).select("department").eq("id", user_id).maybe_single().execute(), hedge=True)
+    except Exception as e:
+        print(f"Department lookup failed for {user_id}: {e}")
+        return None
+    department = ((row and row.data) or {}).get("department") or None
+    _departments.set(user_id, department)
+    return department
+
+def namespaces_for_user(user_id: Optional[str]) -> list[str]:
+    """
+    Namespaces a request searches: the shared one, the ones mapped to "*" and those mapped to the
+    user's department in PINECONE_TEAM_NAMESPACES
+    """
+    namespaces = [PINECONE_SHARED_NAMESPACE]
+    if not routing_active():
+        return namespaces
+    extra = list(PINECONE_TEAM_NAMESPACES.get("*", []))
+    department = user_department(user_id) if user_id else None
+    if department:
+        extra += PINECONE_TEAM_NAMESPACES.get(department, [])
+    for namespace in extra:
+        if namespace not in namespaces:
+            namespaces.append(namespace)
+    return namespaces
+
+def lookup_pending(state: dict) -> bool:
+    """True when resolving the request's namespaces may need a department lookup (a blocking call)"""
+    return not state.get("namespaces") and bool(state.get("user_id")) and routing_active()
+
+def request_namespaces(state: dict) -> list[str]:
+    """Resolves the namespaces once per request and keeps them on the state"""
+    if not state.get("namespaces"):
+        state["namespaces"] = namespaces_for_user(state.get("user_id"))
+    return state["namespaces"]
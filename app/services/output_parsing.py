@@ -0,0 +1,205 @@
+# app/services/output_parsing.py
+import ast
+import json
+import re
+from typing import Any, Iterator, Sequence
+from pydantic import ValidationError
+from app.services.metrics import metrics
+
+metrics.describe("assistant_output_parses_total", "counter", "Model outputs parsed locally by parser and outcome (clean/repaired/truncated/failed)")
+
+SECTIONS = ("FINAL ANSWER", "ANALYSIS", "CODE")
+
+_FENCE = re.compile(r"```[\w+-]*[ \t]*\n?(.*?)(?:\n?[ \t]*```|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+_PARTIAL_LITERAL = re.compile(r"(?<=[\[:,\s])(?:t|tr|tru|f|fa|fal|fals|n|nu|nul|-)$")
+_PARTIAL_NUMBER = re.compile(r"(\d)(?:\.|[eE][+-]?)$")
+_DANGLING_KEY = re.compile(r'(?:([{,])\s*"(?:[^"\\]|\\.)*"\s*:?|:)\s*$')
+
+
+class TruncatedOutput(ValueError):
+    """The reply was cut off mid-document (e.g. at the token limit); closing it would hide the missing part"""
+
+
+def record_parse(parser: str, outcome: str) -> None:
+    metrics.inc("assistant_output_parses_total", parser=parser, outcome=outcome)
+
+def strip_code_fences(text: str) -> str:
+    """Body of the first ``` fenced block (closed or not); the text itself when there is none"""
+    match = _FENCE.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+# --- JSON ---
+def _scan(text: str) -> tuple[int | None, list[str], bool]:
+    """
+    Walks JSON text that starts with { or [. Returns the index just past that value when it is
+    complete, else None with the closers still open and whether a string is unterminated
+    """
+    stack, in_string, escaped = [], False, False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+            if not stack:
+                return i + 1, [], False
+    return None, stack, in_string
+
+def _close_truncated(prefix: str) -> str:
+    """
+    Closes a JSON document cut off at the token limit: ends an open string, drops a dangling
+    key, comma or partial literal, then closes the open arrays and objects. Every prefix of a
+    valid document yields valid JSON holding the values received before the cut
+    """
+    _, stack, in_string = _scan(prefix)
+    text = prefix
+    if in_string:
+        text = (text[:-1] if text.endswith("\\") and not text.endswith("\\\\") else text) + '"'
+    text = _PARTIAL_NUMBER.sub(r"\1", _PARTIAL_LITERAL.sub("", text.rstrip()))
+    while True:
+        trimmed = text.rstrip().rstrip(",")
+        if stack and stack[-1] == "}":
+            trimmed = _DANGLING_KEY.sub(lambda m: m.group(1) or "", trimmed).rstrip().rstrip(",")
+        if trimmed == text:
+            break
+        text = trimmed
+    return text + "".join(reversed(stack))
+
+def _loads(text: str) -> Any:
+    """json.loads, retried without trailing commas and typographic quotes, then as a Python literal"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    fixed = _TRAILING_COMMA.sub(r"\1", text.translate(_SMART_QUOTES))
+    try:
+        return json.loads(fixed)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(fixed)   # single quotes, True/False/None
+    except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+        raise ValueError(f"unparsable JSON: {e}") from e
+
+def extract_json(text: str, allow_truncated: bool = True) -> tuple[Any, bool]:
+    """
+    The JSON value in a model reply and whether it needed repair: tolerates code fences,
+    surrounding prose, trailing commas and Python literals. Output cut off mid-document is closed
+    (holding only the values received, e.g. the first entries of a ranking) when allow_truncated is set, and raises
+    TruncatedOutput otherwise. Raises ValueError when the reply holds no object or array
+    """
+    stripped = text.strip()
+    try:
+        return json.loads(stripped), False
+    except ValueError:
+        pass
+    body = strip_code_fences(stripped)
+    starts = [i for i in (body.find("{"), body.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("no JSON object or array in the output")
+    body = body[min(starts):]
+    end, _, _ = _scan(body)
+    if end is None and not allow_truncated:
+        raise TruncatedOutput("the output was cut off before the JSON document ended")
+    return _loads(body[:end] if end is not None else _close_truncated(body)), True
+
+
+# --- Structured output ---
+def _raw_outputs(raw) -> Iterator[str]:
+    """Candidate JSON texts in the raw AIMessage: content, then tool call arguments"""
+    content = getattr(raw, "content", None)
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    if content:
+        yield content
+    for tool_call in getattr(raw, "tool_calls", None) or []:
+        yield json.dumps(tool_call.get("args") or {})
+    for tool_call in getattr(raw, "invalid_tool_calls", None) or []:
+        if tool_call.get("args"):
+            yield tool_call["args"]
+
+def _validate(schema, data: Any):
+    try:
+        return schema.model_validate(data)
+    except ValidationError:
+        # Payload wrapped once, e.g. {"ResponsePayload": {...}} or [{...}]
+        inner = list(data.values()) if isinstance(data, dict) else data if isinstance(data, list) else []
+        if len(inner) == 1 and isinstance(inner[0], dict):
+            return schema.model_validate(inner[0])
+        raise
+
+def parse_structured(result: Any, schema):
+    """
+    Reads a with_structured_output(..., include_raw=True) result. When the model's output did not
+    parse, the JSON is recovered from the raw message and validated against the schema locally
+    instead of asking the model again. Output that was cut off is not repaired (its last field
+    would be silently incomplete): like any unrecoverable output, it raises the original parsing
+    error so the caller escalates or re-asks
+    """
+    if not isinstance(result, dict) or "raw" not in result:
+        return result
+    name = schema.__name__
+    if result.get("parsed") is not None and result.get("parsing_error") is None:
+        record_parse(name, "clean")
+        return result["parsed"]
+    truncated = False
+    for text in _raw_outputs(result["raw"]):
+        try:
+            data, _ = extract_json(text, allow_truncated=False)
+            value = _validate(schema, data)
+        except TruncatedOutput:
+            truncated = True
+            continue
+        except ValueError:
+            continue
+        print(f"Repaired malformed {name} output")
+        record_parse(name, "repaired")
+        return value
+    record_parse(name, "truncated" if truncated else "failed")
+    raise result.get("parsing_error") or ValueError(f"no {name} in the model output")
+
+class StructuredOutput:
+    """
+    client.with_structured_output(schema) whose invoke repairs malformed output locally
+    (see parse_structured)
+    """
+    def __init__(self, client, schema):
+        self.schema = schema
+        self.runnable = client.with_structured_output(schema, include_raw=True)
+
+    def invoke(self, messages, *args, **kwargs):
+        return parse_structured(self.runnable.invoke(messages, *args, **kwargs), self.schema)
+
+
+# --- Sections ---
+def _section_header(names: Sequence[str]) -> re.Pattern:
+    # "=== FINAL ANSWER ===", "== Final Answer", "**FINAL ANSWER:**", "### CODE", "FINAL_ANSWER"
+    alternatives = "|".join(r"[\s_]+".join(map(re.escape, name.split())) for name in names)
+    return re.compile(rf"^[ \t>#*_]*(?:=+[ \t]*)?({alternatives})[ \t]*(?:=+)?[ \t]*:?[ \t*_]*$", re.IGNORECASE | re.MULTILINE)
+
+def parse_sections(text: str, names: Sequence[str] = SECTIONS) -> dict[str, str]:
+    """
+    Sections of a "=== NAME ===" reply by canonical name, in any order and tolerant of header
+    case, markdown decoration and missing "=" markers. The first occurrence of a name wins;
+    code fences inside a section are removed
+    """
+    canonical = {re.sub(r"[\s_]+", " ", name).upper(): name for name in names}
+    headers = list(_section_header(names).finditer(text))
+    sections: dict[str, str] = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        name = canonical[re.sub(r"[\s_]+", " ", header.group(1)).upper()]
+        body = text[header.end():following.start() if following else len(text)].strip()
+        if name not in sections:
+            sections[name] = strip_code_fences(body) if "```" in body else body
+    return sections
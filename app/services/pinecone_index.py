@@ -1,22 +1,76 @@
-from app.config import PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX
-from pinecone import Pinecone
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from app.config import PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX, PINECONE_SHARED_NAMESPACE, PINECONE_QUERY_WORKERS
+from app.services.resilience import call
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+@lru_cache(maxsize=1)
+def get_index():
+    """
+    Pinecone client and index handle, created on first use rather than at import
+    """
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    return pc.Index(PINECONE_INDEX)
 
+@lru_cache(maxsize=1)
+def _query_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=PINECONE_QUERY_WORKERS, thread_name_prefix="pinecone-query")
+
+def __getattr__(name):
+    # Backwards compatible module attribute
+    if name == "index":
+        return get_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Every call goes through the resilience layer (timeout, retries, circuit breaker); reads are hedged
 def upsert_vector(id, vector, metadata, namespace=None):
-    index.upsert([(id, vector, metadata)], namespace=namespace)
+    call("pinecone", lambda: get_index().upsert([(id, vector, metadata)], namespace=namespace or PINECONE_SHARED_NAMESPACE))
+
+def query_index(query_vector, top_k=3, namespace=None, filter=None):
+    return call("pinecone", lambda: get_index().query(vector=query_vector, top_k=top_k, include_metadata=True,
+                                                      namespace=namespace or PINECONE_SHARED_NAMESPACE, filter=filter), hedge=True)
+
+def query_namespaces(query_vector, namespaces: list[str], top_k=3, filter=None):
+    """
+    Queries each namespace in parallel and merges the matches by score into one top_k list.
+    A vector id found in several namespaces is kept once, with its best score. A failed namespace
+    is skipped; the error is raised only when every namespace failed.
+    """
+    namespaces = list(dict.fromkeys(namespaces or [PINECONE_SHARED_NAMESPACE]))
+    if len(namespaces) == 1:
+        return query_index(query_vector, top_k=top_k, namespace=namespaces[0], filter=filter)
+
+    def _one(namespace):
+        try:
+            return query_index(query_vector, top_k=top_k, namespace=namespace, filter=filter).get("matches", [])
+        except Exception as e:
+            print(f"Pinecone query failed for namespace {namespace}: {e}")
+            return e
 
-def query_index(query_vector, top_k=3, namespace=None):
-    return index.query(vector=query_vector, top_k=top_k, include_metadata=True, namespace=namespace)
+    # Each query runs with a copy of the caller's context, so the request deadline and tracing still apply
+    futures = [_query_pool().submit(contextvars.copy_context().run, _one, namespace) for namespace in namespaces]
+    best, errors = {}, []
+    for matches in (future.result() for future in futures):
+        if isinstance(matches, Exception):
+            errors.append(matches)
+            continue
+        for match in matches:
+            if match["id"] not in best or match["score"] > best[match["id"]]["score"]:
+                best[match["id"]] = match
+    if len(errors) == len(namespaces):
+        raise errors[0]
+    return {"matches": sorted(best.values(), key=lambda m: m["score"], reverse=True)[:top_k]}
 
 def delete_vector(id, namespace=None):
-    index.delete(ids=[id], namespace=namespace)
+    call("pinecone", lambda: get_index().delete(ids=[id], namespace=namespace or PINECONE_SHARED_NAMESPACE))
 
 def fetch_vector(id, namespace=None):
-    return index.fetch(ids=[id], namespace=namespace)
+    return call("pinecone", lambda: get_index().fetch(ids=[id], namespace=namespace or PINECONE_SHARED_NAMESPACE), hedge=True)
 
-def retrieve_docs(query_vector, top_k=3, namespace=None):
+def retrieve_docs(query_vector, top_k=3, namespace=None, filter=None, namespaces=None):
     from app.services.embedding import embed_text
     query_vector = embed_text(query_vector)
-    return query_index(query_vector, top_k=top_k, namespace=namespace)
+    if namespaces:
+        return query_namespaces(query_vector, namespaces, top_k=top_k, filter=filter)
+    return query_index(query_vector, top_k=top_k, namespace=namespace, filter=filter)
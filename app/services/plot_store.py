@@ -0,0 +1,117 @@
+# app/services/plot_store.py
+import base64
+import hashlib
+import io
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional
+from app.config import PLOT_STORE_DIR, PLOT_STORE_MAX_MB, PLOT_STORE_MAX_AGE_SECONDS, PLOT_FORMAT, PLOT_DPI, PLOT_TRANSPORT
+
+PLOT_URL_PREFIX = "/plots/"
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(png|webp|svg)$")
+_SWEEP_INTERVAL_SECONDS = 60
+
+
+class PlotStore:
+    """
+    Content-addressed store for rendered plots. Blobs are named by their SHA-256, so identical
+    charts are stored once and URLs can be cached forever. Blobs not written for max_age_seconds
+    are removed, then the least recently written ones until the store fits in max_bytes.
+    """
+    def __init__(self, root: Path = PLOT_STORE_DIR, max_bytes: int = PLOT_STORE_MAX_MB * 1024 * 1024,
+                 max_age_seconds: float = PLOT_STORE_MAX_AGE_SECONDS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._next_sweep = 0.0
+
+    def put(self, data: bytes, fmt: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest}.{fmt}"
+        path = self.root / digest[:2] / name
+        if path.exists():
+            os.utime(path)   # rewritten: keep it out of eviction
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + _SWEEP_INTERVAL_SECONDS
+            self.evict()
+        return name
+
+    def evict(self) -> int:
+        """Removes expired blobs, then the oldest until the store fits its size limit. Returns the count removed"""
+        blobs = []
+        for path in self.root.glob("??/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, path))
+        blobs.sort()
+        total = sum(size for _, size, _ in blobs)
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for mtime, size, path in blobs:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if removed:
+            print(f"Evicted {removed} stored plots")
+        return removed
+
+    def path_for(self, name: str) -> Optional[Path]:
+        if not _NAME_RE.match(name):
+            return None
+        path = self.root / name[:2] / name
+        return path if path.exists() else None
+
+
+def media_type(name: str) -> str:
+    return MEDIA_TYPES[name.rsplit(".", 1)[-1]]
+
+def _render(fig, fmt: str, dpi: int) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight")
+    return buf.getvalue()
+
+def capture_figures(fmt: str = PLOT_FORMAT, dpi: int = PLOT_DPI, transport: str = PLOT_TRANSPORT, store: Optional[PlotStore] = None) -> list[str]:
+    """
+    Renders every open matplotlib figure and closes them. Figures are rendered one at a time:
+    matplotlib is not thread-safe.
+    Returns /plots/<name> URLs (transport "url") or base64 data URLs (transport "inline").
+    """
+    import matplotlib.pyplot as plt
+    figs = [plt.figure(num) for num in plt.get_fignums()]
+    # Detach from pyplot so rendering does not touch global state
+    plt.close("all")
+    if not figs:
+        return []
+
+    blobs = [_render(fig, fmt, dpi) for fig in figs]
+
+    if transport == "inline":
+        return [f"data:{MEDIA_TYPES[fmt]};base64," + base64.b64encode(blob).decode("utf-8") for blob in blobs]
+    store = store or PlotStore()
+    return [PLOT_URL_PREFIX + store.put(blob, fmt) for blob in blobs]
+
+def absolute_plot_urls(images: list[str], base_url: str) -> list[str]:
+    """
+    Prefixes stored-plot URLs with the API base URL so the frontend can load them from another origin
+    """
+    base = base_url.rstrip("/")
+    return [base + img if img.startswith(PLOT_URL_PREFIX) else img for img in images or []]
@@ -0,0 +1,291 @@
+# app/services/resilience.py
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from app.config import RESILIENCE_ENABLED, RESILIENCE_WORKERS, RESILIENCE_POLICIES
+from app.services.metrics import metrics
+from app.services.deadline import DEADLINE_MESSAGE, remaining
+
+metrics.describe("assistant_dependency_calls_total", "counter", "External calls by dependency and outcome (ok/error/timeout/deadline/rejected)")
+metrics.describe("assistant_dependency_seconds", "histogram", "Latency of successful external calls, retries included")
+metrics.describe("assistant_dependency_retries_total", "counter", "Retried external call attempts")
+metrics.describe("assistant_dependency_hedges_total", "counter", "Hedged (duplicate) requests sent for slow idempotent reads")
+metrics.describe("assistant_circuit_transitions_total", "counter", "Circuit breaker state changes by dependency")
+
+
+@dataclass(frozen=True)
+class Policy:
+    timeout_seconds: float                        # per attempt, hedge included
+    retries: int = 2
+    backoff_seconds: float = 0.2                  # full jitter: sleep uniform(0, backoff * 2**attempt)
+    max_backoff_seconds: float = 2.0
+    hedge_after_seconds: Optional[float] = None   # idempotent reads only; None disables hedging
+    failure_threshold: int = 5                    # consecutive failures that open the circuit
+    reset_seconds: float = 30.0                   # open -> half-open (one probe call)
+
+# Overridden per dependency by RESILIENCE_POLICIES
+DEFAULT_POLICIES = {
+    "openai": Policy(timeout_seconds=45.0, retries=1, backoff_seconds=0.5),
+    "embedding": Policy(timeout_seconds=5.0, hedge_after_seconds=0.5),
+    "pinecone": Policy(timeout_seconds=5.0, hedge_after_seconds=0.5),
+    "supabase": Policy(timeout_seconds=5.0, hedge_after_seconds=1.0),
+}
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Shown to the user when a request fails because a dependency is down
+UNAVAILABLE_MESSAGES = {
+    "openai": "The language model service is not responding right now.",
+    "embedding": "The document search service is not responding right now.",
+    "pinecone": "The document search service is not responding right now.",
+    "supabase": "The conversation database is not responding right now.",
+}
+
+
+class DependencyError(Exception):
+    """A dependency call failed after its retries, timed out, or was rejected by an open circuit"""
+    def __init__(self, dependency: str, message: str):
+        super().__init__(f"{dependency}: {message}")
+        self.dependency = dependency
+
+class DependencyTimeout(DependencyError):
+    pass
+
+class DeadlineExceeded(DependencyTimeout):
+    """The request's deadline ran out during (or before) the call; not counted against the dependency"""
+
+class CircuitOpenError(DependencyError):
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(dependency, f"circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def policy(dependency: str) -> Policy:
+    base = DEFAULT_POLICIES.get(dependency) or Policy(timeout_seconds=10.0)
+    return replace(base, **RESILIENCE_POLICIES.get(dependency, {}))
+
+def retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures and 408/429/5xx responses; client errors and parse failures are not retried"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if any("Timeout" in cls.__name__ or "Connection" in cls.__name__ for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    try:
+        return int(status) in RETRYABLE_STATUS
+    except (TypeError, ValueError):
+        return False
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass and consecutive failures are counted. At failure_threshold the circuit
+    opens and calls fail fast with CircuitOpenError; after reset_seconds one probe call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._move_locked("half_open")
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != "closed":
+                self._move_locked("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._move_locked("open")
+
+    def release_probe(self) -> None:
+        """A half-open probe ended without a verdict: the next caller may probe right away"""
+        with self._lock:
+            if self.state == "half_open":
+                self._move_locked("open")
+
+    def _move_locked(self, state: str) -> None:
+        print(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        metrics.inc("assistant_circuit_transitions_total", dependency=self.name, state=state)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def breaker(dependency: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if dependency not in _breakers:
+            p = policy(dependency)
+            _breakers[dependency] = CircuitBreaker(dependency, p.failure_threshold, p.reset_seconds)
+        return _breakers[dependency]
+
+def circuit_states() -> dict[str, str]:
+    with _breakers_lock:
+        return {name: b.state for name, b in _breakers.items()}
+
+def reset_circuits() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+@lru_cache(maxsize=None)
+def _pool(dependency: str) -> ThreadPoolExecutor:
+    """
+    Bounded worker pool per dependency. An abandoned attempt holds its worker until the client's
+    own timeout ends it, so a stalled dependency can only exhaust its own pool (its next attempts
+    queue, time out and open its circuit) and never starves calls to the others
+    """
+    return ThreadPoolExecutor(max_workers=RESILIENCE_WORKERS, thread_name_prefix=f"{dependency}-call")
+
+
+def _attempt(dependency: str, fn: Callable[[], Any], p: Policy, hedge: bool, timeout: float) -> Any:
+    """
+    One attempt bounded by `timeout`. Runs in a worker thread with a copy of the caller's
+    context (tracing spans still see it); an attempt that times out is abandoned, not interrupted.
+    A hedged read sends a duplicate request when the first is slower than hedge_after_seconds and
+    returns whichever succeeds first.
+    """
+    deadline = time.monotonic() + timeout
+    pool = _pool(dependency)
+    pending = {pool.submit(contextvars.copy_context().run, fn)}
+    if hedge and p.hedge_after_seconds is not None and p.hedge_after_seconds < timeout:
+        done, _ = wait(pending, timeout=p.hedge_after_seconds)
+        if not done:
+            metrics.inc("assistant_dependency_hedges_total", dependency=dependency)
+            pending.add(pool.submit(contextvars.copy_context().run, fn))
+    error = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    raise DependencyTimeout(dependency, f"no response within {timeout:.3g}s")
+
+def call(dependency: str, fn: Callable[[], Any], hedge: bool = False, retries: Optional[int] = None) -> Any:
+    """
+    Runs fn() under the dependency's policy: per-attempt timeout, jittered exponential backoff
+    between retries of transient failures, hedging when `hedge` is set (idempotent reads only) and
+    the dependency's circuit breaker. Inside a graph run each attempt is also capped at the time
+    left before the request deadline. Non-transient errors are raised unchanged on the first
+    attempt; exhausted retries raise DependencyError, an open circuit CircuitOpenError and a
+    spent request budget DeadlineExceeded.
+    """
+    if not RESILIENCE_ENABLED:
+        return fn()
+    p = policy(dependency)
+    circuit = breaker(dependency)
+    attempts = 1 + (p.retries if retries is None else retries)
+    t0 = time.perf_counter()
+    for attempt in range(attempts):
+        left = remaining()
+        if left is not None and left <= 0:
+            metrics.inc("assistant_dependency_calls_total", dependency=dependency, outcome="deadline")
+            raise DeadlineExceeded(dependency, "request deadline passed")
+        if not circuit.allow():
+            metrics.inc("assistant_dependency_calls_total", dependency=dependency, outcome="rejected")
+            raise CircuitOpenError(dependency, circuit.retry_after())
+        timeout = p.timeout_seconds if left is None else min(p.timeout_seconds, left)
+        try:
+            result = _attempt(dependency, fn, p, hedge, timeout)
+        except Exception as e:
+            if isinstance(e, DependencyTimeout) and timeout < p.timeout_seconds:
+                # The request ran out of time, not the dependency: no retry and no breaker failure
+                circuit.release_probe()
+                metrics.inc("assistant_dependency_calls_total", dependency=dependency, outcome="deadline")
+                raise DeadlineExceeded(dependency, f"request deadline passed after {timeout:.3g}s") from e
+            if not retryable(e):
+                # The dependency answered; the request itself was bad
+                circuit.record_success()
+                metrics.inc("assistant_dependency_calls_total", dependency=dependency, outcome="error")
+                raise
+            circuit.record_failure()
+            outcome = "timeout" if isinstance(e, DependencyTimeout) else "error"
+            metrics.inc("assistant_dependency_calls_total", dependency=dependency, outcome=outcome)
+            if attempt == attempts - 1:
+                if isinstance(e, DependencyError):
+                    raise
+                raise DependencyError(dependency, f"{type(e).__name__}: {e}") from e
+            print(f"{dependency}: attempt {attempt + 1} failed ({type(e).__name__}: {e}), retrying")
+            metrics.inc("assistant_dependency_retries_total", dependency=dependency)
+            time.sleep(random.uniform(0, min(p.max_backoff_seconds, p.backoff_seconds * 2 ** attempt)))
+            continue
+        circuit.record_success()
+        metrics.inc("assistant_dependency_calls_total", dependency=dependency, outcome="ok")
+        metrics.observe("assistant_dependency_seconds", time.perf_counter() - t0, dependency=dependency)
+        return result
+
+def unavailable_message(error: DependencyError) -> str:
+    """Fast-fail answer for a request that could not reach a dependency (or ran out of time)"""
+    if isinstance(error, DeadlineExceeded):
+        return DEADLINE_MESSAGE
+    reason = UNAVAILABLE_MESSAGES.get(error.dependency, "A backend service is not responding right now.")
+    return f"⚠️ {reason} Please try again in a minute."
+
+
+class ResilientModel:
+    """
+    Chat model wrapper whose calls (invoke, ainvoke, stream, astream) go through call(), as do the
+    runnables it derives (with_structured_output, bind, with_config); everything else is delegated
+    to the wrapped model
+    """
+    def __init__(self, model, dependency: str = "openai"):
+        self.model = model
+        self.dependency = dependency
+
+    def invoke(self, messages, *args, **kwargs):
+        return call(self.dependency, lambda: self.model.invoke(messages, *args, **kwargs))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        # call() blocks through its retries and backoff: keep it off the event loop
+        return await asyncio.to_thread(self.invoke, messages, *args, **kwargs)
+
+    def stream(self, messages, *args, **kwargs):
+        # A started stream cannot be retried or timed out as one call: the reply is yielded whole
+        yield self.invoke(messages, *args, **kwargs)
+
+    async def astream(self, messages, *args, **kwargs):
+        yield await self.ainvoke(messages, *args, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs) -> "ResilientModel":
+        return ResilientModel(self.model.with_structured_output(schema, **kwargs), self.dependency)
+
+    def bind(self, **kwargs) -> "ResilientModel":
+        return ResilientModel(self.model.bind(**kwargs), self.dependency)
+
+    def with_config(self, config=None, **kwargs) -> "ResilientModel":
+        return ResilientModel(self.model.with_config(config, **kwargs), self.dependency)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
@@ -0,0 +1,212 @@
+# app/services/rfi_query.py
+import json
+from typing import Literal, Optional, List
+import pandas as pd
+from pydantic import BaseModel, Field
+
+DATE_FIELDS = ["Date Received", "Date Requested", "Date Sent"]
+
+class RFIQuery(BaseModel):
+    supported: bool = Field(
+        False,
+        description="True only if the query can be answered completely with the fields below (filters + list/count/group/top-N). False for anything else (free-text interpretation, plots, derived metrics)."
+    )
+    operation: Literal["list", "count", "group_count", "top_n"] = Field(
+        "list",
+        description="'list' returns matching rows, 'count' returns the number of matching rows, 'group_count' counts matching rows per `group_by` value, 'top_n' returns the first `limit` rows ordered by `sort_by`."
+    )
+    status: Optional[List[Literal["U", "IP", "W - Arch", "W - Contr", "A"]]] = Field(
+        None,
+        description="Status codes to keep. U = Unanswered, IP = In Progress, W - Arch = Waiting on Architect, W - Contr = Waiting on Contractor, A = Answered. 'Open' means every code except A."
+    )
+    ball_in_court: Optional[List[str]] = Field(
+        None,
+        description="Initials of the NYA team members to keep (e.g. ['DT', 'JK'])."
+    )
+    rfi_numbers: Optional[List[str]] = Field(
+        None,
+        description="RFI numbers to keep, exactly as written by the user (e.g. ['0016', '0016.2'])."
+    )
+    date_field: Optional[Literal["Date Received", "Date Requested", "Date Sent"]] = Field(
+        None,
+        description="Date column that `date_from`/`date_to` apply to."
+    )
+    date_from: Optional[str] = Field(None, description="Inclusive lower bound, ISO format (YYYY-MM-DD).")
+    date_to: Optional[str] = Field(None, description="Inclusive upper bound, ISO format (YYYY-MM-DD).")
+    group_by: Optional[Literal["Status", "Ball in Court", "SSK #"]] = Field(
+        None,
+        description="Column to group by when operation is 'group_count'."
+    )
+    sort_by: Optional[Literal["RFI #", "Business Days", "Date Received", "Date Requested", "Date Sent"]] = Field(
+        None,
+        description="Column to order rows by for 'list' and 'top_n'."
+    )
+    descending: bool = Field(True, description="Sort order for `sort_by`.")
+    limit: Optional[int] = Field(None, description="Maximum number of rows to return for 'list' and 'top_n'.")
+
+
+class UnsupportedQuery(ValueError):
+    """Raised when a structured query cannot be answered without code generation."""
+
+
+def _column(df: pd.DataFrame, name: str) -> str:
+    """
+    Resolves a logical column name against the DataFrame (the source sheet has stray whitespace in some headers)
+    """
+    if name in df.columns:
+        return name
+    for col in df.columns:
+        if str(col).strip() == name:
+            return col
+    raise UnsupportedQuery(f"Column not found: {name}")
+
+def _rfi_key(value) -> str:
+    text = str(value).strip().lstrip("#")
+    try:
+        return f"{float(text):.3f}"
+    except ValueError:
+        return text.lower()
+
+def _split_initials(value) -> set[str]:
+    text = str(value).upper().replace(",", "/").replace("&", "/")
+    return {part.strip() for part in text.split("/") if part.strip()}
+
+def is_supported(query: Optional[RFIQuery], query_class: Optional[str], query_subclass: Optional[str]) -> bool:
+    """
+    Checks whether a classified query can skip code generation
+    """
+    if query is None or not query.supported:
+        return False
+    if query.operation == "group_count" and query.group_by is None:
+        return False
+    if query.operation == "top_n" and query.sort_by is None:
+        return False
+    if query_class == "excel_insight":
+        return query_subclass == "no_llm"
+    if query_class == "rfi_lookup":
+        return query.operation == "list"
+    return False
+
+def filter_rfis(df: pd.DataFrame, query: RFIQuery) -> pd.DataFrame:
+    """
+    Applies the status / ball-in-court / RFI number / date filters of the query
+    """
+    mask = pd.Series(True, index=df.index)
+
+    if query.status:
+        wanted = {s.lower() for s in query.status}
+        col = _column(df, "Status")
+        mask &= df[col].astype(str).str.strip().str.lower().isin(wanted)
+
+    if query.ball_in_court:
+        wanted = {b.strip().upper() for b in query.ball_in_court}
+        col = _column(df, "Ball in Court")
+        mask &= df[col].map(lambda v: bool(_split_initials(v) & wanted))
+
+    if query.rfi_numbers:
+        wanted = {_rfi_key(n) for n in query.rfi_numbers}
+        col = _column(df, "RFI #")
+        mask &= df[col].map(_rfi_key).isin(wanted)
+
+    if query.date_from or query.date_to:
+        if query.date_field is None:
+            raise UnsupportedQuery("Date range given without a date field")
+        col = _column(df, query.date_field)
+        dates = pd.to_datetime(df[col], errors="coerce")
+        if query.date_from:
+            mask &= dates >= pd.Timestamp(query.date_from)
+        if query.date_to:
+            mask &= dates <= pd.Timestamp(query.date_to)
+
+    return df[mask]
+
+def _sorted(df: pd.DataFrame, query: RFIQuery) -> pd.DataFrame:
+    if query.sort_by is None:
+        return df
+    col = _column(df, query.sort_by)
+    if query.sort_by in DATE_FIELDS:
+        keys = pd.to_datetime(df[col], errors="coerce")
+    else:
+        keys = pd.to_numeric(df[col], errors="coerce")
+    order = keys.sort_values(ascending=not query.descending, na_position="last").index
+    return df.loc[order]
+
+def run_rfi_query(df: pd.DataFrame, query: RFIQuery) -> pd.DataFrame | int:
+    """
+    Runs a structured query against the RFI log. Returns an int for 'count' and a DataFrame otherwise.
+    """
+    rows = filter_rfis(df, query)
+
+    if query.operation == "count":
+        return int(len(rows))
+
+    if query.operation == "group_count":
+        if query.group_by is None:
+            raise UnsupportedQuery("group_count requires group_by")
+        col = _column(rows, query.group_by)
+        labels = rows[col].astype(str).str.strip().replace("", "(blank)")
+        counts = labels.value_counts().rename_axis(query.group_by).reset_index(name="Count")
+        return counts.head(query.limit) if query.limit else counts
+
+    if query.operation == "top_n" and query.sort_by is None:
+        raise UnsupportedQuery("top_n requires sort_by")
+
+    rows = _sorted(rows, query)
+    limit = query.limit or (10 if query.operation == "top_n" else None)
+    return rows.head(limit) if limit else rows
+
+def to_records(rows: pd.DataFrame) -> list[dict]:
+    """
+    Converts rows to plain records, with missing timestamps as None
+    """
+    return rows.astype(object).where(rows.notna(), None).to_dict(orient="records")
+
+def describe_as_pandas(query: RFIQuery) -> str:
+    """
+    Renders the equivalent pandas code so the answer card can show how the result was produced
+    """
+    lines = ["mask = pd.Series(True, index=df.index)"]
+    if query.status:
+        lines.append(f"mask &= df['Status'].str.strip().isin({query.status!r})")
+    if query.ball_in_court:
+        lines.append(f"mask &= df['Ball in Court'].str.split('/').map(lambda v: bool(set(v) & {set(query.ball_in_court)!r}))")
+    if query.rfi_numbers:
+        numbers = [float(k) for k in map(_rfi_key, query.rfi_numbers) if k.replace(".", "", 1).isdigit()]
+        lines.append(f"mask &= pd.to_numeric(df['RFI #'], errors='coerce').isin({numbers!r})")
+    if query.date_field and query.date_from:
+        lines.append(f"mask &= pd.to_datetime(df[{query.date_field!r}], errors='coerce') >= {query.date_from!r}")
+    if query.date_field and query.date_to:
+        lines.append(f"mask &= pd.to_datetime(df[{query.date_field!r}], errors='coerce') <= {query.date_to!r}")
+    lines.append("rows = df[mask]")
+
+    if query.operation == "count":
+        lines.append("print(len(rows))")
+    elif query.operation == "group_count":
+        lines.append(f"print(rows[{query.group_by!r}].value_counts())")
+    else:
+        if query.sort_by:
+            lines.append(f"rows = rows.sort_values({query.sort_by!r}, ascending={not query.descending})")
+        limit = query.limit or (10 if query.operation == "top_n" else None)
+        lines.append(f"print(rows.head({limit}))" if limit else "print(rows)")
+    return "\n".join(lines)
+
+def format_result(result: pd.DataFrame | int, query: RFIQuery) -> str:
+    """
+    Formats the result in the FINAL ANSWER / ANALYSIS / CODE layout used by the Excel path
+    """
+    if isinstance(result, int):
+        answer = str(result)
+        shown = f"{result} matching RFIs"
+    elif result.empty:
+        answer = "No matching RFIs found."
+        shown = "0 rows"
+    else:
+        answer = result.to_string(index=False)
+        shown = f"{len(result)} rows"
+
+    filters = query.model_dump(exclude={"supported", "operation", "descending"}, exclude_none=True)
+    analysis = (
+        f"Answered directly from the RFI log with a structured '{query.operation}' query "
+        f"({shown}). Parameters: {json.dumps(filters) if filters else 'none'}."
+    )
+    return f"=== FINAL ANSWER ===\n{answer}\n\n=== ANALYSIS ===\n{analysis}\n\n=== CODE ===\n{describe_as_pandas(query)}"
@@ -0,0 +1,106 @@
+# app/services/single_flight.py
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Optional
+from app.config import COALESCE_WAIT_SECONDS
+
+
+@dataclass
+class _Flight:
+    key: str
+    future: Future
+    started_at: float
+
+
+class SingleFlight:
+    """
+    In-flight executions by key. The first caller for a key leads and must call finish(token, result);
+    callers arriving while it runs get the leader's Future to wait on instead of repeating the work.
+    A flight older than max_age_seconds is treated as lost (leader crashed) and the next caller leads.
+    """
+    def __init__(self, max_age_seconds: float = COALESCE_WAIT_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._flights: dict[str, str] = {}          # key -> token of the current leader
+        self._tokens: dict[str, _Flight] = {}       # token -> flight
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key: str) -> tuple[Optional[str], Future, float]:
+        """
+        Returns (token, future, seconds left). token is set for the leader and None for a follower,
+        which should wait on the future for at most the seconds left.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune_locked(now)
+            token = self._flights.get(key)
+            if token is not None:
+                flight = self._tokens[token]
+                self.followers += 1
+                return None, flight.future, flight.started_at + self.max_age_seconds - now
+            token = f"{next(self._ids)}"
+            flight = _Flight(key, Future(), now)
+            self._flights[key] = token
+            self._tokens[token] = flight
+            self.leaders += 1
+            return token, flight.future, self.max_age_seconds
+
+    def finish(self, token: str, result: Any = None) -> None:
+        """Publishes the leader's result (None: followers run on their own) and closes the flight"""
+        with self._lock:
+            flight = self._tokens.pop(token, None)
+            if flight is None:
+                return
+            if self._flights.get(flight.key) == token:
+                del self._flights[flight.key]
+        if not flight.future.done():
+            flight.future.set_result(result)
+
+    def _prune_locked(self, now: float) -> None:
+        for token, flight in list(self._tokens.items()):
+            if now - flight.started_at >= self.max_age_seconds:
+                del self._tokens[token]
+                if self._flights.get(flight.key) == token:
+                    del self._flights[flight.key]
+                if not flight.future.done():
+                    flight.future.set_result(None)
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+single_flight = SingleFlight()
+
+# Tokens led by the current request, so a request that raises still releases its followers
+_led: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("single_flight_led", default=None)
+
+@contextmanager
+def flight_scope():
+    """
+    Wraps one graph run; any flight it leads and has not finished is closed (followers run on
+    their own) when the block exits, e.g. because a node raised
+    """
+    led: list[str] = []
+    token = _led.set(led)
+    try:
+        yield
+    finally:
+        for flight in led:
+            single_flight.finish(flight, None)
+        try:
+            _led.reset(token)
+        except ValueError:
+            pass    # streaming generator finalized from another context
+
+def lead(token: str) -> None:
+    """Registers a flight token with the enclosing flight_scope (nodes see the same list)"""
+    led = _led.get()
+    if led is not None:
+        led.append(token)
@@ -1,13 +1,15 @@
 # app/services/smart_indexer.py
-import os, json, hashlib
+import os, json, hashlib, time
 from app.services.embedding import embed_text
 from app.services.pinecone_index import upsert_vector
-from app.services.utils import extract_chunks
+from app.services.answer_cache import answer_cache
+from app.services.utils import extract_chunks, SUPPORTED_EXTENSIONS
+from app.services.index_stats import IndexStats, collect, stage
+from app.services.namespaces import project_namespace
 from pathlib import Path
 
 DOCS_DIR = Path("../docs")
 CACHE_FILE = Path("../index_cache.json")
-SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".msg"]
 
 def load_cache(cache_file: Path):
     """
@@ -49,41 +51,65 @@ def build_metadata(file_path: Path, chunk: str, chunk_id: int, tags: list[str] =
     }
     return metadata 
 
-def index_file(file_path: Path, cache: dict[str, str], tags: list[str] = [], doc_type: str = None, project_name: str = "Internal Doc", discipline: str = None):
-    file_hash = compute_hash(file_path)
+def index_file(file_path: Path, cache: dict[str, str], tags: list[str] = [], doc_type: str = None, project_name: str = "Internal Doc", discipline: str = None, namespace: str = None):
+    """
+    Indexes one file; returns the number of chunks upserted, or None if it is unchanged since the last run
+    """
+    with stage("hash"):
+        file_hash = compute_hash(file_path)
     str_file_path = str(file_path)
-    if cache.get(str_file_path) == file_hash:
+    # Keyed per namespace: the same file indexed for another project is not "unchanged"
+    cache_key = f"{namespace}:{str_file_path}" if namespace else str_file_path
+    if cache.get(cache_key) == file_hash:
         #print(f"⏩ Skipped (no changes): {file_path}")
-        return
+        return None
     
     chunks = extract_chunks(str_file_path)
     if not chunks:
         #print(f"⚠️ No chunks found for: {str_file_path}")
-        return
+        return 0
     #print(f"🔍 Extracted {len(chunks)} chunks from {str_file_path}")
     
     for i, chunk in enumerate(chunks):
-        vec = embed_text(chunk)
+        with stage("embed"):
+            vec = embed_text(chunk)
         chunk_metadata = build_metadata(file_path, chunk, i, tags, doc_type, project_name, discipline)
         chunk_id = f"{str_file_path}_chunk_{i}".replace(os.sep, "_")
-        upsert_vector(chunk_id, vec, chunk_metadata)
-    cache[str_file_path] = file_hash
+        with stage("upsert"):
+            upsert_vector(chunk_id, vec, chunk_metadata, namespace=namespace)
+        answer_cache.invalidate_chunks([chunk_id])
+    cache[cache_key] = file_hash
     #print(f"✅ Indexed: {str_file_path}")
+    return len(chunks)
 
 
-def run_indexing(cache_file: Path, docs_dir: Path, tags: list[str] = [], doc_type: str = None, project_name: str = "Internal Doc", discipline: str = None):
-    print(f"🚀 Starting indexing for {docs_dir}")
+def run_indexing(cache_file: Path, docs_dir: Path, tags: list[str] = [], doc_type: str = None, project_name: str = "Internal Doc", discipline: str = None, namespace: str = None) -> IndexStats:
+    """
+    Indexes every supported file under docs_dir into the project's namespace (or `namespace`),
+    so reindexing one project never touches the vectors of another
+    """
+    namespace = namespace or project_namespace(project_name)
+    print(f"🚀 Starting indexing for {docs_dir} into namespace '{namespace}'")
     cache = load_cache(cache_file)
     print(f"📁 Cache loaded with {len(cache)} files")
 
-    for root, _, files in os.walk(docs_dir):
-        for filename in files:
-            file_path = Path(root) / filename
-            ext = file_path.suffix.lower()        
-            if ext not in SUPPORTED_EXTENSIONS:
-                continue
-            try:
-                index_file(file_path, cache, tags, doc_type, project_name, discipline)
-            except Exception as e:
-                print(f"❌ Failed to index {file_path}: {e}")
-    save_cache(cache, cache_file)
\ No newline at end of file
+    stats = IndexStats()
+    started = time.perf_counter()
+    with collect(stats):
+        for root, _, files in os.walk(docs_dir):
+            for filename in files:
+                file_path = Path(root) / filename
+                ext = file_path.suffix.lower()        
+                if ext not in SUPPORTED_EXTENSIONS:
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    chunks = index_file(file_path, cache, tags, doc_type, project_name, discipline, namespace)
+                    stats.add_file(ext, file_path.stat().st_size, chunks, time.perf_counter() - t0)
+                except Exception as e:
+                    print(f"❌ Failed to index {file_path}: {e}")
+                    stats.add_file(ext, 0, None, time.perf_counter() - t0, failed=True)
+    stats.seconds = time.perf_counter() - started
+    save_cache(cache, cache_file)
+    print(f"📊 {stats.format()}")
+    return stats
\ No newline at end of file
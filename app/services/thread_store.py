@@ -0,0 +1,189 @@
+# app/services/thread_store.py
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+from app.config import THREAD_CACHE_MAX_THREADS, THREAD_CACHE_TTL_SECONDS, THREAD_FLUSH_INTERVAL_SECONDS, THREAD_SPOOL_DIR
+from app.services.resilience import call
+from app.services.ttl_cache import TTLCache
+
+THREAD_FIELDS = ("summary", "thread_preview", "previous_rewrites")
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class ThreadStore:
+    """
+    Write-behind cache for the Supabase threads table. Reads are served from memory for up to
+    cache_ttl seconds after a fetch (other workers write the same threads, so a cached row is
+    only trusted briefly); writes update memory immediately, are coalesced per thread and
+    upserted by a background task. Only the fields passed to put() are ever upserted. Unflushed
+    writes are spooled to a per-process file so a crash or a Supabase outage does not lose them;
+    they are retried with backoff and replayed by the next process.
+    """
+    def __init__(self, client, flush_interval: float = THREAD_FLUSH_INTERVAL_SECONDS, max_threads: int = THREAD_CACHE_MAX_THREADS,
+                 spool_dir: Optional[Path] = THREAD_SPOOL_DIR, cache_ttl: float = THREAD_CACHE_TTL_SECONDS):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.spool_path = self.spool_dir / f"thread_writes.{os.getpid()}.json" if self.spool_dir else None
+        # Rows as last read (or written) by this process; pending writes live in _pending, not here
+        self._threads = TTLCache(max_entries=max_threads, ttl_seconds=cache_ttl)
+        self._pending: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.failures = 0
+        self._load_spool()
+
+    # --- Reads ---
+    async def get(self, user_id: str, thread_id: str) -> dict:
+        key = (user_id, thread_id)
+        with self._lock:
+            row = self._threads.get(key)
+            if row is not None:
+                return dict(row)
+        fetched = await asyncio.to_thread(self._select, user_id, thread_id)
+        with self._lock:
+            # This process's unflushed writes (including any made during the select) win over the fetch
+            row = {**fetched, **self._pending.get(key, {})}
+            self._threads.set(key, row)
+            return dict(row)
+
+    def _select(self, user_id: str, thread_id: str) -> dict:
+        result = call("supabase", lambda: (
+            self.client.table("threads")
+            .select(*THREAD_FIELDS)
+            .eq("user_id", user_id)
+            .eq("id", thread_id)
+            .maybe_single()
+            .execute()
+        ), hedge=True)
+        data = (result.data if result is not None else None) or {}
+        return {field: data.get(field) for field in THREAD_FIELDS if field in data}
+
+    # --- Writes ---
+    def put(self, user_id: str, thread_id: str, **fields) -> None:
+        key = (user_id, thread_id)
+        with self._lock:
+            cached = self._threads.get(key)
+            if cached is not None:
+                self._threads.set(key, {**cached, **fields})
+            # With no fresh cached row the next get() fetches it and overlays the pending fields
+            self._pending[key] = {**self._pending.get(key, {}), **fields}
+            self._write_spool_locked()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Upserts every pending thread once. A row leaves the queue only if it was written and not
+        updated in the meantime, so failures (and cancellation) keep it for the next attempt.
+        Returns the number of rows still pending.
+        """
+        with self._lock:
+            batch = dict(self._pending)
+        for key, fields in batch.items():
+            row = {"user_id": key[0], "id": key[1], **fields}
+            try:
+                # No inline retries: the row stays pending and the flusher backs off
+                await asyncio.to_thread(call, "supabase", lambda: self.client.table("threads").upsert(row).execute(), retries=0)
+            except Exception as e:
+                self.failures += 1
+                print(f"Thread write failed ({key[1]}), will retry: {e}")
+                continue
+            with self._lock:
+                if self._pending.get(key) is fields:
+                    del self._pending[key]
+        with self._lock:
+            self._write_spool_locked()
+            return len(self._pending)
+
+    # --- Background flusher ---
+    async def start(self) -> None:
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        if self._pending:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        # Stop the flusher between attempts rather than cancelling an upsert mid-flight
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        delay = self.flush_interval
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                break
+            # Let writes from the same burst coalesce before flushing
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            if await self.flush():
+                delay = min(max(delay, self.flush_interval) * 2, MAX_BACKOFF_SECONDS)
+            else:
+                delay = self.flush_interval
+
+    # --- Durable spool ---
+    def _write_spool_locked(self) -> None:
+        if self.spool_path is None:
+            return
+        if not self._pending:
+            self.spool_path.unlink(missing_ok=True)
+            return
+        rows = [{"user_id": u, "id": t, **fields} for (u, t), fields in self._pending.items()]
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.spool_path.with_name(f".{self.spool_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(rows))
+        os.replace(tmp_path, self.spool_path)
+
+    def _load_spool(self) -> None:
+        """
+        Adopts spool files left by processes that are no longer running
+        """
+        if self.spool_dir is None or not self.spool_dir.exists():
+            return
+        adopted = 0
+        for path in self.spool_dir.glob("thread_writes.*.json"):
+            pid = path.name.split(".")[1]
+            if path == self.spool_path or (pid.isdigit() and _is_running(int(pid))):
+                continue
+            claimed = path.with_name(f".{path.name}.{os.getpid()}.claimed")
+            try:
+                os.rename(path, claimed)
+                rows = json.loads(claimed.read_text())
+            except FileNotFoundError:
+                continue    # another worker claimed it first
+            except (OSError, ValueError) as e:
+                print(f"Could not read thread write spool {path}: {e}")
+                continue
+            for row in rows:
+                key = (row.pop("user_id"), row.pop("id"))
+                self._pending[key] = {**row, **self._pending.get(key, {})}
+            adopted += len(rows)
+            claimed.unlink(missing_ok=True)
+        if adopted:
+            print(f"Replaying {adopted} unflushed thread writes")
+            with self._lock:
+                self._write_spool_locked()
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
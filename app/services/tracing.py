@@ -0,0 +1,178 @@
+# app/services/tracing.py
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from app.config import TRACE_LOG_ENABLED
+from app.services.metrics import metrics
+
+metrics.describe("assistant_request_duration_seconds", "histogram", "End-to-end assistant request time")
+metrics.describe("assistant_node_duration_seconds", "histogram", "Wall time per graph node")
+metrics.describe("assistant_node_errors_total", "counter", "Graph node exceptions")
+metrics.describe("assistant_llm_duration_seconds", "histogram", "Latency of individual model calls")
+metrics.describe("assistant_llm_tokens_total", "counter", "Tokens used by model calls")
+metrics.describe("assistant_cache_lookups_total", "counter", "Cache lookups by cache and result")
+metrics.describe("assistant_retrieved_items_total", "counter", "Chunks/rows returned by retrieval steps")
+
+
+@dataclass
+class Span:
+    name: str
+    duration_ms: float = 0.0
+    llm_calls: int = 0
+    llm_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    attributes: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        data = {"name": self.name, "ms": round(self.duration_ms, 1)}
+        if self.llm_calls:
+            data.update(llm_calls=self.llm_calls, llm_ms=round(self.llm_ms, 1),
+                        prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens)
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class Trace:
+    """
+    Spans recorded for one request. Nodes run in worker threads with a copy of the request's
+    context, so they share this object (not the context variable) and append under a lock.
+    """
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.spans: list[Span] = []
+        self.duration_ms = 0.0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def last_span(self, name: str) -> Optional[Span]:
+        with self._lock:
+            return next((s for s in reversed(self.spans) if s.name == name), None)
+
+    def timings(self) -> dict:
+        """Per-stage summary for clients: total ms, LLM ms and tokens"""
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 1),
+            "llm_ms": round(sum(s.llm_ms for s in spans), 1),
+            "prompt_tokens": sum(s.prompt_tokens for s in spans),
+            "completion_tokens": sum(s.completion_tokens for s in spans),
+            "stages": [{"node": s.name, "ms": round(s.duration_ms, 1)} for s in spans],
+        }
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = [s.to_dict() for s in self.spans]
+        return {"event": "trace", "trace_id": self.trace_id, "name": self.name,
+                "ms": round(self.duration_ms, 1), **self.attributes, "spans": spans}
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("assistant_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("assistant_span", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def trace_request(name: str, **attributes):
+    """
+    Collects node spans for the duration of the block; on exit records the request histogram
+    and emits the trace as one JSON log line
+    """
+    trace = Trace(name, **attributes)
+    token = _current_trace.set(trace)
+    status = "ok"
+    try:
+        yield trace
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            pass    # streaming generator finalized from another context (client disconnected)
+        trace.duration_ms = (time.perf_counter() - trace._start) * 1000
+        trace.attributes["status"] = status
+        metrics.observe("assistant_request_duration_seconds", trace.duration_ms / 1000, endpoint=name, status=status)
+        if TRACE_LOG_ENABLED:
+            print(json.dumps(trace.to_dict(), default=str))
+
+@contextmanager
+def _node_span(name: str):
+    span = Span(name)
+    token = _current_span.set(span)
+    t0 = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.error = f"{type(e).__name__}: {e}"
+        metrics.inc("assistant_node_errors_total", node=name)
+        raise
+    finally:
+        span.duration_ms = (time.perf_counter() - t0) * 1000
+        _current_span.reset(token)
+        metrics.observe("assistant_node_duration_seconds", span.duration_ms / 1000, node=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(span)
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """
+    Wraps a graph node (sync or async) so each call records a span (wall time, LLM calls, annotations)
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _anode(state):
+            with _node_span(name):
+                return await fn(state)
+        return _anode
+
+    @functools.wraps(fn)
+    def _node(state):
+        with _node_span(name):
+            return fn(state)
+    return _node
+
+def annotate(**attributes) -> None:
+    """Attaches attributes to the node span currently running (no-op outside a node)"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+def record_cache(cache: str, hit: bool) -> None:
+    metrics.inc("assistant_cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+    annotate(**{f"{cache}_cache_hit": hit})
+
+def record_retrieval(kind: str, count: int) -> None:
+    metrics.inc("assistant_retrieved_items_total", count, kind=kind)
+    annotate(**{f"{kind}_count": count})
+
+def record_llm_call(model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+    metrics.observe("assistant_llm_duration_seconds", seconds, model=model)
+    metrics.inc("assistant_llm_tokens_total", prompt_tokens, model=model, kind="prompt")
+    metrics.inc("assistant_llm_tokens_total", completion_tokens, model=model, kind="completion")
+    span = _current_span.get()
+    if span is not None:
+        span.llm_calls += 1
+        span.llm_ms += seconds * 1000
+        span.prompt_tokens += prompt_tokens
+        span.completion_tokens += completion_tokens
@@ -0,0 +1,181 @@
+# app/services/ttl_cache.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+_MISSING = object()
+
+
+class SQLiteCacheBackend:
+    """
+    Shared cache tier in a SQLite file, so every uvicorn worker on the host sees the same entries.
+    Values are stored as JSON; expiry uses wall-clock time since it is compared across processes.
+    """
+    def __init__(self, path: Path, namespace: str, max_entries: int = 10000):
+        self.path = Path(path)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return _MISSING
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, payload, time.time() + ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % 256 == 0:
+                self._prune_locked()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def _prune_locked(self) -> None:
+        # Expired rows first, then the rows closest to expiry above the cap
+        self._conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time()))
+        self._conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and hit/miss counters. get/set/delete are O(1)
+    (OrderedDict move_to_end / popitem). With a backend, misses fall through to the shared tier
+    and writes go to both, so entries computed by one worker are reused by the others.
+    `on_evict(key, value)` is called, under the cache lock, for entries dropped by capacity or
+    expiry (not for delete/clear); it must not call back into the cache.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, backend: Optional[SQLiteCacheBackend] = None,
+                 on_evict: Optional[Callable[[str, Any], None]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.on_evict = on_evict
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            rec = self._entries.get(key)
+            if rec is not None:
+                if rec[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return rec[0]
+                del self._entries[key]
+                if self.on_evict is not None:
+                    self.on_evict(key, rec[0])
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except sqlite3.Error as e:
+                print(f"Shared cache read failed: {e}")
+                value = _MISSING
+            if value is not _MISSING:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store_locked(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._store_locked(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, self.ttl_seconds)
+            except sqlite3.Error as e:
+                print(f"Shared cache write failed: {e}")
+
+    def delete(self, key: str) -> bool:
+        """Removes the entry; True if this process held it"""
+        with self._lock:
+            found = self._entries.pop(key, None) is not None
+        if self.backend is not None:
+            self.backend.delete(key)
+        return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.shared_hits = self.evictions = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+    def _store_locked(self, key: str, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest, (value, _) = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(oldest, value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_cache(namespace: str, max_entries: int, ttl_seconds: float, backend: str = "memory", path: Optional[Path] = None) -> TTLCache:
+    """
+    Builds a TTLCache, backed by the shared SQLite file when backend == "sqlite"
+    """
+    shared = None
+    if backend == "sqlite" and path is not None:
+        try:
+            shared = SQLiteCacheBackend(path, namespace)
+        except sqlite3.Error as e:
+            print(f"Shared cache unavailable ({path}): {e}. Using in-process cache only.")
+    return TTLCache(max_entries, ttl_seconds, backend=shared)
@@ -1,18 +1,13 @@
 import os
 from pathlib import Path
-from pinecone import Pinecone
-from app.services.document_loader import (
-    extract_pdf_chunks,
-    extract_docx_chunk,
-    extract_txt_chunk,
-    extract_excel_chunk,
-    extract_msg_chunk
-)
 from app.config import PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX
 
+SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".msg"]
 
 def extract_chunks(file_path: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
     """Dispatches to the appropriate extraction method based on file type."""
+    # Loaders pull in langchain_community/PyMuPDF, so import them only when extracting
+    from app.services.document_loader import extract_pdf_chunks, extract_docx_chunk, extract_txt_chunk, extract_msg_chunk
     ext = Path(file_path).suffix.lower()
 
     if ext == ".pdf":
@@ -43,6 +38,7 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[st
 
 def clear_index():
     """Deletes all vectors from Pinecone index and removes local cache."""
+    from pinecone import Pinecone
     pc = Pinecone(api_key=PINECONE_API_KEY, environment=PINECONE_ENV)
     index = pc.Index(PINECONE_INDEX)
     index.delete(delete_all=True)
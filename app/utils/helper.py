@@ -5,8 +5,10 @@ from langchain.schema import HumanMessage, AIMessage, SystemMessage
 Render a compact representation of the conversation window.
 """
 def render_message_summary(messages, window_size = 5):
-    compact_messages = messages[-window_size:]
-    return "\n".join([f"{_role(msg)}: {_content(msg)}" for msg in compact_messages])
+    return "\n".join(render_message_lines(messages, window_size))
+
+def render_message_lines(messages, window_size = 5) -> list[str]:
+    return [f"{_role(msg)}: {_content(msg)}" for msg in messages[-window_size:]]
 
 def _content(m) -> str:
     return m.get("content", "") if isinstance(m, dict) else getattr(m, "content", "")
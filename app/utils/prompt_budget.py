@@ -0,0 +1,135 @@
+# File: app/utils/prompt_budget.py
+from dataclasses import dataclass, field
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400   # loaders split with a 200-char overlap; allow for whitespace shifts
+
+def overlap_length(left: str, right: str, min_overlap: int = MIN_OVERLAP_CHARS, max_overlap: int = MAX_OVERLAP_CHARS) -> int:
+    """
+    Length of the longest suffix of left that is also a prefix of right (0 if shorter than min_overlap)
+    """
+    tail = left[-max_overlap:]
+    probe = right[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    start = tail.find(probe)
+    while start != -1:
+        candidate = tail[start:]
+        if right.startswith(candidate):
+            return len(candidate)
+        start = tail.find(probe, start + 1)
+    return 0
+
+def _chunk_index(chunk: dict):
+    value = chunk.get("metadata", {}).get("chunk_id")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def merge_chunks(chunks: list[dict]) -> list[dict]:
+    """
+    Drops duplicate/contained snippets and stitches consecutive chunks of the same file
+    (chunk_id i, i+1) into one snippet with the shared overlap removed. Each merged block keeps
+    the rank of its best-ranked member.
+    """
+    kept: list[dict] = []
+    for chunk in chunks:
+        snippet = chunk.get("snippet", "")
+        if not snippet.strip():
+            continue
+        path = chunk.get("metadata", {}).get("file_path")
+        same_file = [k for k in kept if k["metadata"].get("file_path") == path]
+        if any(snippet in k["snippet"] for k in same_file):
+            continue
+        block = {**chunk, "metadata": dict(chunk.get("metadata", {})), "_span": (_chunk_index(chunk),) * 2}
+        wider = next((k for k in same_file if k["snippet"] in snippet), None)
+        if wider is not None:
+            # Keep the better rank, but the fuller chunk: its text, metadata and span go together
+            kept[kept.index(wider)] = block
+            continue
+        kept.append(block)
+
+    merged = True
+    while merged:
+        merged = False
+        for block in kept:
+            lo, hi = block["_span"]
+            if hi is None:
+                continue
+            path = block["metadata"].get("file_path")
+            nxt = next((b for b in kept if b is not block and b["metadata"].get("file_path") == path and b["_span"][0] == hi + 1), None)
+            if nxt is None:
+                continue
+            cut = overlap_length(block["snippet"], nxt["snippet"])
+            sep = "" if cut else "\n"
+            block["snippet"] = block["snippet"] + sep + nxt["snippet"][cut:]
+            block["_span"] = (lo, nxt["_span"][1])
+            kept.remove(nxt)
+            merged = True
+            break
+
+    for block in kept:
+        lo, hi = block.pop("_span")
+        if lo is not None and hi != lo:
+            block["metadata"]["chunk_id"] = f"{lo}-{hi}"
+    return kept
+
+def pack_chunks(chunks: list[dict], max_tokens: int) -> list[dict]:
+    """
+    Takes chunks in rank order until max_tokens is used; the last one is truncated to fit
+    """
+    packed, budget = [], max_tokens
+    for chunk in chunks:
+        if budget <= 0:
+            break
+        cost = count_tokens(chunk["snippet"])
+        if cost > budget:
+            snippet = truncate_to_tokens(chunk["snippet"], budget)
+            if snippet.strip():
+                packed.append({**chunk, "snippet": snippet})
+            break
+        packed.append(chunk)
+        budget -= cost
+    return packed
+
+def fit_turns(turns: list[str], max_tokens: int) -> list[str]:
+    """
+    Keeps the most recent turns that fit in max_tokens (oldest dropped first)
+    """
+    kept, budget = [], max_tokens
+    for turn in reversed(turns):
+        cost = count_tokens(turn)
+        if cost > budget:
+            break
+        kept.append(turn)
+        budget -= cost
+    return list(reversed(kept))
+
+
+@dataclass
+class PromptBudget:
+    """
+    Splits a prompt token budget: fixed instructions first, then the running summary and recent
+    turns up to their caps, and whatever remains goes to retrieved context
+    """
+    total: int
+    summary_cap: int
+    history_cap: int
+    used: dict = field(default_factory=dict)
+
+    def fit(self, fixed: str, summary: str, turns: list[str], chunks: list[dict] = None) -> tuple[str, list[str], list[dict]]:
+        remaining = self.total - count_tokens(fixed)
+        summary = truncate_to_tokens(summary, max(0, min(self.summary_cap, remaining)))
+        remaining -= count_tokens(summary)
+        turns = fit_turns(turns, max(0, min(self.history_cap, remaining)))
+        remaining -= sum(count_tokens(t) for t in turns)
+        packed = pack_chunks(merge_chunks(chunks or []), max(0, remaining))
+        self.used = {
+            "fixed": count_tokens(fixed),
+            "summary": count_tokens(summary),
+            "history": sum(count_tokens(t) for t in turns),
+            "context": sum(count_tokens(c["snippet"]) for c in packed),
+        }
+        return summary, turns, packed
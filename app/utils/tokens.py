@@ -0,0 +1,42 @@
+# File: app/utils/tokens.py
+from functools import lru_cache
+
+DEFAULT_MODEL = "gpt-4o"
+_CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing or its BPE files cannot be downloaded: fall back to a char estimate
+        return None
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """
+    Counts tokens with tiktoken (approximate chars/4 if the encoding is unavailable)
+    """
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """
+    Cuts text down to at most max_tokens tokens
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        return text[: max_tokens * _CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max_tokens])
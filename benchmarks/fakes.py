@@ -0,0 +1,304 @@
+# File: benchmarks/fakes.py
+# Description: Deterministic offline stand-ins for ChatOpenAI, OpenAI embeddings, the Pinecone index
+#              and Supabase, replaying a recorded corpus with optional injected latencies
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from pydantic import ValidationError
+
+from app.services.tracing import record_llm_call
+from app.utils.tokens import count_tokens
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "fixtures" / "graph_corpus.json"
+EMBEDDING_DIM = 256
+_WORD = re.compile(r"[a-z0-9][a-z0-9.\-/]*")
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> list[float]:
+    """Hashed bag of words, L2-normalized: identical texts match exactly, overlapping ones score high"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    return (vector / norm if norm else vector).tolist()
+
+def _prompt_text(messages) -> str:
+    parts = []
+    for m in messages if isinstance(messages, list) else [messages]:
+        parts.append(m.get("content", "") if isinstance(m, dict) else getattr(m, "content", str(m)))
+    return "\n".join(str(p) for p in parts)
+
+def _system_text(messages) -> str:
+    first = messages[0] if isinstance(messages, list) and messages else {}
+    role = first.get("role") if isinstance(first, dict) else getattr(first, "type", None)
+    return _prompt_text([first]) if role == "system" else ""
+
+
+def _is_small(model: str) -> bool:
+    return "mini" in (model or "")
+
+
+class Corpus:
+    """
+    Recorded queries and the responses each model call should give for them, plus the documents
+    behind the fake index and the recorded per-call latencies (scaled by latency_scale, with
+    seeded +/- jitter so percentiles are meaningful but reproducible). A case's "mini" entry and
+    latencies_ms["mini"] override the response and latency when a small (*-mini) model answers.
+    """
+    def __init__(self, data: dict, latency_scale: float = 1.0, jitter: float = 0.0, seed: int = 0):
+        self.cases: list[dict] = data["cases"]
+        self.documents: list[dict] = data.get("documents", [])
+        self.latencies_ms: dict = data.get("latencies_ms", {})
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_CORPUS, **kwargs) -> "Corpus":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")), **kwargs)
+
+    def delay(self, kind: str, model: str = "") -> float:
+        recorded = self.latencies_ms.get("mini", {}).get(kind) if _is_small(model) else None
+        base = (recorded if recorded is not None else self.latencies_ms.get(kind, 0)) * self.latency_scale / 1000
+        if base <= 0:
+            return 0.0
+        with self._rng_lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return base * factor
+
+    def find_case(self, text: str) -> Optional[dict]:
+        text = text.lower()
+        best, best_len = None, 0
+        for case in self.cases:
+            for key in ("query", "rewritten"):
+                needle = (case.get(key) or "").lower()
+                if needle and needle in text and len(needle) > best_len:
+                    best, best_len = case, len(needle)
+        return best
+
+    # --- Responses ---
+    @staticmethod
+    def _override(case: dict, model: str) -> dict:
+        return case.get("mini", {}) if _is_small(model) else {}
+
+    def structured(self, schema, messages, model: str = ""):
+        text = _prompt_text(messages)
+        case = self.find_case(text) or {}
+        override = self._override(case, model)
+        name = schema.__name__
+        if name == "ClassifyAndRewrite":
+            fields = {
+                "query_class": case.get("query_class", "general"),
+                "query_subclass": case.get("query_subclass", "needs_llm"),
+                "rewritten": case.get("rewritten") or case.get("query") or "project question",
+                "structured_query": case.get("structured_query"),
+            }
+            return "classify", schema(**fields)
+        if name == "GuardrailsClassification":
+            return "guard_llm", schema(blocked=bool(case.get("blocked")))
+        summary = f"Discussed: {case.get('rewritten') or case.get('query') or 'project question'}"
+        preview = " ".join((case.get("name") or "project question").replace("_", " ").split()[:5])
+        if name == "ResponsePayload":
+            answer = override.get("answer", case.get("answer", "No answer recorded."))
+            return "answer", schema(answer=answer, updated_summary=summary, thread_preview=preview)
+        if name == "CompactResponsePayload":
+            return "compact", schema(updated_summary=summary, thread_preview=preview)
+        raise ValueError(f"No recorded response for structured output {name}")
+
+    def malformed(self, messages, model: str = "") -> bool:
+        """Whether the case's structured replies are recorded as fenced JSON with a trailing comma"""
+        case = self.find_case(_prompt_text(messages)) or {}
+        return bool(self._override(case, model).get("malformed", case.get("malformed")))
+
+    def text(self, messages, model: str = "") -> tuple[str, str]:
+        system = _system_text(messages).lower()
+        prompt = _prompt_text(messages)
+        case = self.find_case(prompt) or {}
+        override = self._override(case, model)
+        if "ranking assistant" in system:
+            if "rerank" in override:
+                return "rerank", override["rerank"]
+            count = len(re.findall(r'^\s*"\d+\. ', prompt, flags=re.MULTILINE))
+            return "rerank", json.dumps(list(range(1, min(count, 8) + 1)))
+        if "python data scientist" in system:
+            return "codegen", override.get("code", case.get("code", "print(len(df))"))
+        if "strict formatter" in system:
+            code = case.get("code", "")
+            return "summarize", (
+                f"=== FINAL ANSWER ===\n{case.get('answer', 'Done.')}\n\n"
+                f"=== ANALYSIS ===\nThe code filters and aggregates the RFI log with pandas.\n\n"
+                f"=== CODE ===\n{code}"
+            )
+        if "rewrite" in system:
+            return "chat", case.get("rewritten") or case.get("query") or prompt[-200:]
+        return "chat", case.get("answer", "ok")
+
+
+class FakeChatModel:
+    """Duck-typed ChatOpenAI: invoke/ainvoke/with_structured_output answered from the corpus"""
+    def __init__(self, corpus: Corpus, model: str = "gpt-4o", temperature: float = 0.3):
+        self.corpus = corpus
+        self.model_name = model
+        self.temperature = temperature
+
+    def _account(self, kind: str, messages, output: str, seconds: float) -> None:
+        record_llm_call(f"fake-{self.model_name}", seconds, count_tokens(_prompt_text(messages)), count_tokens(output))
+
+    def invoke(self, messages, *args, **kwargs):
+        kind, content = self.corpus.text(messages, self.model_name)
+        delay = self.corpus.delay(kind, self.model_name)
+        time.sleep(delay)
+        self._account(kind, messages, content, delay)
+        return AIMessage(content=content)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        kind, content = self.corpus.text(messages, self.model_name)
+        delay = self.corpus.delay(kind, self.model_name)
+        await asyncio.sleep(delay)
+        self._account(kind, messages, content, delay)
+        return AIMessage(content=content)
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs):
+        return _FakeStructured(self, schema, include_raw)
+
+
+class _FakeStructured:
+    """Parses the recorded reply like the real structured-output runnable, include_raw result shape included"""
+    def __init__(self, model: FakeChatModel, schema, include_raw: bool = False):
+        self.model = model
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def invoke(self, messages, *args, **kwargs):
+        kind, result = self.model.corpus.structured(self.schema, messages, self.model.model_name)
+        content = result.model_dump_json()
+        if self.model.corpus.malformed(messages, self.model.model_name):
+            content = f"Here is the JSON:\n```json\n{content[:-1]},\n}}\n```"
+        delay = self.model.corpus.delay(kind, self.model.model_name)
+        time.sleep(delay)
+        self.model._account(kind, messages, content, delay)
+        try:
+            parsed, error = self.schema.model_validate_json(content), None
+        except ValidationError as e:
+            parsed, error = None, e
+        if self.include_raw:
+            return {"raw": AIMessage(content=content), "parsed": parsed, "parsing_error": error}
+        if error is not None:
+            raise error
+        return parsed
+
+
+class FakeEmbeddingsClient:
+    """OpenAI SDK shape: client.embeddings.create(input=[...], model=...)"""
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        self.embeddings = self
+
+    def create(self, input, model: str, **kwargs):
+        time.sleep(self.corpus.delay("embedding"))
+        texts = input if isinstance(input, list) else [input]
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=fake_embedding(t)) for t in texts],
+            usage=SimpleNamespace(prompt_tokens=sum(count_tokens(t) for t in texts)),
+        )
+
+
+def _matches_filter(metadata: dict, flt: Optional[dict]) -> bool:
+    for field, cond in (flt or {}).items():
+        value = metadata.get(field)
+        values = value if isinstance(value, list) else [value]
+        if "$eq" in cond and cond["$eq"] not in values:
+            return False
+        if "$in" in cond and not set(values) & set(cond["$in"]):
+            return False
+    return True
+
+
+class FakeIndex:
+    """Pinecone Index shape: exact cosine search over the corpus documents, honoring $eq/$in filters"""
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        self._ids = [d["id"] for d in corpus.documents]
+        self._metadata = [{k: v for k, v in d.items() if k != "id"} for d in corpus.documents]
+        self._vectors = np.array([fake_embedding(d["snippet"]) for d in corpus.documents], dtype=np.float32).reshape(len(self._ids), EMBEDDING_DIM)
+        self.upserted = 0
+        self._lock = threading.Lock()
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True, namespace=None, filter=None, **kwargs):
+        time.sleep(self.corpus.delay("pinecone"))
+        scores = self._vectors @ np.asarray(vector, dtype=np.float32)
+        order = [i for i in np.argsort(-scores) if _matches_filter(self._metadata[i], filter)][:top_k]
+        return {"matches": [{"id": self._ids[i], "score": float(scores[i]), "metadata": dict(self._metadata[i])} for i in order]}
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        time.sleep(self.corpus.delay("upsert"))
+        with self._lock:
+            self.upserted += len(vectors)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, *args, **kwargs):
+        return {}
+
+    def fetch(self, *args, **kwargs):
+        return {"vectors": {}}
+
+
+class FakeSupabase:
+    """Just enough of the supabase-py query builder for ThreadStore and MessageWriter"""
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        self.tables: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> "_FakeQuery":
+        return _FakeQuery(self, name)
+
+
+class _FakeQuery:
+    def __init__(self, db: FakeSupabase, table: str):
+        self.db, self.table, self.filters, self.rows, self.single = db, table, {}, None, False
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def maybe_single(self):
+        self.single = True
+        return self
+
+    def upsert(self, row):
+        self.rows = [row]
+        return self
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+        time.sleep(self.db.corpus.delay("supabase"))
+        with self.db._lock:
+            table = self.db.tables.setdefault(self.table, {})
+            if self.rows is not None:
+                for row in self.rows:
+                    key = (row.get("user_id"), row.get("id")) if "id" in row else len(table)
+                    table[key] = {**table.get(key, {}), **row}
+                return SimpleNamespace(data=self.rows)
+            found = [r for r in table.values() if all(r.get(k) == v for k, v in self.filters.items())]
+        if self.single:
+            return SimpleNamespace(data=found[0] if found else None)
+        return SimpleNamespace(data=found)
@@ -0,0 +1,215 @@
+# File: benchmarks/graph_bench.py
+# Description: Replays a recorded query corpus through the assistant graph with fake OpenAI, Pinecone and
+#              Supabase backends; reports per-node and end-to-end p50/p95, throughput and memory
+# Usage: python -m benchmarks.graph_bench [--concurrency 1,4,8] [--rounds 2] [--latency-scale 1.0] [--deadline 45] [--json out.json]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+_TMP = Path(tempfile.mkdtemp(prefix="graph_bench_"))
+
+# Offline defaults; must be set before app.config is imported
+os.environ.setdefault("EXCEL_PATH", str(ROOT / "test-file" / "CCC - CA Log (Current).xlsm"))
+os.environ.setdefault("EXCEL_ARROW_PATH", str(_TMP / "rfi_log.arrow"))
+os.environ.setdefault("OPENAI_API_KEY", "offline-bench")
+os.environ.setdefault("PINECONE_API_KEY", "offline-bench")
+os.environ.setdefault("PLOT_STORE_DIR", str(_TMP / "plots"))
+os.environ.setdefault("THREAD_SPOOL_DIR", str(_TMP / "thread_spool"))
+os.environ.setdefault("GUARD_CACHE_BACKEND", "memory")
+os.environ.setdefault("RFI_READ_FOLDERS", "never")
+os.environ.setdefault("TRACE_LOG_ENABLED", "false")
+
+from benchmarks.fakes import DEFAULT_CORPUS, Corpus, FakeChatModel, FakeEmbeddingsClient, FakeIndex, FakeSupabase
+from app.services.tracing import trace_request
+from app.services.single_flight import flight_scope
+from app.services.metrics import metrics
+from app.services.deadline import with_deadline
+from app.graph.assistant import arun_within_deadline
+
+
+def install_fakes(corpus: Corpus, patch=setattr) -> None:
+    """
+    Points every external client the graph uses at the corpus-backed fakes
+    (pass monkeypatch.setattr as `patch` to undo it after a test)
+    """
+    from app.clients import openAI_client
+    from app.graph.nodes import guardrails
+    from app.services import embedding, pinecone_index
+
+    def get_client(api_key: str = None, model: str = "gpt-4o", temperature: float = 0.3):
+        return FakeChatModel(corpus, model=model, temperature=temperature)
+
+    index = FakeIndex(corpus)
+    patch(openAI_client, "get_client", get_client)
+    patch(guardrails, "get_client", get_client)
+    patch(embedding, "client", FakeEmbeddingsClient(corpus))
+    patch(pinecone_index, "get_index", lambda: index)
+
+def reset_caches() -> None:
+    from app.graph.nodes.guardrails import RULE_CACHE, LLM_CACHE
+    from app.services.answer_cache import answer_cache
+    from app.services.code_cache import code_cache
+    for cache in (RULE_CACHE, LLM_CACHE, answer_cache, code_cache):
+        cache.clear()
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def _summary(values_ms: list[float]) -> dict:
+    return {"n": len(values_ms), "p50_ms": round(percentile(values_ms, 50), 1), "p95_ms": round(percentile(values_ms, 95), 1),
+            "mean_ms": round(sum(values_ms) / len(values_ms), 1) if values_ms else 0.0}
+
+
+async def run_request(graph, thread_store, case: dict, thread_id: str, deadline: float = None):
+    """
+    Same flow as POST /generate: thread state read, graph run (under a request deadline of
+    `deadline` seconds when set), write-behind of the summary. Returns (trace, ok, final state)
+    """
+    user_id = "bench-user"
+    prior = await thread_store.get(user_id, thread_id)
+    state = {
+        "user_id": user_id,
+        "id": thread_id,
+        "messages": [{"role": "user", "content": case["query"]}],
+        "history": prior.get("summary") or "(none)",
+        "previous_rewrites": [],
+    }
+    cfg = {"configurable": {"id": thread_id, "user_id": user_id}}
+    with trace_request("bench", case=case["name"]) as trace, flight_scope():
+        try:
+            if deadline is None:
+                result = await graph.ainvoke(state, config=cfg)
+            else:
+                result = await arun_within_deadline(graph, state, with_deadline(cfg, deadline))
+            ok = "error" not in result or bool(case.get("blocked"))
+        except Exception as e:
+            result, ok = {"error": f"{type(e).__name__}: {e}"}, False
+    thread_store.put(user_id, thread_id, summary=result.get("history", ""), thread_preview=result.get("thread_preview", ""))
+    return trace, ok, result
+
+async def run_level(graph, corpus: Corpus, concurrency: int, rounds: int, deadline: float = None) -> dict:
+    from app.services.thread_store import ThreadStore
+    thread_store = ThreadStore(FakeSupabase(corpus), spool_dir=None)
+    await thread_store.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    jobs = [(case, f"bench-{concurrency}-{r}-{i}") for r in range(rounds) for i, case in enumerate(corpus.cases)]
+
+    async def one(case, thread_id):
+        async with semaphore:
+            return await run_request(graph, thread_store, case, thread_id, deadline)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(case, tid) for case, tid in jobs))
+    wall = time.perf_counter() - t0
+    await thread_store.close()
+
+    nodes: dict[str, list[float]] = {}
+    degraded: dict[str, int] = {}
+    for trace, _, _ in results:
+        for span in trace.spans:
+            nodes.setdefault(span.name, []).append(span.duration_ms)
+            if "deadline" in span.attributes:
+                degraded[span.attributes["deadline"]] = degraded.get(span.attributes["deadline"], 0) + 1
+    errors = [(trace.attributes.get("case"), result.get("error")) for trace, ok, result in results if not ok]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 2) if wall else 0.0,
+        "end_to_end": _summary([trace.duration_ms for trace, _, _ in results]),
+        "nodes": {name: _summary(values) for name, values in sorted(nodes.items())},
+        "llm_tokens": sum(s.prompt_tokens + s.completion_tokens for trace, _, _ in results for s in trace.spans),
+        "deadline_degradations": degraded,
+        "errors": errors,
+    }
+
+
+def _print_level(level: dict) -> None:
+    e2e = level["end_to_end"]
+    print(f"\n== concurrency {level['concurrency']}: {level['requests']} requests in {level['wall_s']}s "
+          f"-> {level['throughput_rps']} req/s | end-to-end p50 {e2e['p50_ms']} ms, p95 {e2e['p95_ms']} ms "
+          f"| {level['llm_tokens']} tokens")
+    print(f"  {'node':<28}{'n':>5}{'p50 ms':>11}{'p95 ms':>11}{'mean ms':>11}")
+    for name, stats in level["nodes"].items():
+        print(f"  {name:<28}{stats['n']:>5}{stats['p50_ms']:>11}{stats['p95_ms']:>11}{stats['mean_ms']:>11}")
+    if level["deadline_degradations"]:
+        print(f"  deadline degradations: {level['deadline_degradations']}")
+    for case, err in level["errors"]:
+        print(f"  ! {case}: {err}")
+
+def _cache_counts() -> dict:
+    return {
+        f"{cache}_{result}": int(metrics.value("assistant_cache_lookups_total", cache=cache, result=result))
+        for cache in ("guard_rules", "guard_llm", "code", "answer", "coalesce") for result in ("hit", "miss")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline assistant graph benchmark")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="passes over the corpus per level")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latencies (0 = CPU only)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of random (seeded) latency jitter")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--deadline", type=float, help="per-request deadline in seconds (as set by the API)")
+    parser.add_argument("--warm", action="store_true", help="keep caches between concurrency levels")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak (slower)")
+    parser.add_argument("--verbose", action="store_true", help="show node print output")
+    parser.add_argument("--json", type=Path, help="write the full report to this file")
+    args = parser.parse_args()
+
+    corpus = Corpus.load(args.corpus, latency_scale=args.latency_scale, jitter=args.jitter, seed=args.seed)
+    install_fakes(corpus)
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    from app.graph.assistant import build_assistant_graph
+    t0 = time.perf_counter()
+    with quiet:
+        graph = build_assistant_graph()
+    build_s = time.perf_counter() - t0
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        if not args.warm:
+            reset_caches()
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            level = asyncio.run(run_level(graph, corpus, concurrency, args.rounds, args.deadline))
+        levels.append(level)
+        _print_level(level)
+
+    memory = {
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children_max_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    if args.tracemalloc:
+        memory["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    report = {"graph_build_s": round(build_s, 3), "latency_scale": args.latency_scale, "levels": levels,
+              "caches": _cache_counts(), "memory": memory}
+    print(f"\ngraph build {report['graph_build_s']}s | caches {report['caches']} | memory {memory}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"report written to {args.json}")
+    if any(level["errors"] for level in levels):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# File: benchmarks/guardrails_bench.py
+# Description: Per-request cost of the guardrail heuristics, compiled matcher vs the old list scan
+# Usage: python -m benchmarks.guardrails_bench [--iterations N]
+import argparse
+import time
+from app.graph.nodes.guardrails import match_rules
+from benchmarks.guardrails_legacy import QUERIES, legacy_rules
+
+def _per_request_us(fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - t0) / (iterations * len(QUERIES)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    mismatches = [q for q in QUERIES if legacy_rules(q) != match_rules(q).category]
+    for q in mismatches:
+        print(f"Verdict differs: {q!r} legacy={legacy_rules(q)} compiled={match_rules(q).category}")
+
+    legacy = _per_request_us(legacy_rules, args.iterations)
+    compiled = _per_request_us(match_rules, args.iterations)
+    print(f"Queries: {len(QUERIES)} x {args.iterations}")
+    print(f"legacy scan:      {legacy:8.2f} us/request")
+    print(f"compiled matcher: {compiled:8.2f} us/request ({legacy / compiled:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# File: benchmarks/import_bench.py
+# Description: Cold import time of the API module, and which imports dominate it
+# Usage: python -m benchmarks.import_bench [--module app.main] [--runs N] [--top N]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("langgraph", "langchain_openai", "openai", "pinecone", "matplotlib", "pandas", "unstructured")
+
+def time_import(module: str) -> tuple[float, str, str]:
+    """Imports `module` in a fresh interpreter with -X importtime; returns (wall seconds, importtime log, heavy modules loaded)"""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stderr, proc.stdout.strip()
+
+def top_imports(log: str, n: int) -> list[tuple[int, str]]:
+    """Packages by the cumulative time of their outermost import (microseconds), at any depth"""
+    totals: dict[str, int] = {}
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        totals[package] = max(totals.get(package, 0), int(cumulative))
+    return sorted(((us, pkg) for pkg, us in totals.items()), reverse=True)[:n]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    times, log, heavy = [], "", ""
+    for _ in range(args.runs):
+        elapsed, log, heavy = time_import(args.module)
+        times.append(elapsed)
+
+    print(f"import {args.module}: median {statistics.median(times) * 1000:.0f} ms over {args.runs} runs "
+          f"(min {min(times) * 1000:.0f} ms, includes interpreter start-up)")
+    print(f"heavy modules loaded at import: {heavy or 'none'}")
+    print("slowest imports (cumulative):")
+    for us, package in top_imports(log, args.top):
+        print(f"  {us / 1000:8.1f} ms  {package}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# File: benchmarks/index_bench.py
+# Description: Indexing throughput (files/s, chunks/s, MB/s) and per-stage breakdown (hash, parse, split,
+#              embed, upsert) of run_indexing against local stub embedding and vector backends
+# Usage: python -m benchmarks.index_bench [--docs DIR | --files N --formats txt,docx,pdf] [--embed-ms 0] [--upsert-ms 0]
+#                                         [--rerun] [--profile out.prof] [--collapsed out.txt] [--json out.json]
+# Profiles: --profile writes cProfile stats (snakeviz / pstats); --collapsed writes sampled stacks in the
+#           collapsed format py-spy emits with `--format raw` (flamegraph.pl, speedscope). For a native
+#           profile run `py-spy record -o profile.svg -- python -m benchmarks.index_bench ...` instead.
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import zipfile
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Offline defaults; must be set before app.config is imported
+os.environ.setdefault("EXCEL_PATH", str(ROOT / "test-file" / "CCC - CA Log (Current).xlsm"))
+os.environ.setdefault("OPENAI_API_KEY", "offline-bench")
+os.environ.setdefault("PINECONE_API_KEY", "offline-bench")
+os.environ.setdefault("TRACE_LOG_ENABLED", "false")
+
+from benchmarks.fakes import Corpus, FakeEmbeddingsClient, FakeIndex
+
+WORDS = (
+    "concrete slab beam column footing rebar cover shear wall coupling diagonal seismic drift story "
+    "steel connection bolt weld inspection submittal shop drawing RFI response architect contractor "
+    "elevation grid detail section specification podium transfer girder post-tensioned anchor curing "
+    "ACI 318-19 ASCE 7-16 CBC 2022 Table 20.5.1.3.1 18.10.7 12.12-1 psi kip in. ft. #5 #11 W24x68"
+).split()
+
+
+# --- Synthetic corpus ---
+def synthetic_paragraphs(rng: random.Random, pages: int, words_per_page: int = 450) -> list[str]:
+    pages_text = []
+    for _ in range(pages):
+        sentences = []
+        remaining = words_per_page
+        while remaining > 0:
+            n = min(remaining, rng.randint(8, 22))
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+            remaining -= n
+        pages_text.append(" ".join(sentences))
+    return pages_text
+
+def write_txt(path: Path, pages: list[str]) -> None:
+    path.write_text("\n\n".join(pages), encoding="utf-8")
+
+def write_docx(path: Path, pages: list[str]) -> None:
+    """Minimal WordprocessingML package: one paragraph per page"""
+    def esc(text: str) -> str:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    body = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{esc(p)}</w:t></w:r></w:p>" for p in pages)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml",
+                   '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                   '</Types>')
+        z.writestr("_rels/.rels",
+                   '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+                   '</Relationships>')
+        z.writestr("word/document.xml",
+                   '<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                   f"<w:body>{body}</w:body></w:document>")
+
+def write_pdf(path: Path, pages: list[str], line_chars: int = 95) -> None:
+    """Minimal text PDF (Helvetica, one content stream per page) without a PDF library"""
+    def esc(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = [text[i:i + line_chars] for i in range(0, len(text), line_chars)]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({esc(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(bytes(out))
+
+WRITERS = {"txt": write_txt, "docx": write_docx, "pdf": write_pdf}
+
+def build_synthetic_corpus(target: Path, files: int, formats: list[str], pages: int, seed: int) -> Path:
+    rng = random.Random(seed)
+    for fmt in formats:
+        folder = target / fmt
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(files):
+            WRITERS[fmt](folder / f"doc_{i:04d}.{fmt}", synthetic_paragraphs(rng, rng.randint(1, pages)))
+    return target
+
+
+# --- Stub backends ---
+def install_stubs(embed_ms: float, upsert_ms: float, patch=setattr) -> FakeIndex:
+    from app.services import embedding, pinecone_index
+    corpus = Corpus({"cases": [], "latencies_ms": {"embedding": embed_ms, "upsert": upsert_ms}})
+    index = FakeIndex(corpus)
+    patch(embedding, "client", FakeEmbeddingsClient(corpus))
+    patch(pinecone_index, "get_index", lambda: index)
+    return index
+
+
+# --- Sampling profiler (collapsed stacks) ---
+class StackSampler:
+    """Samples the indexing thread's stack every `interval` seconds into collapsed-stack counts"""
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.counts.most_common()), encoding="utf-8")
+
+
+def _print_report(label: str, summary: dict) -> None:
+    print(f"\n== {label}: {summary['files']} files ({summary['skipped']} unchanged, {summary['empty']} empty, "
+          f"{summary['failed']} failed), {summary['chunks']} chunks, {summary['mb']} MB in {summary['seconds']}s")
+    print(f"   {summary['files_per_s']} files/s | {summary['chunks_per_s']} chunks/s | {summary['mb_per_s']} MB/s")
+    stages = dict(summary["stage_seconds"])
+    stages["other"] = max(0.0, summary["seconds"] - sum(stages.values()))    # walk, metadata, cache bookkeeping
+    total = summary["seconds"] or 1.0
+    print(f"   {'stage':<10}{'seconds':>10}{'share':>9}")
+    for name, seconds in stages.items():
+        print(f"   {name:<10}{seconds:>10.3f}{seconds / total:>9.0%}")
+    print(f"   {'ext':<8}{'files':>7}{'MB':>9}{'chunks':>9}{'empty':>7}{'failed':>8}{'ms/file':>10}")
+    for ext, row in sorted(summary["by_extension"].items()):
+        per_file = row["seconds"] / row["files"] * 1000 if row["files"] else 0.0
+        print(f"   {ext:<8}{row['files']:>7}{row['bytes'] / 2**20:>9.2f}{row['chunks']:>9}{row['empty']:>7}{row['failed']:>8}{per_file:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexing throughput benchmark")
+    parser.add_argument("--docs", type=Path, help="index this folder instead of a synthetic corpus")
+    parser.add_argument("--files", type=int, default=20, help="synthetic files per format")
+    parser.add_argument("--formats", default="txt,docx,pdf", help=f"synthetic formats ({','.join(WRITERS)})")
+    parser.add_argument("--pages", type=int, default=6, help="max pages per synthetic file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="injected latency per embedding call")
+    parser.add_argument("--upsert-ms", type=float, default=0.0, help="injected latency per upsert call")
+    parser.add_argument("--rerun", action="store_true", help="index again with the cache to time the unchanged-file path")
+    parser.add_argument("--profile", type=Path, help="write cProfile stats to this file")
+    parser.add_argument("--collapsed", type=Path, help="write sampled collapsed stacks to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the indexer's own output")
+    parser.add_argument("--json", type=Path, help="write the report to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="index_bench_"))
+    if args.docs:
+        docs_dir = args.docs
+    else:
+        formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+        docs_dir = build_synthetic_corpus(workdir / "docs", args.files, formats, args.pages, args.seed)
+    cache_file = workdir / "index_cache.json"
+    index = install_stubs(args.embed_ms, args.upsert_ms)
+
+    from app.services.smart_indexer import run_indexing
+    # Loaders are imported on first extraction; load them now so the first file is not charged for it
+    import app.services.document_loader  # noqa: F401
+    profiler = cProfile.Profile() if args.profile else None
+    sampler = StackSampler(threading.get_ident()) if args.collapsed else contextlib.nullcontext()
+
+    runs = {}
+    with sampler:
+        for label in ["cold"] + (["unchanged"] if args.rerun else []):
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            if profiler is not None:
+                profiler.enable()
+            with quiet:
+                stats = run_indexing(cache_file, docs_dir, tags=["bench"], doc_type="BENCH", project_name="Index Bench")
+            if profiler is not None:
+                profiler.disable()
+            runs[label] = stats.summary()
+            _print_report(label, runs[label])
+
+    print(f"\nvectors upserted: {index.upserted} | corpus: {docs_dir}")
+    if profiler is not None:
+        profiler.dump_stats(str(args.profile))
+        print(f"cProfile stats written to {args.profile} (python -m pstats {args.profile})")
+    if args.collapsed:
+        sampler.write(args.collapsed)
+        print(f"collapsed stacks written to {args.collapsed} ({sum(sampler.counts.values())} samples)")
+    if args.json:
+        args.json.write_text(json.dumps({"docs": str(docs_dir), "runs": runs, "upserted": index.upserted}, indent=2))
+        print(f"report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# File: benchmarks/memory_bench.py
+# Description: Memory held by executor-style worker processes that each load the published Arrow frame
+# Usage: python -m benchmarks.memory_bench [--workers 1,2,4] [--rows N] [--arrow PATH]
+import argparse
+import multiprocessing as mp
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from app.services.excel_cache import load_arrow, publish_arrow
+
+# numpy: the old default (whole table copied into NumPy/object columns per process)
+# mapped: the default (text stays in the shared mapping); arrow: EXCEL_ZERO_COPY=true
+MODES = ("numpy", "mapped", "arrow")
+
+def _memory_kb() -> dict[str, int]:
+    """Rss and Pss (shared pages divided among the processes mapping them) of this process, in kB"""
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    return {name: int(fields[name].split()[0]) for name in ("Rss", "Pss")}
+
+def _load(arrow_path: str, mode: str) -> pd.DataFrame:
+    if mode == "numpy":
+        return ipc.open_file(pa.memory_map(arrow_path, "r")).read_all().to_pandas()
+    return load_arrow(Path(arrow_path), zero_copy=mode == "arrow")
+
+def _worker(arrow_path: str, mode: str, measured, done):
+    before = _memory_kb()
+    df = _load(arrow_path, mode)
+    # Touch every column the way generated code does, so mapped pages are actually resident
+    df.groupby("Status")["RFI #"].count()
+    df["Subject"].str.contains("coupling", case=False).sum()
+    df["Date Received"].max()
+    after = _memory_kb()
+    measured.put({name: after[name] - before[name] for name in after})
+    done.wait()  # stay alive until every worker has been measured, so the pages really are shared
+
+def measure(arrow_path: Path, mode: str, workers: int) -> list[dict[str, int]]:
+    ctx = mp.get_context("spawn")
+    measured, done = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(str(arrow_path), mode, measured, done)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    results = [measured.get(timeout=120) for _ in procs]
+    done.set()
+    for proc in procs:
+        proc.join()
+    return results
+
+def synthetic_log(rows: int) -> pd.DataFrame:
+    """An RFI-log-shaped frame: a few numeric/date columns and mostly free text"""
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 1200, rows), unit="D")
+    return pd.DataFrame({
+        "RFI #": np.arange(rows, dtype=float),
+        "Status": rng.choice(["A", "U", "R", "Open"], rows),
+        "Ball in Court": rng.choice(["NYA", "Architect", "GC/NYA", "Owner"], rows),
+        "Subject": [f"Coupling beam reinforcement at level {i % 40}, sheet S-{500 + i % 90}" for i in range(rows)],
+        "Question": [f"Please confirm the detail for grid line {i % 26} and the revised spacing per ACI 318-19 ({i})" for i in range(rows)],
+        "Date Received": dates,
+        "Date Sent": dates + pd.to_timedelta(rng.integers(1, 30, rows), unit="D"),
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--arrow", type=Path, help="published Arrow file to load instead of a synthetic log "
+                                                   "(needs Status, RFI #, Subject and Date Received columns)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arrow_path = args.arrow or publish_arrow(synthetic_log(args.rows), Path(tmp) / "log.arrow")
+        print(f"Frame: {arrow_path} ({arrow_path.stat().st_size / 2**20:.1f} MiB on disk)")
+        print(f"{'mode':>8} {'workers':>8} {'RSS/worker':>12} {'PSS/worker':>12} {'PSS total':>12}")
+        for mode in MODES:
+            for workers in (int(n) for n in args.workers.split(",")):
+                results = measure(arrow_path, mode, workers)
+                rss = sum(r["Rss"] for r in results) / workers / 1024
+                pss = sum(r["Pss"] for r in results) / 1024
+                print(f"{mode:>8} {workers:>8} {rss:9.1f} MiB {pss / workers:9.1f} MiB {pss:9.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# File: benchmarks/router_eval.py
+# Description: Offline eval of small-first model routing. Replays the recorded corpus with routing off (every
+#              answer path on the large model) and on, and reports the escalation rate per route, answer
+#              quality against the recorded reference answers, latency and estimated model cost
+# Usage: python -m benchmarks.router_eval [--latency-scale 1.0] [--rounds 1] [--json out.json]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import re
+import sys
+from pathlib import Path
+
+from benchmarks.graph_bench import install_fakes, percentile, reset_caches, run_request  # sets the offline env
+from benchmarks.fakes import DEFAULT_CORPUS, Corpus, FakeSupabase
+from app.clients import model_router
+from app.config import MODEL_SMALL, MODEL_LARGE
+from app.graph.nodes.generate import citation_problem
+from app.services.metrics import metrics
+
+# USD per 1M tokens (prompt, completion); override with --prices '{"gpt-4o": [2.5, 10]}'
+DEFAULT_PRICES = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60)}
+_WORD = re.compile(r"[a-z0-9][a-z0-9.\-/]*")
+
+
+def token_f1(answer: str, reference: str) -> float:
+    """Bag-of-words F1 between an answer and the recorded reference"""
+    got, want = _WORD.findall((answer or "").lower()), _WORD.findall((reference or "").lower())
+    if not got or not want:
+        return float(got == want)
+    common = sum(min(got.count(w), want.count(w)) for w in set(got))
+    if not common:
+        return 0.0
+    precision, recall = common / len(got), common / len(want)
+    return 2 * precision * recall / (precision + recall)
+
+def _route_samples() -> dict:
+    return {"calls": metrics.samples("assistant_model_calls_total"), "escalations": metrics.samples("assistant_model_escalations_total")}
+
+def route_counts(before: dict, after: dict) -> dict:
+    """Per route: model calls on each tier, escalation reasons and the share of small calls that escalated"""
+    routes: dict[str, dict] = {}
+    for kind in ("calls", "escalations"):
+        for key, value in after[kind].items():
+            count = int(value - before[kind].get(key, 0))
+            if not count:
+                continue
+            labels = dict(key)
+            row = routes.setdefault(labels["route"], {"small": 0, "large": 0, "escalations": {}})
+            if kind == "calls":
+                row[labels["tier"]] += count
+            else:
+                row["escalations"][labels["reason"]] = count
+    for row in routes.values():
+        escalated = sum(row["escalations"].values())
+        row["escalation_rate"] = round(escalated / row["small"], 3) if row["small"] else 0.0
+    return routes
+
+def _token_totals() -> dict:
+    return {
+        model: (metrics.value("assistant_llm_tokens_total", model=f"fake-{model}", kind="prompt"),
+                metrics.value("assistant_llm_tokens_total", model=f"fake-{model}", kind="completion"))
+        for model in {MODEL_SMALL, MODEL_LARGE, "gpt-4o", "gpt-4o-mini"}
+    }
+
+def _cost(before: dict, after: dict, prices: dict) -> tuple[float, dict]:
+    tokens, total = {}, 0.0
+    for model, (prompt, completion) in after.items():
+        used = (prompt - before[model][0], completion - before[model][1])
+        if any(used):
+            tokens[model] = {"prompt": int(used[0]), "completion": int(used[1])}
+            price = prices.get(model, (0.0, 0.0))
+            total += used[0] / 1e6 * price[0] + used[1] / 1e6 * price[1]
+    return total, tokens
+
+
+async def run_mode(graph, corpus: Corpus, rounds: int, prices: dict) -> dict:
+    from app.services.thread_store import ThreadStore
+    thread_store = ThreadStore(FakeSupabase(corpus), spool_dir=None)
+    await thread_store.start()
+    before, routes_before = _token_totals(), _route_samples()
+    cases = []
+    for r in range(rounds):
+        for i, case in enumerate(corpus.cases):
+            trace, ok, result = await run_request(graph, thread_store, case, f"eval-{r}-{i}")
+            answer = result.get("final_answer", "")
+            cases.append({
+                "case": case["name"], "ok": ok, "answer": answer,
+                "quality": round(token_f1(answer, case.get("answer", "")), 3),
+                "cited": citation_problem(answer, 99) is None,
+                "ms": trace.duration_ms,
+            })
+    await thread_store.close()
+    cost, tokens = _cost(before, _token_totals(), prices)
+    latencies = [c["ms"] for c in cases]
+    return {
+        "requests": len(cases),
+        "errors": [c["case"] for c in cases if not c["ok"]],
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "mean_quality": round(sum(c["quality"] for c in cases) / len(cases), 3) if cases else 0.0,
+        "cost_usd": round(cost, 5),
+        "tokens": tokens,
+        "routes": route_counts(routes_before, _route_samples()),
+        "cases": cases,
+    }
+
+def compare(baseline: dict, routed: dict) -> dict:
+    """Per-case quality deltas (routed - baseline) and the headline ratios"""
+    base = {c["case"]: c for c in baseline["cases"]}
+    deltas = []
+    for c in routed["cases"]:
+        ref = base.get(c["case"])
+        if ref is not None and (c["quality"] != ref["quality"] or c["cited"] != ref["cited"]):
+            deltas.append({"case": c["case"], "quality_delta": round(c["quality"] - ref["quality"], 3),
+                           "cited": c["cited"], "baseline_cited": ref["cited"]})
+    return {
+        "quality_delta": round(routed["mean_quality"] - baseline["mean_quality"], 3),
+        "p50_change": round(routed["p50_ms"] / baseline["p50_ms"] - 1, 3) if baseline["p50_ms"] else 0.0,
+        "cost_change": round(routed["cost_usd"] / baseline["cost_usd"] - 1, 3) if baseline["cost_usd"] else 0.0,
+        "changed_cases": deltas,
+    }
+
+
+def _print_mode(name: str, mode: dict) -> None:
+    print(f"\n== {name}: {mode['requests']} requests | p50 {mode['p50_ms']} ms, p95 {mode['p95_ms']} ms "
+          f"| quality {mode['mean_quality']} | ${mode['cost_usd']:.4f} | tokens {mode['tokens']}")
+    for route, row in sorted(mode["routes"].items()):
+        print(f"  {route:<10} small {row['small']:>3}  large {row['large']:>3}  escalation rate {row['escalation_rate']:.0%}  {row['escalations'] or ''}")
+    for case in mode["errors"]:
+        print(f"  ! {case}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline small-first model routing eval")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--rounds", type=int, default=1, help="passes over the corpus per mode")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latencies (0 = CPU only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prices", type=json.loads, default={}, help="JSON {model: [prompt, completion] USD per 1M tokens}")
+    parser.add_argument("--verbose", action="store_true", help="show node print output")
+    parser.add_argument("--json", type=Path, help="write the full report to this file")
+    args = parser.parse_args()
+
+    prices = {**DEFAULT_PRICES, **{k: tuple(v) for k, v in args.prices.items()}}
+    corpus = Corpus.load(args.corpus, latency_scale=args.latency_scale, seed=args.seed)
+    install_fakes(corpus)
+    from app.graph.assistant import build_assistant_graph
+
+    modes = {}
+    for name, enabled in (("baseline (routing off)", False), ("routed", True)):
+        model_router.MODEL_ROUTING_ENABLED = enabled
+        reset_caches()
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            graph = build_assistant_graph()
+            modes[name] = asyncio.run(run_mode(graph, corpus, args.rounds, prices))
+        _print_mode(name, modes[name])
+
+    baseline, routed = modes["baseline (routing off)"], modes["routed"]
+    summary = compare(baseline, routed)
+    print(f"\nrouted vs baseline: quality {summary['quality_delta']:+}, p50 {summary['p50_change']:+.0%}, cost {summary['cost_change']:+.0%}")
+    for case in summary["changed_cases"]:
+        print(f"  {case['case']:<28} quality {case['quality_delta']:+}  cited {case['baseline_cited']} -> {case['cited']}")
+    if args.json:
+        args.json.write_text(json.dumps({"baseline": baseline, "routed": routed, "comparison": summary}, indent=2))
+        print(f"report written to {args.json}")
+    if baseline["errors"] or routed["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
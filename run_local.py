@@ -10,4 +10,5 @@ def test_local():
         response = asyncio.run(rag_query(request))
         print("\n🧠 Answer:\n" + response.answer + "\n" + "-"*50)
 
-test_local()
+if __name__ == "__main__":
+    test_local()
@@ -0,0 +1,32 @@
+# File: tests/conftest.py
+# Description: Defaults so app.config can be imported by offline tests without a .env file
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+os.environ.setdefault("EXCEL_PATH", str(ROOT / "test-file" / "CCC - CA Log (Current).xlsm"))
+os.environ.setdefault("PLOT_STORE_DIR", tempfile.mkdtemp(prefix="plot_store_"))
+os.environ.setdefault("GUARD_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="guard_cache_"), "guardrails.sqlite3"))
+
+
+@pytest.fixture(autouse=True)
+def close_executors(monkeypatch):
+    """Closes the executor pools of graphs built during a test; their worker processes would outlive it"""
+    from app.services import code_executor
+    created = []
+    create = code_executor.create_executor
+
+    def tracked(*args, **kwargs):
+        created.append(create(*args, **kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(code_executor, "create_executor", tracked)
+    yield
+    for executor in created:
+        executor.close()
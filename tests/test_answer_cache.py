@@ -0,0 +1,96 @@
+# File: tests/test_answer_cache.py
+# Description: Tests the semantic answer cache and its graph nodes
+import numpy as np
+import pytest
+from app.services.answer_cache import AnswerCache, sources_key
+from app.graph.nodes import answer_cache as nodes
+
+CHUNKS = [
+    {"id": "asce_chunk_1", "snippet": "Allowable story drift for Risk Category IV is 0.010 hsx", "metadata": {"file_path": "asce.pdf"}},
+    {"id": "asce_chunk_2", "snippet": "Table 12.12-1 Allowable Story Drift", "metadata": {"file_path": "asce.pdf"}},
+]
+
+def _vec(*values):
+    v = np.zeros(8)
+    v[: len(values)] = values
+    return v.tolist()
+
+def test_sources_key_ignores_order_and_tracks_text():
+    assert sources_key(CHUNKS) == sources_key(list(reversed(CHUNKS)))
+    edited = [dict(CHUNKS[0], snippet="revised text"), CHUNKS[1]]
+    assert sources_key(edited) != sources_key(CHUNKS)
+    assert sources_key([{"snippet": "no id"}]) is None
+
+def test_hit_requires_similarity_and_same_sources():
+    cache = AnswerCache(max_entries=4, ttl_seconds=60, threshold=0.95)
+    cache.store(_vec(1, 0.1), CHUNKS, "Drift limit is 0.010 hsx [1]")
+    hit = cache.lookup(_vec(1, 0.12), CHUNKS)
+    assert hit["answer"] == "Drift limit is 0.010 hsx [1]"
+    assert "thread_preview" not in hit
+    assert cache.lookup(_vec(0.2, 1), CHUNKS) is None
+    assert cache.lookup(_vec(1, 0.1), CHUNKS[:1]) is None
+    assert cache.stats() == {"groups": 1, "hits": 1, "misses": 2}
+
+def test_invalidate_on_reindex():
+    cache = AnswerCache(max_entries=4, ttl_seconds=60, threshold=0.9)
+    cache.store(_vec(1), CHUNKS, "answer")
+    cache.store(_vec(1), CHUNKS[1:], "other answer")
+    assert cache.invalidate_chunks(["asce_chunk_1"]) == 1
+    assert cache.lookup(_vec(1), CHUNKS) is None
+    assert cache.lookup(_vec(1), CHUNKS[1:])["answer"] == "other answer"
+    assert cache.invalidate_chunks(["asce_chunk_2"]) == 1
+    assert len(cache) == 0
+
+def test_lru_and_ttl():
+    cache = AnswerCache(max_entries=1, ttl_seconds=60, threshold=0.9)
+    cache.store(_vec(1), CHUNKS, "first")
+    cache.store(_vec(1), CHUNKS[1:], "second")
+    assert cache.lookup(_vec(1), CHUNKS) is None
+    # The evicted group is gone from the chunk index too
+    assert cache.invalidate_chunks(["asce_chunk_1"]) == 0 and "asce_chunk_1" not in cache._chunk_groups
+    expired = AnswerCache(max_entries=4, ttl_seconds=-1, threshold=0.9)
+    expired.store(_vec(1), CHUNKS, "stale")
+    assert expired.lookup(_vec(1), CHUNKS) is None
+
+def test_nodes_store_then_short_circuit(monkeypatch):
+    monkeypatch.setattr(nodes, "answer_cache", AnswerCache(max_entries=4, ttl_seconds=60, threshold=0.95))
+    generated = {"query_embedding": _vec(1, 0.1), "retrieved_chunks": CHUNKS, "final_answer": "cited [1]", "thread_preview": "Drift limits"}
+    nodes.cache_answer(generated)
+
+    repeat = nodes.lookup_cached_answer({"query_embedding": _vec(1, 0.11), "retrieved_chunks": CHUNKS})
+    assert repeat["answer_cache_hit"] is True
+    assert repeat["final_answer"] == "cited [1]"
+    # The preview belongs to the thread that produced the answer, not to this one
+    assert "thread_preview" not in repeat
+    # A served answer is not stored again, and errors are never cached
+    assert nodes.cache_answer(repeat) is repeat
+    miss = nodes.lookup_cached_answer({"query_embedding": _vec(0, 1), "retrieved_chunks": CHUNKS})
+    assert "answer_cache_hit" not in miss
+
+def test_cache_hits_still_update_the_thread_summary(monkeypatch):
+    import asyncio
+    from benchmarks.fakes import Corpus, FakeSupabase
+    from benchmarks.graph_bench import install_fakes, reset_caches, run_request
+    from app.graph.assistant import build_assistant_graph
+    from app.services.thread_store import ThreadStore
+
+    corpus = Corpus.load(latency_scale=0)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    case = next(c for c in corpus.cases if c["name"] == "concrete_cover")
+
+    async def run():
+        graph, store = build_assistant_graph(), ThreadStore(FakeSupabase(corpus), spool_dir=None)
+        await store.start()
+        await run_request(graph, store, case, "first-thread")
+        trace, ok, result = await run_request(graph, store, case, "second-thread")
+        await store.close()
+        return trace, ok, result
+
+    reset_caches()
+    try:
+        trace, ok, result = asyncio.run(run())
+    finally:
+        reset_caches()
+    assert ok and result["answer_cache_hit"] is True
+    assert trace.last_span("generate_answer") is not None
+    assert result["history"].startswith("Discussed:") and result["thread_preview"]
@@ -0,0 +1,64 @@
+# File: tests/test_code_cache.py
+# Description: Tests the generated-code cache used by the Excel path
+import pandas as pd
+import pytest
+from app.services.code_cache import CodeCache, normalize_query, schema_version
+
+CODE = "print(df['Status'].value_counts())"
+
+@pytest.fixture
+def cache():
+    return CodeCache(max_entries=2, ttl_seconds=60)
+
+def test_normalized_queries_share_key():
+    a = CodeCache.make_key("How many RFIs are  open?", "excel_insight", "no_llm", "v1")
+    b = CodeCache.make_key("how many rfis are open", "excel_insight", "no_llm", "v1")
+    assert a == b
+
+@pytest.mark.parametrize("other", [
+    ("How many RFIs are open?", "excel_insight", "needs_llm", "v1"),
+    ("How many RFIs are open?", "rfi_lookup", "no_llm", "v1"),
+    ("How many RFIs are open?", "excel_insight", "no_llm", "v2"),
+    ("How many RFIs are closed?", "excel_insight", "no_llm", "v1"),
+])
+def test_key_components(other):
+    assert CodeCache.make_key("How many RFIs are open?", "excel_insight", "no_llm", "v1") != CodeCache.make_key(*other)
+
+def test_put_get_and_evict(cache):
+    key = CodeCache.make_key("q", "excel_insight", "no_llm", "v1")
+    assert cache.put(key, CODE)
+    assert cache.get(key) == CODE
+    cache.evict(key)
+    assert cache.get(key) is None
+
+def test_rejects_invalid_code(cache):
+    key = CodeCache.make_key("q", "excel_insight", "no_llm", "v1")
+    assert not cache.put(key, "def broken(:")
+    assert cache.get(key) is None
+
+def test_schema_change_evicts_old_entries(cache):
+    old = CodeCache.make_key("q", "excel_insight", "no_llm", "v1")
+    new = CodeCache.make_key("q2", "excel_insight", "no_llm", "v2")
+    cache.put(old, CODE)
+    cache.put(new, CODE)
+    assert cache.get(old) is None
+    assert cache.get(new) == CODE
+
+def test_lru_capacity(cache):
+    keys = [CodeCache.make_key(f"q{i}", "excel_insight", "no_llm", "v1") for i in range(3)]
+    for key in keys:
+        cache.put(key, CODE)
+    assert len(cache) == 2
+    assert cache.get(keys[0]) is None
+
+def test_ttl_expiry():
+    cache = CodeCache(max_entries=2, ttl_seconds=0)
+    key = CodeCache.make_key("q", "excel_insight", "no_llm", "v1")
+    cache.put(key, CODE)
+    assert cache.get(key) is None
+
+def test_schema_version_tracks_dtypes():
+    df = pd.DataFrame({"RFI #": [1.0], "Status": ["A"]})
+    assert schema_version(df) == schema_version(df.copy())
+    assert schema_version(df) != schema_version(df.astype({"RFI #": str}))
+    assert normalize_query(" Open RFIs? ") == "open rfis"
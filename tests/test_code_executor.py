@@ -0,0 +1,108 @@
+# File: tests/test_code_executor.py
+# Description: Tests the sandboxed worker pool that runs generated pandas code
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from app.services.code_executor import SubprocessExecutor, InProcessExecutor
+
+@pytest.fixture(scope="module")
+def df():
+    return pd.DataFrame({"RFI #": [1.0, 2.0, 3.0], "Status": ["A", "U", "A"]})
+
+@pytest.fixture(scope="module")
+def executor(df):
+    pool = SubprocessExecutor(df, workers=2, timeout=30, cpu_seconds=10, memory_mb=0)
+    yield pool
+    pool.close()
+
+def test_captures_stdout(executor):
+    result = executor.run("print(int((df['Status'] == 'A').sum()))")
+    assert result.succeeded
+    assert result.output.strip() == "2"
+
+def test_reports_errors(executor):
+    result = executor.run("raise ValueError('bad column')")
+    assert not result.succeeded
+    assert "bad column" in result.output
+
+def test_captures_figures(executor):
+    result = executor.run("import matplotlib.pyplot as plt\nplt.plot([1, 2])\nplt.figure()\nplt.plot([3])")
+    assert result.succeeded
+    assert len(result.plot_images) == 2
+    assert all(url.startswith("/plots/") for url in result.plot_images)
+
+def test_mutations_do_not_leak_between_runs(executor):
+    executor.run("df.drop(columns=['Status'], inplace=True)")
+    result = executor.run("print(list(df.columns))")
+    assert "Status" in result.output
+
+def test_concurrent_runs_keep_output_separate(executor):
+    codes = [f"import time\nfor _ in range(3):\n    print('job{i}')\n    time.sleep(0.05)" for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(executor.run, codes))
+    for i, result in enumerate(results):
+        assert result.output.split() == [f"job{i}"] * 3
+
+def test_wall_clock_timeout_respawns_worker(executor):
+    result = executor.run("import time\ntime.sleep(10)", timeout=1)
+    assert not result.succeeded
+    assert "timed out" in result.output
+    assert executor.run("print('alive')").output.strip() == "alive"
+
+def test_waiting_for_a_busy_pool_is_bounded(df):
+    pool = SubprocessExecutor(df, workers=1, timeout=30, cpu_seconds=10, memory_mb=0)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as threads:
+            busy = threads.submit(pool.run, "import time\ntime.sleep(1.5)")
+            time.sleep(0.2)
+            t0 = time.monotonic()
+            result = pool.run("print(1)", timeout=0.3)
+            assert not result.succeeded and "no worker became free" in result.output
+            assert time.monotonic() - t0 < 1.0
+            assert busy.result().succeeded
+    finally:
+        pool.close()
+
+def test_close_kills_runs_that_outlast_the_timeout(df):
+    pool = SubprocessExecutor(df, workers=1, timeout=0.5, cpu_seconds=10, memory_mb=0)
+    assert pool.run("print(1)", timeout=30).succeeded
+    with ThreadPoolExecutor(max_workers=1) as threads:
+        busy = threads.submit(pool.run, "import time\ntime.sleep(30)", None, 30)
+        time.sleep(0.3)
+        t0 = time.monotonic()
+        pool.close()
+        assert time.monotonic() - t0 < 2.0
+        assert "shut down" in busy.result(timeout=5).output
+    result = pool.run("print(1)")
+    assert not result.succeeded and "shut down" in result.output
+
+def test_in_process_executor(df):
+    result = InProcessExecutor(df).run("print(len(df))")
+    assert result.output.strip() == "3"
+
+def test_emit_returns_typed_records(executor):
+    code = "rows = df[df['Status'] == 'A'].copy()\nrows['Note'] = ['Beam (revised)', None]\nrows['Sent'] = pd.to_datetime(['2022-08-08', None])\nemit(rows)"
+    result = executor.run("import pandas as pd\n" + code)
+    assert result.succeeded and result.emitted
+    records = result.records()
+    assert [r["RFI #"] for r in records] == [1.0, 3.0]
+    assert records[0]["Note"] == "Beam (revised)"
+    assert records[1]["Sent"] is None
+    assert records[0]["Sent"].year == 2022
+
+def test_emit_accepts_records_and_series(executor):
+    result = executor.run("emit([{'a': 1}, {'a': 2}])\nemit(df['Status'].value_counts())")
+    assert result.records()[:2] == [{"a": 1}, {"a": 2}]
+    assert {"Status": "A", "count": 2} in result.records()
+
+def test_emit_is_discarded_on_error(df):
+    result = InProcessExecutor(df).run("emit(df)\nraise RuntimeError('boom')")
+    assert not result.emitted
+
+def test_failed_rfi_lookup_code_is_reported_not_raised(df):
+    import benchmarks.graph_bench  # noqa: F401  (sets the offline env before app imports)
+    from app.graph.nodes.excel_insight import execute_code
+    node = execute_code(None, InProcessExecutor(df))
+    state = node({"query_class": "rfi_lookup", "code": "raise KeyError('RFI Number')", "code_model": "large"})
+    assert "RFI Number" in state["error"] and "rfi_matches" not in state
@@ -0,0 +1,128 @@
+# File: tests/test_deadline.py
+# Description: Request deadline carried in the graph config, capped dependency calls and best-effort answers
+import asyncio
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.fakes import Corpus, FakeSupabase
+from benchmarks.graph_bench import install_fakes, reset_caches, run_request  # sets the offline env before app imports
+from app.services import resilience
+from app.services.deadline import DEADLINE_MESSAGE, remaining, seconds_left, with_deadline
+from app.services.resilience import DeadlineExceeded, Policy, call
+
+
+@pytest.fixture(autouse=True)
+def circuits():
+    resilience.reset_circuits()
+    yield
+    resilience.reset_circuits()
+
+
+def test_deadline_travels_in_the_config():
+    cfg = with_deadline({"configurable": {"id": "t1"}}, 10)
+    assert 9 < seconds_left(cfg) <= 10 and cfg["configurable"]["id"] == "t1"
+    assert remaining() is None
+    assert RunnableLambda(lambda _: remaining()).invoke(None, config=cfg) == pytest.approx(10, abs=1)
+
+def test_dependency_calls_are_capped_by_the_request_deadline(monkeypatch):
+    monkeypatch.setattr(resilience, "RESILIENCE_ENABLED", True)
+    monkeypatch.setattr(resilience, "DEFAULT_POLICIES", {"pinecone": Policy(timeout_seconds=5, retries=2, failure_threshold=1)})
+    slow = RunnableLambda(lambda _: call("pinecone", lambda: time.sleep(2)))
+
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        slow.invoke(None, config=with_deadline({}, 0.2))
+    assert time.monotonic() - t0 < 1.0
+    # Running out of request budget is not the dependency's fault
+    assert resilience.breaker("pinecone").state == "closed"
+    with pytest.raises(DeadlineExceeded):
+        slow.invoke(None, config=with_deadline({}, -1))
+
+def _run(corpus, case_name, deadline):
+    from app.graph.assistant import build_assistant_graph
+    from app.services.thread_store import ThreadStore
+    case = next(c for c in corpus.cases if c["name"] == case_name)
+
+    async def run():
+        store = ThreadStore(FakeSupabase(corpus), spool_dir=None)
+        await store.start()
+        t0 = time.monotonic()
+        trace, ok, result = await run_request(build_assistant_graph(), store, case, f"deadline-{case_name}", deadline)
+        elapsed = time.monotonic() - t0
+        await store.close()
+        return trace, ok, result, elapsed
+
+    reset_caches()
+    try:
+        return asyncio.run(run())
+    finally:
+        reset_caches()
+
+def test_nodes_shrink_their_work_when_time_is_short(monkeypatch):
+    corpus = Corpus.load(latency_scale=0.2)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    trace, ok, result, _ = _run(corpus, "story_drift", deadline=5)
+    assert ok and DEADLINE_MESSAGE not in result["final_answer"]
+    assert trace.last_span("retrieve_pinecone").attributes["deadline"] == "top_k"
+    assert trace.last_span("rerank_chunks").attributes["deadline"] == "skip_rerank"
+    assert len(result["ranked_chunks"]) <= 6
+
+def test_generation_past_the_deadline_returns_the_top_passages(monkeypatch):
+    corpus = Corpus.load(latency_scale=0.5)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    # Classification and the guardrail use most of the budget; the answer call cannot finish
+    trace, ok, result, elapsed = _run(corpus, "story_drift", deadline=1.0)
+    assert result["final_answer"].startswith(DEADLINE_MESSAGE)
+    assert "Sources:" in result["final_answer"] and "[1]" in result["final_answer"]
+    assert elapsed < 1.5
+    # The excerpt is for this request only: it is flagged so it is neither cached nor shared
+    assert result["degraded"] == "deadline"
+
+def test_degraded_answers_are_not_cached_or_shared(monkeypatch):
+    from app.graph.nodes import answer_cache as nodes, coalesce
+    from app.services.answer_cache import AnswerCache
+    from app.services.single_flight import SingleFlight
+    cache = AnswerCache(max_entries=4, ttl_seconds=60, threshold=0.9)
+    monkeypatch.setattr(nodes, "answer_cache", cache)
+    chunks = [{"id": "c1", "snippet": "Drift is 0.010 hsx", "metadata": {"file_path": "asce.pdf"}}]
+    nodes.cache_answer({"query_embedding": [1.0, 0.0], "retrieved_chunks": chunks, "final_answer": "excerpt", "degraded": "deadline"})
+    assert len(cache) == 0
+
+    flights = SingleFlight(max_age_seconds=60)
+    monkeypatch.setattr(coalesce, "single_flight", flights)
+    token, future, _ = flights.join("k")
+    coalesce.finish_flight({"coalesce_token": token, "final_answer": "excerpt", "degraded": "deadline"})
+    assert future.result(timeout=0) is None
+
+def test_coalesced_followers_wait_no_longer_than_their_deadline(monkeypatch):
+    from app.graph.nodes import coalesce
+    from app.services.single_flight import SingleFlight
+    flights = SingleFlight(max_age_seconds=120)
+    monkeypatch.setattr(coalesce, "single_flight", flights)
+    monkeypatch.setattr(coalesce, "coalesce_key", lambda state: "k")
+    flights.join("k")   # an identical request is already running
+    _, wait = RunnableLambda(lambda s: coalesce._join(s)).invoke({}, config=with_deadline({}, 2))
+    assert 0 < wait <= 2
+
+def test_timed_out_runs_return_the_passages_retrieved_so_far():
+    from langgraph.graph import StateGraph
+    from app.graph.assistant import arun_within_deadline
+    from app.graph.state import AssistantState
+    chunks = [{"id": "c1", "snippet": "Drift is 0.010 hsx", "metadata": {"file_path": "asce.pdf"}}]
+
+    async def stuck(state):
+        await asyncio.sleep(5)
+        return state
+    builder = StateGraph(AssistantState)
+    builder.add_node("retrieve", lambda state: {"retrieved_chunks": chunks})
+    builder.add_node("generate", stuck)
+    builder.add_edge("retrieve", "generate")
+    builder.set_entry_point("retrieve")
+    builder.set_finish_point("generate")
+
+    result = asyncio.run(arun_within_deadline(builder.compile(), {}, with_deadline({}, 0.2)))
+    assert result["final_answer"].startswith(DEADLINE_MESSAGE) and "[1] Drift is 0.010 hsx" in result["final_answer"]
+    assert "[1] asce.pdf" in result["final_answer"]
+    assert result["degraded"] == "deadline" and result["error"] == "request deadline exceeded"
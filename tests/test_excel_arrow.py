@@ -0,0 +1,76 @@
+# File: tests/test_excel_arrow.py
+# Description: Tests publishing the RFI log as a memory-mapped Arrow IPC file
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pytest
+from app.services.excel_cache import get_excel_dataframe, publish_arrow, load_arrow
+
+@pytest.fixture
+def parquet_path(tmp_path):
+    path = tmp_path / "log.parquet"
+    pd.DataFrame({
+        "RFI #": [1.0, 2.0],
+        "Status": ["A", "U"],
+        "Date Sent": pd.to_datetime(["2022-08-08", None]),
+    }).to_parquet(path, index=False)
+    return path
+
+def _load(parquet_path, arrow_path, zero_copy=False):
+    return get_excel_dataframe(parquet_path=parquet_path, excel_path=parquet_path.with_suffix(".xlsm"), sheet_name="RFIs",
+                               header_row=1, removeCols=[], renameCols={}, arrow_path=arrow_path, zero_copy=zero_copy)
+
+def test_publishes_and_round_trips(parquet_path, tmp_path):
+    arrow_path = tmp_path / "log.arrow"
+    df = _load(parquet_path, arrow_path)
+    assert arrow_path.exists()
+    assert df["Status"].tolist() == ["A", "U"]
+    assert df["Date Sent"].isna().tolist() == [False, True]
+    assert not list(tmp_path.glob(".*.tmp"))
+
+def test_zero_copy_keeps_arrow_dtypes(parquet_path, tmp_path):
+    arrow_path = publish_arrow(pd.read_parquet(parquet_path), tmp_path / "log.arrow")
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in load_arrow(arrow_path, zero_copy=True).dtypes)
+    assert not any(isinstance(dtype, pd.ArrowDtype) for dtype in load_arrow(arrow_path).dtypes)
+
+def test_text_columns_stay_in_the_mapping_by_default(parquet_path, tmp_path):
+    import pyarrow.ipc as ipc
+    arrow_path = publish_arrow(pd.read_parquet(parquet_path), tmp_path / "log.arrow")
+    df = load_arrow(arrow_path)
+    assert df["Status"].dtype == pd.StringDtype("pyarrow")
+    assert df["RFI #"].dtype == "float64" and df["Date Sent"].dtype == "datetime64[ns]"
+
+def test_text_columns_are_not_copied(tmp_path):
+    arrow_path = publish_arrow(pd.DataFrame({"Subject": [f"coupling beam {i}" for i in range(10_000)]}), tmp_path / "log.arrow")
+    allocated = pa.total_allocated_bytes()
+    df = load_arrow(arrow_path)
+    # The column wraps the mapped file's buffers instead of allocating its own
+    assert pa.total_allocated_bytes() - allocated < 10_000
+    assert df["Subject"].str.contains("beam 99").sum() == 111
+
+def test_fresh_arrow_file_skips_parquet(parquet_path, tmp_path):
+    arrow_path = tmp_path / "log.arrow"
+    publish_arrow(pd.DataFrame({"Status": ["cached"]}), arrow_path)
+    assert _load(parquet_path, arrow_path)["Status"].tolist() == ["cached"]
+
+def test_stale_arrow_file_is_republished(parquet_path, tmp_path):
+    arrow_path = tmp_path / "log.arrow"
+    publish_arrow(pd.DataFrame({"Status": ["stale"]}), arrow_path)
+    old = time.time() - 60
+    os.utime(arrow_path, (old, old))
+    assert _load(parquet_path, arrow_path)["Status"].tolist() == ["A", "U"]
+
+def test_loaded_frame_supports_typical_generated_code(tmp_path):
+    source = tmp_path / "log.parquet"
+    pd.DataFrame({
+        "RFI #": [1.0, 2.0, 3.0],
+        "Status": ["A", "U", "A"],
+        "Date Received": pd.to_datetime(["2022-08-01", "2022-08-15", "2022-09-03"]),
+        "Date Sent": pd.to_datetime(["2022-08-08", None, "2022-09-10"]),
+    }).to_parquet(source, index=False)
+    df = _load(source, tmp_path / "log.arrow")
+    assert df["Date Received"].dt.to_period("M").astype(str).tolist() == ["2022-08", "2022-08", "2022-09"]
+    assert (df["Date Sent"] - df["Date Received"]).dt.days.mean() == 7
+    assert df.groupby("Status")["RFI #"].count().to_dict() == {"A": 2, "U": 1}
+    assert df[df["Date Received"] >= "2022-08-10"]["RFI #"].tolist() == [2.0, 3.0]
@@ -0,0 +1,36 @@
+# File: tests/test_graph_bench.py
+# Description: The offline benchmark replays the whole corpus through the real graph without errors
+import asyncio
+
+from benchmarks.fakes import Corpus, fake_embedding
+from benchmarks.graph_bench import install_fakes, percentile, reset_caches, run_level
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 21))
+    assert percentile(values, 50) == 10
+    assert percentile(values, 95) == 19
+    assert percentile([], 95) == 0.0
+
+def test_fake_embedding_is_deterministic_and_normalized():
+    a = fake_embedding("ACI 318-19 concrete cover")
+    assert a == fake_embedding("ACI 318-19 concrete cover")
+    assert abs(sum(x * x for x in a) - 1.0) < 1e-5
+
+def test_corpus_replays_through_the_graph(monkeypatch):
+    corpus = Corpus.load(latency_scale=0)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    from app.graph.assistant import build_assistant_graph
+
+    reset_caches()
+    try:
+        graph = build_assistant_graph()
+        level = asyncio.run(run_level(graph, corpus, concurrency=4, rounds=1))
+    finally:
+        reset_caches()
+
+    assert level["errors"] == []
+    assert level["requests"] == len(corpus.cases)
+    for node in ("classify_and_refine_query", "structured_query", "execute_code", "match_rfis", "rerank_chunks", "generate_answer"):
+        assert level["nodes"][node]["n"] > 0
+    assert level["end_to_end"]["p95_ms"] >= level["end_to_end"]["p50_ms"]
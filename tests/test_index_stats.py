@@ -0,0 +1,50 @@
+# File: tests/test_index_stats.py
+# Description: run_indexing throughput/stage accounting against the benchmark's stub backends
+import random
+import zipfile
+
+from app.services.index_stats import IndexStats, collect, stage
+from benchmarks.index_bench import build_synthetic_corpus, install_stubs, synthetic_paragraphs, write_docx, write_pdf
+
+
+def test_stage_is_a_noop_without_collection():
+    with stage("parse"):
+        pass
+    stats = IndexStats()
+    with collect(stats):
+        with stage("parse"):
+            pass
+    assert stats.stage_seconds["parse"] > 0
+
+def test_add_file_counts_skipped_empty_and_failed():
+    stats = IndexStats()
+    stats.add_file(".txt", 100, 3, 0.1)
+    stats.add_file(".txt", 100, None, 0.0)
+    stats.add_file(".pdf", 50, 0, 0.2)
+    stats.add_file(".msg", 0, None, 0.0, failed=True)
+    assert (stats.files, stats.skipped, stats.empty, stats.failed, stats.chunks) == (3, 1, 1, 1, 3)
+    assert stats.by_extension[".pdf"]["empty"] == 1
+
+def test_run_indexing_reports_stages_and_skips_unchanged(tmp_path, monkeypatch):
+    index = install_stubs(0, 0, patch=monkeypatch.setattr)
+    from app.services.smart_indexer import run_indexing
+    docs = build_synthetic_corpus(tmp_path / "docs", files=3, formats=["txt"], pages=2, seed=1)
+    cache_file = tmp_path / "cache.json"
+
+    first = run_indexing(cache_file, docs)
+    assert first.files == 3 and first.chunks > 0 and first.chunks == index.upserted
+    for name in ("hash", "parse", "split", "embed", "upsert"):
+        assert first.stage_seconds[name] > 0
+
+    second = run_indexing(cache_file, docs)
+    assert (second.files, second.skipped, second.chunks) == (0, 3, 0)
+    assert index.upserted == first.chunks
+
+def test_synthetic_writers_produce_wellformed_files(tmp_path):
+    pages = synthetic_paragraphs(random.Random(0), 2)
+    write_docx(tmp_path / "a.docx", pages)
+    with zipfile.ZipFile(tmp_path / "a.docx") as z:
+        assert pages[0][:40] in z.read("word/document.xml").decode("utf-8")
+    write_pdf(tmp_path / "a.pdf", pages)
+    data = (tmp_path / "a.pdf").read_bytes()
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF") and b"/Count 2" in data
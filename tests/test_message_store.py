@@ -0,0 +1,119 @@
+# File: tests/test_message_store.py
+# Description: Tests batched message inserts and keyset pagination against a local fake Supabase client
+import asyncio
+import re
+import pytest
+from app.services.message_store import MessageWriter, fetch_page, encode_cursor, decode_cursor
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+class FakeSelect:
+    """Applies eq / keyset or_ / order / limit to in-memory rows"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.after = None
+        self.n = None
+    def eq(self, col, value):
+        self.rows = [r for r in self.rows if r[col] == value]
+        return self
+    def or_(self, expr):
+        m = re.fullmatch(r'created_at\.gt\."(.+?)",and\(created_at\.eq\."(.+?)",id\.gt\."(.+?)"\)', expr)
+        self.after = (m.group(1), m.group(3))
+        return self
+    def order(self, col):
+        return self
+    def limit(self, n):
+        self.n = n
+        return self
+    def execute(self):
+        rows = sorted(self.rows, key=lambda r: (r["created_at"], r["id"]))
+        if self.after:
+            rows = [r for r in rows if (r["created_at"], r["id"]) > self.after]
+        return FakeResult(rows[: self.n])
+
+class FakeTable:
+    def __init__(self, db):
+        self.db = db
+    def insert(self, rows):
+        db = self.db
+        class _Insert:
+            def execute(self_inner):
+                if db.fail_inserts:
+                    db.fail_inserts -= 1
+                    raise ConnectionError("supabase unavailable")
+                db.batches.append(list(rows))
+                return FakeResult(rows)
+        return _Insert()
+    def select(self, *cols):
+        return FakeSelect(list(self.db.rows))
+
+class FakeSupabase:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.batches = []
+        self.fail_inserts = 0
+    def table(self, name):
+        return FakeTable(self)
+
+def test_inserts_are_batched_in_order():
+    db = FakeSupabase()
+    writer = MessageWriter(db, batch_size=3, flush_interval=0.01)
+
+    async def scenario():
+        for i in range(5):
+            writer.enqueue({"thread_id": "t1", "role": "user", "content": f"m{i}"})
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert [len(b) for b in db.batches] == [3, 2]
+    rows = [r for b in db.batches for r in b]
+    assert [r["content"] for r in rows] == [f"m{i}" for i in range(5)]
+    assert [r["created_at"] for r in rows] == sorted(r["created_at"] for r in rows)
+    assert writer.inserted == 5
+
+def test_failed_batch_is_retried():
+    db = FakeSupabase()
+    db.fail_inserts = 1
+    writer = MessageWriter(db, batch_size=10, flush_interval=0.01)
+
+    async def scenario():
+        writer.enqueue({"content": "kept"})
+        await asyncio.sleep(0.1)
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert writer.failures == 1
+    assert [[r["content"] for r in b] for b in db.batches] == [["kept"]]
+
+def test_cursor_round_trip_and_validation():
+    row_id = "0b6f7c1e-8d1a-4c52-9a53-2f4f1c1e9b10"
+    cursor = encode_cursor({"created_at": "2025-01-01T00:00:00+00:00", "id": row_id})
+    assert decode_cursor(cursor) == ("2025-01-01T00:00:00+00:00", row_id)
+    assert decode_cursor(encode_cursor({"created_at": "2025-01-01T00:00:00.123456Z", "id": 42}))[1] == "42"
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+@pytest.mark.parametrize("row", [
+    {"created_at": '2025-01-01",id.gt."0', "id": "1"},
+    {"created_at": "2025-01-01T00:00:00", "id": "1),or(thread_id.neq.x"},
+    {"created_at": "2025-01-01T00:00:00", "id": 'a"'},
+])
+def test_cursor_values_that_could_alter_the_filter_are_rejected(row):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(row))
+
+def test_fetch_page_walks_all_rows_once():
+    # Same timestamp on several rows: the id tiebreaker keeps pages disjoint
+    rows = [{"id": f"{i:02d}", "thread_id": "t1", "created_at": f"2025-01-01T00:00:0{i // 3}"} for i in range(10)]
+    rows.append({"id": "99", "thread_id": "other", "created_at": "2025-01-01T00:00:00"})
+    db = FakeSupabase(rows)
+    seen, cursor = [], None
+    while True:
+        page = fetch_page(db.table("messages").select("*").eq("thread_id", "t1"), limit=4, cursor=cursor)
+        seen.extend(r["id"] for r in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"{i:02d}" for i in range(10)]
@@ -0,0 +1,98 @@
+# File: tests/test_model_router.py
+# Description: Small-first model routing with validated escalation, and the offline routing eval
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import Corpus
+from benchmarks.graph_bench import install_fakes, reset_caches  # sets the offline env before app imports
+from benchmarks.router_eval import run_mode, token_f1
+from app.clients import model_router
+from app.clients.model_router import ModelRouter
+from app.graph.nodes.generate import citation_problem
+from app.graph.nodes.rag import parse_ranking
+from app.services.metrics import metrics
+
+
+class _Model:
+    def __init__(self, reply):
+        self.reply, self.calls = reply, 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+def _escalations(route, reason):
+    return metrics.value("assistant_model_escalations_total", route=route, reason=reason)
+
+
+def test_small_result_is_kept_when_the_check_passes(monkeypatch):
+    monkeypatch.setattr(model_router, "MODEL_ROUTING_ENABLED", True)
+    small, large = _Model("ok [1]"), _Model("large")
+    router = ModelRouter("t-accept", small=small, large=large)
+    assert router.invoke([], check=lambda r: citation_problem(r, 1)) == "ok [1]"
+    assert (small.calls, large.calls) == (1, 0)
+
+def test_rejected_or_failed_small_calls_escalate(monkeypatch):
+    monkeypatch.setattr(model_router, "MODEL_ROUTING_ENABLED", True)
+    small, large = _Model("no citation"), _Model("large [1]")
+    router = ModelRouter("t-check", small=small, large=large)
+    assert router.invoke([], check=lambda r: citation_problem(r, 1)) == "large [1]"
+    assert _escalations("t-check", "citations") == 1
+
+    router = ModelRouter("t-error", small=_Model(ValueError("bad json")), large=large)
+    assert router.invoke([]) == "large [1]"
+    assert _escalations("t-error", "error") == 1
+
+    # A later step rejecting the small output re-asks the large model directly
+    router = ModelRouter("t-later", small=small, large=large)
+    assert router.invoke([], escalation="execution") == "large [1]" and small.calls == 1
+
+def test_routing_off_and_small_first_false_use_the_default_tier(monkeypatch):
+    small, large = _Model("small"), _Model("large")
+    router = ModelRouter("t-default", small=small, large=large, default="small")
+    monkeypatch.setattr(model_router, "MODEL_ROUTING_ENABLED", False)
+    assert router.invoke([], check=lambda r: "always") == "small"
+    monkeypatch.setattr(model_router, "MODEL_ROUTING_ENABLED", True)
+    assert ModelRouter("t-large", small=small, large=large).invoke([], small_first=False) == "large"
+    assert ModelRouter("t-only", large=large).tier() == "large"
+
+def test_validators():
+    assert citation_problem("Use 2 bolts [1][2].", 2) is None
+    assert citation_problem("Use 2 bolts.", 2) == "citations"
+    assert citation_problem("Use 2 bolts [3].", 2) == "bad_citation"
+    assert citation_problem("Not found in provided sources.", 0) is None
+    assert parse_ranking("```json\n[2, 9, 1]\n```", 3) == [2, 1]
+    assert parse_ranking('Top chunks: ["3", 1, 2,', 3) == [3, 1, 2]
+    for bad in ("Chunk 2 is best", "[9]", '{"a": 1}'):
+        with pytest.raises(ValueError):
+            parse_ranking(bad, 3)
+    assert token_f1("four bolts", "four bolts") == 1.0 and token_f1("", "x") == 0.0
+
+def test_eval_escalates_on_the_recorded_bad_small_outputs(monkeypatch):
+    from app.graph.assistant import build_assistant_graph
+
+    corpus = Corpus.load(latency_scale=0)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    modes = {}
+    repaired = metrics.value("assistant_output_parses_total", parser="ResponsePayload", outcome="repaired")
+    try:
+        for name, enabled in (("baseline", False), ("routed", True)):
+            monkeypatch.setattr(model_router, "MODEL_ROUTING_ENABLED", enabled)
+            reset_caches()
+            modes[name] = asyncio.run(run_mode(build_assistant_graph(), corpus, 1, {"gpt-4o": (2.5, 10), "gpt-4o-mini": (0.15, 0.6)}))
+    finally:
+        reset_caches()
+
+    baseline, routed = modes["baseline"], modes["routed"]
+    assert not baseline["errors"] and not routed["errors"]
+    assert all(row["small"] == 0 or route == "format" for route, row in baseline["routes"].items())
+    assert routed["routes"]["codegen"]["escalations"] == {"execution": 1}
+    assert routed["routes"]["generate"]["escalations"] == {"citations": 1}
+    # The small model's fenced JSON (podium_mix) is repaired locally rather than escalated
+    assert metrics.value("assistant_output_parses_total", parser="ResponsePayload", outcome="repaired") == repaired + 1
+    assert routed["routes"]["rerank"]["escalations"] == {"parse": 1}
+    assert routed["cost_usd"] < baseline["cost_usd"]
@@ -0,0 +1,114 @@
+# File: tests/test_namespaces.py
+# Description: Project/team namespace routing and the parallel multi-namespace query merge
+import sys
+import types
+from types import SimpleNamespace
+
+from app.services import namespaces, pinecone_index
+from app.services.namespaces import namespaces_for_user, project_namespace, request_namespaces, user_department
+
+
+class _Users:
+    """Supabase stand-in holding rows only in the table the frontend writes at signup"""
+    def __init__(self, rows, table="users"):
+        self.rows, self.calls, self.user_id = rows, 0, None
+        self.table_name, self.queried = table, None
+
+    def table(self, name):
+        self.queried = name
+        return self
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.user_id = value
+        return self
+
+    def maybe_single(self):
+        return self
+
+    def execute(self):
+        self.calls += 1
+        return SimpleNamespace(data=self.rows.get(self.user_id) if self.queried == self.table_name else None)
+
+
+def test_project_namespace_slugs_projects_and_keeps_internal_docs_shared(monkeypatch):
+    monkeypatch.setattr(namespaces, "PINECONE_SHARED_NAMESPACE", "shared")
+    monkeypatch.setattr(namespaces, "PINECONE_TEAM_NAMESPACES", {"*": ["century-city-jmb-tower"]})
+    assert project_namespace("Century City JMB Tower") == "century-city-jmb-tower"
+    assert project_namespace("Internal Doc") == "shared"
+    monkeypatch.setattr(namespaces, "PINECONE_NAMESPACE_ROUTING", False)
+    assert project_namespace("Century City JMB Tower") == "shared"
+
+def test_namespaces_for_user_follow_the_department_mapping(monkeypatch):
+    users = _Users({"u1": {"department": "Structural"}})
+    monkeypatch.setitem(sys.modules, "app.db.supabase_client", types.SimpleNamespace(supabase_client=users))
+    monkeypatch.setattr(namespaces, "PINECONE_SHARED_NAMESPACE", "shared")
+    monkeypatch.setattr(namespaces, "PINECONE_TEAM_NAMESPACES", {"*": ["standards"], "Structural": ["century-city-jmb-tower", "standards"]})
+    namespaces._departments.clear()
+
+    assert namespaces_for_user("u1") == ["shared", "standards", "century-city-jmb-tower"]
+    assert namespaces_for_user("u1") == ["shared", "standards", "century-city-jmb-tower"]
+    assert users.calls == 1
+    assert namespaces_for_user("nobody") == ["shared", "standards"]
+    assert user_department("nobody") is None and users.calls == 2
+
+    state = {"user_id": "u1"}
+    request_namespaces(state)
+    assert state["namespaces"][-1] == "century-city-jmb-tower"
+
+def test_department_is_read_from_the_users_table_by_default(monkeypatch):
+    import app.config
+    # The configured default, not a monkeypatched name: signup stores the department in "users"
+    assert namespaces.USERS_TABLE == app.config.USERS_TABLE == "users"
+    users = _Users({"u2": {"department": "Civil"}}, table="users")
+    monkeypatch.setitem(sys.modules, "app.db.supabase_client", types.SimpleNamespace(supabase_client=users))
+    monkeypatch.setattr(namespaces, "PINECONE_SHARED_NAMESPACE", "shared")
+    monkeypatch.setattr(namespaces, "PINECONE_TEAM_NAMESPACES", {"Civil": ["grading-permits"]})
+    namespaces._departments.clear()
+    assert namespaces_for_user("u2") == ["shared", "grading-permits"]
+    assert users.queried == "users"
+
+def test_no_mapping_searches_only_the_shared_namespace(monkeypatch):
+    monkeypatch.setattr(namespaces, "PINECONE_SHARED_NAMESPACE", "shared")
+    monkeypatch.setattr(namespaces, "PINECONE_TEAM_NAMESPACES", {})
+    monkeypatch.setattr(namespaces, "user_department", lambda user_id: 1 / 0)
+    assert namespaces_for_user("u1") == ["shared"]
+    # ...and indexing keeps every project there, so nothing indexed is unreachable
+    assert project_namespace("Century City JMB Tower") == "shared"
+
+def test_query_namespaces_merges_by_score_and_dedupes_ids(monkeypatch):
+    results = {
+        "a": [{"id": "x", "score": 0.9}, {"id": "y", "score": 0.4}],
+        "b": [{"id": "z", "score": 0.8}, {"id": "y", "score": 0.7}],
+        "broken": None,
+    }
+    seen = []
+
+    class Index:
+        def query(self, vector, top_k, include_metadata, namespace, filter):
+            seen.append(namespace)
+            if results[namespace] is None:
+                raise RuntimeError("unavailable")
+            return {"matches": results[namespace]}
+
+    monkeypatch.setattr(pinecone_index, "get_index", lambda: Index())
+    merged = pinecone_index.query_namespaces([0.1], ["a", "b", "broken", "a"], top_k=3)["matches"]
+    assert sorted(seen) == ["a", "b", "broken"]
+    assert [(m["id"], m["score"]) for m in merged] == [("x", 0.9), ("z", 0.8), ("y", 0.7)]
+
+def test_query_namespaces_keeps_the_request_deadline(monkeypatch):
+    from langchain_core.runnables import RunnableLambda
+    from app.services.deadline import remaining, with_deadline
+    left = []
+
+    class Index:
+        def query(self, vector, top_k, include_metadata, namespace, filter):
+            left.append(remaining())
+            return {"matches": []}
+
+    monkeypatch.setattr(pinecone_index, "get_index", lambda: Index())
+    query = RunnableLambda(lambda _: pinecone_index.query_namespaces([0.1], ["a", "b"], top_k=3))
+    query.invoke(None, config=with_deadline({}, 10))
+    assert len(left) == 2 and all(value is not None and 0 < value <= 10 for value in left)
@@ -0,0 +1,46 @@
+# File: tests/test_openai_client.py
+# Description: Tests that OpenAI/ChatOpenAI clients are shared and use the pooled HTTP clients
+import pytest
+from app.clients import openAI_client
+from app.clients.openAI_client import get_client, get_openai_client, get_http_client, get_async_http_client, close_clients
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    close_clients()
+    yield
+    close_clients()
+
+def test_chat_clients_are_shared_per_model_and_temperature():
+    a = get_client(api_key="sk-test", model="gpt-4o-mini", temperature=0)
+    assert get_client(api_key="sk-test", model="gpt-4o-mini", temperature=0.0) is a
+    assert get_client(api_key="sk-test", model="gpt-4o-mini", temperature=0.2) is not a
+    assert get_client(api_key="sk-test", model="gpt-4o", temperature=0) is not a
+
+def test_clients_share_one_connection_pool():
+    chat = get_client(api_key="sk-test", model="gpt-4o-mini", temperature=0)
+    assert chat.http_client is get_http_client()
+    assert chat.http_async_client is get_async_http_client()
+    sdk = get_openai_client(api_key="sk-test")
+    assert sdk is get_openai_client(api_key="sk-test")
+    assert sdk._client is get_http_client()
+
+def test_pool_limits_come_from_config():
+    pool = get_http_client()._transport._pool
+    assert pool._max_connections == openAI_client.OPENAI_MAX_CONNECTIONS
+    assert pool._max_keepalive_connections == openAI_client.OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    assert get_http_client().timeout.connect == openAI_client.OPENAI_CONNECT_TIMEOUT_SECONDS
+
+def test_sdk_timeout_does_not_outlive_the_resilience_attempt(monkeypatch):
+    from app.services import resilience
+    monkeypatch.setattr(resilience, "DEFAULT_POLICIES", {"openai": resilience.Policy(timeout_seconds=7)})
+    assert openAI_client._timeout().read == 7
+
+@pytest.mark.parametrize("resilience_enabled, retries", [("true", 0), ("false", 2)])
+def test_sdk_retries_only_without_the_resilience_layer(monkeypatch, resilience_enabled, retries):
+    import subprocess
+    import sys
+    monkeypatch.setenv("RESILIENCE_ENABLED", resilience_enabled)
+    monkeypatch.delenv("OPENAI_MAX_RETRIES", raising=False)
+    code = "from app.config import OPENAI_MAX_RETRIES; print(OPENAI_MAX_RETRIES)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert int(out) == retries
@@ -0,0 +1,103 @@
+# File: tests/test_output_parsing.py
+# Description: Local repair of malformed model output: tolerant JSON, truncated JSON, structured payloads and sections
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel
+
+from app.services.metrics import metrics
+from app.services.output_parsing import (
+    StructuredOutput, TruncatedOutput, extract_json, parse_sections, parse_structured, strip_code_fences,
+)
+
+
+class Payload(BaseModel):
+    answer: str
+    updated_summary: str
+
+
+def _parses(parser, outcome):
+    return metrics.value("assistant_output_parses_total", parser=parser, outcome=outcome)
+
+
+def test_extract_json_repairs_common_mistakes():
+    assert extract_json('{"a": 1}') == ({"a": 1}, False)
+    assert extract_json('Sure, here it is:\n```json\n{"a": [1, 2,],}\n```\nAnything else?') == ({"a": [1, 2]}, True)
+    assert extract_json("{'a': True, 'b': None}") == ({"a": True, "b": None}, True)
+    assert extract_json('Ranking: [3, 1, 7] as requested') == ([3, 1, 7], True)
+    assert extract_json('{"answer": "Cover is 2 in. [1') == ({"answer": "Cover is 2 in. [1"}, True)
+    with pytest.raises(TruncatedOutput):
+        extract_json('{"answer": "Cover is 2 in. [1', allow_truncated=False)
+    with pytest.raises(ValueError):
+        extract_json("Chunk 2 is best")
+    assert strip_code_fences("```python\nprint(1)\n```") == "print(1)"
+    assert strip_code_fences("print(1)") == "print(1)"
+
+def test_every_truncation_of_a_document_parses():
+    doc = json.dumps({"answer": 'Use 4 "A325" bolts [1]', "items": [1, 2.5e-3, True, None, {"k": "v\\"}], "n": False})
+    for i in range(1, len(doc)):
+        value, repaired = extract_json(doc[:i])
+        assert isinstance(value, dict) and repaired
+    assert extract_json(doc) == (json.loads(doc), False)
+    assert extract_json('{"answer": "partial", "updated_sum') == ({"answer": "partial"}, True)
+    assert extract_json("[4, 1, 7,") == ([4, 1, 7], True)
+
+def test_structured_output_is_repaired_without_another_call():
+    calls = []
+
+    class Model:
+        def with_structured_output(self, schema, include_raw=False):
+            assert include_raw
+            return self
+        def invoke(self, messages):
+            calls.append(messages)
+            content = '```json\n{"answer": "6000 psi [1]", "updated_summary": "slab",}\n```'
+            return {"raw": AIMessage(content=content), "parsed": None, "parsing_error": ValueError("Invalid json output")}
+
+    repaired = _parses("Payload", "repaired")
+    result = StructuredOutput(Model(), Payload).invoke(["q"])
+    assert result == Payload(answer="6000 psi [1]", updated_summary="slab") and len(calls) == 1
+    assert _parses("Payload", "repaired") == repaired + 1
+
+    clean = Payload(answer="a", updated_summary="b")
+    assert parse_structured({"raw": AIMessage(content=""), "parsed": clean, "parsing_error": None}, Payload) is clean
+    # Tool-call arguments and a payload wrapped in its schema name are recovered too
+    raw = AIMessage(content="", invalid_tool_calls=[{"name": "Payload", "args": '{"Payload": {"answer": "x", "updated_summary": "y",},}', "id": "1", "error": None}])
+    assert parse_structured({"raw": raw, "parsed": None, "parsing_error": None}, Payload).answer == "x"
+
+def test_unrecoverable_output_raises_the_original_error():
+    error = ValueError("Invalid json output")
+    failed = _parses("Payload", "failed")
+    with pytest.raises(ValueError) as info:
+        parse_structured({"raw": AIMessage(content="I cannot help with that."), "parsed": None, "parsing_error": error}, Payload)
+    assert info.value is error
+    # Valid JSON that does not fit the schema is not "repaired"
+    with pytest.raises(ValueError, match="no Payload"):
+        parse_structured({"raw": AIMessage(content='{"answer": "no summary"}'), "parsed": None, "parsing_error": None}, Payload)
+    assert _parses("Payload", "failed") == failed + 2
+
+def test_truncated_output_is_not_accepted_as_complete():
+    # Closing the document would yield a valid payload whose last field is silently cut short
+    error = ValueError("Invalid json output")
+    truncated = _parses("Payload", "truncated")
+    raw = AIMessage(content='{"answer": "Cover is 2 in. [1]", "updated_summary": "Slab cover, see A')
+    with pytest.raises(ValueError) as info:
+        parse_structured({"raw": raw, "parsed": None, "parsing_error": error}, Payload)
+    assert info.value is error
+    assert _parses("Payload", "truncated") == truncated + 1
+
+def test_sections_are_found_in_any_order_and_header_style():
+    text = "**Final Answer:**\n42 RFIs\n\n## analysis\nCounted rows.\n\n=== CODE ===\n```python\nprint(len(df))\n```"
+    assert parse_sections(text) == {"FINAL ANSWER": "42 RFIs", "ANALYSIS": "Counted rows.", "CODE": "print(len(df))"}
+    assert parse_sections("=== CODE ===\nx = 1\n=== FINAL ANSWER ===\n1") == {"CODE": "x = 1", "FINAL ANSWER": "1"}
+    assert parse_sections("Just some prose.") == {}
+
+def test_excel_formatter_output_is_normalized():
+    import benchmarks.graph_bench  # noqa: F401  (sets the offline env before app imports)
+    from app.graph.nodes.excel_insight import extract_final_answer, format_problem
+
+    answer = extract_final_answer("== CODE ==\nprint(1)\n\nFINAL ANSWER:\n1\n\n### Analysis\nPrinted one.")
+    assert answer == "=== FINAL ANSWER ===\n1\n\n=== ANALYSIS ===\nPrinted one.\n\n=== CODE ===\nprint(1)"
+    assert extract_final_answer("=== FINAL ANSWER ===\n7", code="print(7)").endswith("=== CODE ===\nprint(7)")
+    assert format_problem("final answer\n3") is None and format_problem("3 rows") == "format"
@@ -0,0 +1,65 @@
+# File: tests/test_plot_store.py
+# Description: Tests plot rendering and the content-addressed plot store
+import os
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pytest
+from app.services.plot_store import PlotStore, capture_figures, absolute_plot_urls, media_type
+
+def _draw(n):
+    for i in range(n):
+        plt.figure()
+        plt.plot([0, i + 1])
+
+@pytest.mark.parametrize("fmt", ["png", "webp", "svg"])
+def test_capture_stores_blobs(tmp_path, fmt):
+    store = PlotStore(tmp_path)
+    _draw(3)
+    urls = capture_figures(fmt=fmt, dpi=50, transport="url", store=store)
+    assert len(urls) == 3 and not plt.get_fignums()
+    for url in urls:
+        name = url.removeprefix("/plots/")
+        assert name.endswith(f".{fmt}")
+        assert store.path_for(name).stat().st_size > 0
+        assert media_type(name).startswith("image/")
+
+def test_identical_plots_share_a_blob(tmp_path):
+    store = PlotStore(tmp_path)
+    plt.figure(); plt.plot([1, 2])
+    first = capture_figures(fmt="png", dpi=50, transport="url", store=store)
+    plt.figure(); plt.plot([1, 2])
+    assert capture_figures(fmt="png", dpi=50, transport="url", store=store) == first
+
+def test_inline_transport(tmp_path):
+    _draw(1)
+    images = capture_figures(fmt="webp", dpi=50, transport="inline", store=PlotStore(tmp_path))
+    assert images[0].startswith("data:image/webp;base64,")
+    assert not list(tmp_path.iterdir())
+
+def test_url_is_the_default_transport(tmp_path):
+    _draw(1)
+    [url] = capture_figures(fmt="png", dpi=50, store=PlotStore(tmp_path))
+    assert url.startswith("/plots/") and url.endswith(".png")
+
+def test_old_and_excess_blobs_are_evicted(tmp_path):
+    store = PlotStore(tmp_path, max_bytes=10, max_age_seconds=60)
+    old = store.put(b"old plot", "png")
+    path = store.path_for(old)
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    assert store.evict() == 1 and store.path_for(old) is None
+
+    first, second = store.put(b"first!", "png"), store.put(b"second", "png")
+    os.utime(store.path_for(first), (time.time() - 5, time.time() - 5))
+    assert store.evict() == 1
+    assert store.path_for(first) is None and store.path_for(second) is not None
+
+@pytest.mark.parametrize("name", ["../etc/passwd", "abc.png", "0" * 64 + ".gif", "0" * 64 + ".png"])
+def test_path_for_rejects_unknown_names(tmp_path, name):
+    assert PlotStore(tmp_path).path_for(name) is None
+
+def test_absolute_plot_urls():
+    images = ["/plots/abc.webp", "data:image/png;base64,xx"]
+    assert absolute_plot_urls(images, "http://api:8000/") == ["http://api:8000/plots/abc.webp", "data:image/png;base64,xx"]
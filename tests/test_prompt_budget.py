@@ -0,0 +1,79 @@
+# File: tests/test_prompt_budget.py
+# Description: Tests chunk dedupe/merge and the token budget applied to generate_answer prompts
+from app.utils.prompt_budget import overlap_length, merge_chunks, pack_chunks, fit_turns, PromptBudget
+from app.utils.tokens import count_tokens
+from app.services.utils import chunk_text
+from app.graph.nodes.generate import generate_answer, ResponsePayload
+
+TEXT = " ".join(f"Sentence {i} about coupling beam reinforcement and drift." for i in range(120))
+
+def _chunks(path="spec.pdf"):
+    return [{"snippet": c, "metadata": {"file_path": path, "chunk_id": i}} for i, c in enumerate(chunk_text(TEXT, 1000, 200))]
+
+def test_overlap_length():
+    assert overlap_length("abc " * 10 + "shared overlap text here", "shared overlap text here and more") == len("shared overlap text here")
+    assert overlap_length("no overlap at all in this one", "completely different start") == 0
+
+def test_adjacent_chunks_merge_back_into_source_text():
+    chunks = _chunks()
+    merged = merge_chunks([chunks[2], chunks[0], chunks[1], chunks[3]])
+    assert len(merged) == 1
+    assert merged[0]["metadata"]["chunk_id"] == "0-3"
+    assert TEXT.startswith(merged[0]["snippet"])
+
+def test_duplicates_and_other_files_are_kept_apart():
+    a, b = _chunks("a.pdf"), _chunks("b.pdf")
+    merged = merge_chunks([a[0], b[5], a[0], {"snippet": a[0]["snippet"][:100], "metadata": {"file_path": "a.pdf"}}, a[4]])
+    assert [m["metadata"]["file_path"] for m in merged] == ["a.pdf", "b.pdf", "a.pdf"]
+    assert [m["metadata"]["chunk_id"] for m in merged] == [0, 5, 4]
+
+def test_a_wider_chunk_brings_its_own_span():
+    chunks = _chunks()
+    partial = {"snippet": chunks[2]["snippet"][:100], "metadata": {"file_path": "spec.pdf", "chunk_id": 7}}
+    merged = merge_chunks([partial, chunks[1], chunks[2]])
+    # chunk 2 replaces the excerpt in its (better) rank, then merges with its neighbour 1
+    assert len(merged) == 1 and merged[0]["metadata"]["chunk_id"] == "1-2"
+    assert chunks[2]["snippet"] in merged[0]["snippet"]
+
+def test_pack_and_fit_respect_budgets():
+    chunks = merge_chunks(_chunks("a.pdf")[:2]) + _chunks("b.pdf")[:2]
+    packed = pack_chunks(chunks, 300)
+    assert sum(count_tokens(c["snippet"]) for c in packed) <= 300
+    turns = ["user: " + "x " * 200, "assistant: short", "user: latest"]
+    assert fit_turns(turns, 20) == ["assistant: short", "user: latest"]
+
+def test_budget_gives_context_what_is_left():
+    budget = PromptBudget(total=1000, summary_cap=50, history_cap=50)
+    summary, turns, chunks = budget.fit("instructions " * 100, "summary " * 500, ["user: hi"], _chunks())
+    assert budget.used["summary"] <= 50
+    assert turns == ["user: hi"]
+    assert sum(budget.used.values()) <= 1000
+    assert budget.used["context"] > 0 and len(chunks) == 1
+
+class _FakeStructured:
+    def __init__(self, sink):
+        self.sink = sink
+    def invoke(self, messages):
+        self.sink.append(messages)
+        return ResponsePayload(answer="ok [1]", updated_summary="s", thread_preview="p")
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = []
+    def with_structured_output(self, schema, **kwargs):
+        return _FakeStructured(self.calls)
+
+def test_generate_answer_prompt_is_budgeted(monkeypatch):
+    from app.graph.nodes import generate
+    monkeypatch.setattr(generate, "GENERATE_MAX_PROMPT_TOKENS", 2500)
+    monkeypatch.setattr(generate, "GENERATE_SUMMARY_MAX_TOKENS", 100)
+    client = _FakeClient()
+    many = [{"snippet": f"Unique chunk {i}: " + "detail " * 300, "metadata": {"file_path": f"doc{i}.pdf"}} for i in range(20)]
+    state = generate_answer(client)({
+        "query_class": "general", "rewritten_query": "drift limits", "history": "old " * 2000,
+        "messages": [{"role": "user", "content": "drift limits?"}], "ranked_chunks": many,
+    })
+    assert state["final_answer"] == "ok [1]"
+    system, user = client.calls[0]
+    assert count_tokens(system["content"] + user["content"]) <= 2500
+    assert "doc0.pdf" in user["content"] and "doc19.pdf" not in user["content"]
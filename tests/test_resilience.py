@@ -0,0 +1,196 @@
+# File: tests/test_resilience.py
+# Description: Per-dependency timeouts, jittered retries, hedged reads and circuit breakers
+import threading
+import time
+
+import pytest
+
+from app.services import resilience
+from app.services.metrics import metrics
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, DependencyError, DependencyTimeout, Policy, ResilientModel,
+    call, retryable, unavailable_message,
+)
+
+
+class _Unavailable(Exception):
+    status_code = 503
+
+
+@pytest.fixture(autouse=True)
+def policies(monkeypatch):
+    monkeypatch.setattr(resilience, "RESILIENCE_ENABLED", True)
+    monkeypatch.setattr(resilience, "DEFAULT_POLICIES", {
+        "supabase": Policy(timeout_seconds=0.5, retries=2, backoff_seconds=0.001, failure_threshold=3, reset_seconds=60),
+        "slow": Policy(timeout_seconds=0.2, retries=0),
+        "hedged": Policy(timeout_seconds=1.0, retries=0, hedge_after_seconds=0.05),
+    })
+    resilience.reset_circuits()
+    yield
+    resilience.reset_circuits()
+
+
+def test_transient_failures_are_retried_and_client_errors_are_not():
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _Unavailable("busy")
+        return "ok"
+    assert call("supabase", flaky) == "ok" and len(calls) == 3
+
+    calls.clear()
+    def bad_request():
+        calls.append(1)
+        raise ValueError("invalid filter")
+    with pytest.raises(ValueError):
+        call("supabase", bad_request)
+    assert len(calls) == 1
+    assert retryable(TimeoutError()) and retryable(_Unavailable()) and not retryable(KeyError("x"))
+
+def test_exhausted_retries_and_timeouts_raise_dependency_errors():
+    with pytest.raises(DependencyError) as info:
+        call("supabase", lambda: (_ for _ in ()).throw(_Unavailable("down")))
+    assert info.value.dependency == "supabase"
+    assert "not responding" in unavailable_message(info.value)
+
+    t0 = time.monotonic()
+    with pytest.raises(DependencyTimeout):
+        call("slow", lambda: time.sleep(2))
+    assert time.monotonic() - t0 < 1.0
+
+def test_hedged_read_returns_the_first_success():
+    hedges = metrics.value("assistant_dependency_hedges_total", dependency="hedged")
+    started = []
+    lock = threading.Lock()
+    def read():
+        with lock:
+            started.append(1)
+            first = len(started) == 1
+        time.sleep(0.8 if first else 0.01)    # the first replica is stalled
+        return "slow" if first else "fast"
+    t0 = time.monotonic()
+    assert call("hedged", read, hedge=True) == "fast"
+    assert time.monotonic() - t0 < 0.5
+    assert metrics.value("assistant_dependency_hedges_total", dependency="hedged") == hedges + 1
+    # Without hedge=True (writes) no duplicate is sent
+    started.clear()
+    assert call("hedged", read) == "slow" and len(started) == 1
+
+def test_circuit_opens_fails_fast_and_closes_after_a_successful_probe():
+    def down():
+        raise ConnectionError("refused")
+    with pytest.raises(DependencyError):
+        call("supabase", down)                  # 3 attempts -> threshold reached
+    assert resilience.breaker("supabase").state == "open"
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        call("supabase", lambda: calls.append(1))
+    assert calls == []
+
+    resilience.breaker("supabase").opened_at -= 60
+    assert call("supabase", lambda: "back") == "back"
+    assert resilience.breaker("supabase").state == "closed"
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+def test_resilient_model_wraps_structured_output(monkeypatch):
+    monkeypatch.setattr(resilience, "DEFAULT_POLICIES", {"openai": Policy(timeout_seconds=1.0, retries=1, backoff_seconds=0.001)})
+    attempts = []
+
+    class Model:
+        model_name = "m"
+        def with_structured_output(self, schema):
+            return self
+        def invoke(self, messages):
+            attempts.append(messages)
+            if len(attempts) == 1:
+                raise _Unavailable("overloaded")
+            return {"ok": True}
+
+    model = ResilientModel(Model()).with_structured_output(dict)
+    assert model.invoke(["hi"]) == {"ok": True} and len(attempts) == 2
+    assert model.model_name == "m"
+
+def test_resilient_model_async_stream_and_bound_calls_are_wrapped(monkeypatch):
+    import asyncio
+    monkeypatch.setattr(resilience, "DEFAULT_POLICIES", {"openai": Policy(timeout_seconds=1.0, retries=1, backoff_seconds=0.001)})
+    attempts = []
+
+    class Model:
+        def __init__(self, bound=None):
+            self.bound = bound
+        def bind(self, **kwargs):
+            return Model(kwargs)
+        def with_config(self, config=None, **kwargs):
+            return Model(config)
+        def invoke(self, messages):
+            attempts.append(self.bound)
+            if len(attempts) % 2:
+                raise _Unavailable("overloaded")
+            return "reply"
+
+    async def consume(model):
+        return [await model.ainvoke(["hi"])] + [chunk async for chunk in model.astream(["hi"])]
+
+    model = ResilientModel(Model())
+    assert asyncio.run(consume(model)) == ["reply", "reply"] and len(attempts) == 4
+    assert list(model.bind(stop=["\n"]).stream(["hi"])) == ["reply"] and attempts[-1] == {"stop": ["\n"]}
+    assert model.with_config({"tags": ["t"]}).invoke(["hi"]) == "reply" and attempts[-1] == {"tags": ["t"]}
+
+def test_abandoned_attempts_only_hold_their_own_dependency_pool(monkeypatch):
+    monkeypatch.setattr(resilience, "RESILIENCE_WORKERS", 1)
+    resilience._pool.cache_clear()
+    release = threading.Event()
+    try:
+        with pytest.raises(DependencyTimeout):
+            call("slow", release.wait)
+        # The stalled call still holds the only "slow" worker; other dependencies are unaffected
+        t0 = time.monotonic()
+        assert call("supabase", lambda: "ok") == "ok" and time.monotonic() - t0 < 0.1
+    finally:
+        release.set()
+        resilience._pool.cache_clear()
+
+def test_stalled_pinecone_is_bounded_and_then_fails_fast(monkeypatch):
+    import asyncio
+    from benchmarks.fakes import Corpus, FakeIndex, FakeSupabase
+    from benchmarks.graph_bench import install_fakes, reset_caches, run_request
+    from app.graph.assistant import build_assistant_graph
+    from app.services.thread_store import ThreadStore
+
+    monkeypatch.setattr(resilience, "DEFAULT_POLICIES", {
+        "pinecone": Policy(timeout_seconds=0.2, retries=1, backoff_seconds=0.001, failure_threshold=2, reset_seconds=60),
+    })
+    corpus = Corpus.load(latency_scale=0)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    monkeypatch.setattr(FakeIndex, "query", lambda self, *args, **kwargs: time.sleep(3))
+    case = next(c for c in corpus.cases if c["name"] == "concrete_cover")
+
+    async def run():
+        graph = build_assistant_graph()
+        store = ThreadStore(FakeSupabase(corpus), spool_dir=None)
+        await store.start()
+        timings = []
+        for i in range(2):
+            t0 = time.monotonic()
+            _, ok, result = await run_request(graph, store, case, f"outage-{i}")
+            timings.append((time.monotonic() - t0, ok, result["error"]))
+        await store.close()
+        return timings
+
+    reset_caches()
+    try:
+        (first, ok1, error1), (second, ok2, error2) = asyncio.run(run())
+    finally:
+        reset_caches()
+    assert not ok1 and "DependencyTimeout" in error1 and first < 1.5
+    assert not ok2 and "CircuitOpenError" in error2 and second < 0.5
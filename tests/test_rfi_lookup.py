@@ -0,0 +1,106 @@
+# File: tests/test_rfi_lookup.py
+# Description: Tests reading matched RFI folders and packing them into a token-budgeted context
+import os
+import pytest
+import sys
+import types
+from app.graph.nodes import rfi_lookup
+from app.graph.nodes.rfi_lookup import rfi_tag, tag_variants, read_rfi_folders, build_rfi_context, match_rfis, rfi_combine_context, query_rfi_chunks
+from app.services.extraction_cache import ExtractionCache
+from app.utils.tokens import count_tokens
+
+@pytest.fixture
+def rfi_root(tmp_path):
+    for tag, text in [("0004", "Seismic drift table for facade design. " * 20), ("0016.2", "Beam (revised) connection detail. " * 20)]:
+        folder = tmp_path / tag
+        folder.mkdir()
+        (folder / "response.txt").write_text(text)
+        (folder / "ignored.xyz").write_text("not supported")
+    return tmp_path
+
+@pytest.mark.parametrize("link,expected", [
+    ("N:\\2019\\19032.BD - Century City JMB Tower\\CA\\RFI's\\0016.2", "0016.2"),
+    ("N:\\2019\\CA\\RFI's\\004\\", "004"),
+    ("/mnt/rfis/0004", "0004"),
+])
+def test_rfi_tag(link, expected):
+    assert rfi_tag(link) == expected
+
+def test_read_rfi_folders(rfi_root):
+    contents = read_rfi_folders([str(rfi_root / "0004"), str(rfi_root / "0016.2"), "N:\\missing\\0001"])
+    assert [(c["rfi"], os.path.basename(c["file_path"])) for c in contents] == [("0004", "response.txt"), ("0016.2", "response.txt")]
+    assert "Seismic drift" in contents[0]["chunks"][0]
+
+def test_extraction_cache_keys_on_mtime(tmp_path):
+    calls = []
+    cache = ExtractionCache(max_files=4, extractor=lambda path: calls.append(path) or [open(path).read()])
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    assert cache.get_chunks(str(path)) == ["one"]
+    assert cache.get_chunks(str(path)) == ["one"]
+    assert len(calls) == 1 and cache.hits == 1
+    path.write_text("two!")
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10**9,) * 2)
+    assert cache.get_chunks(str(path)) == ["two!"]
+    assert len(calls) == 2
+
+def test_context_respects_budget_and_round_robins():
+    matches = [{"RFI #": 4.0, "Link": "N:\\RFI's\\0004", "Status": "A", "RFI Description": "Drift", "Date Sent": None}]
+    contents = [
+        {"rfi": "0004", "file_path": "a.pdf", "chunks": ["alpha " * 50] * 5},
+        {"rfi": "0016", "file_path": "b.pdf", "chunks": ["beta " * 50] * 5},
+    ]
+    context, chunks = build_rfi_context(matches, contents, max_tokens=200)
+    assert sum(count_tokens(c["snippet"]) for c in chunks) <= 200
+    assert chunks[0]["metadata"]["doc_type"] == "RFI log entry"
+    assert "Date Sent" not in chunks[0]["snippet"]
+    assert {c["metadata"]["file_path"] for c in chunks[1:3]} == {"a.pdf", "b.pdf"}
+    assert context.startswith("[RFI 0004] N:\\RFI's\\0004\nRFI #: 4.0")
+
+def test_nodes_fall_back_to_folders(rfi_root, monkeypatch):
+    monkeypatch.setattr(rfi_lookup, "query_rfi_chunks", lambda query, tags, top_k=None, namespaces=None: [])
+    state = {"rfi_matches": [{"RFI #": 4.0, "Link": str(rfi_root / "0004"), "RFI Description": "Drift"}]}
+    state = rfi_combine_context(None)(match_rfis(None)(state))
+    assert state["rfi_folder_paths"] == [str(rfi_root / "0004")]
+    assert [c["metadata"]["file_path"] for c in state["ranked_chunks"]][1].endswith("response.txt")
+    assert "Seismic drift" in state["context"]
+
+def test_tag_variants():
+    assert tag_variants("004") == ["004", "4", "0004"]
+    assert tag_variants("0016.2") == ["0016.2", "16.2", "016.2"]
+
+def test_query_rfi_chunks_uses_one_filtered_query(monkeypatch):
+    calls = []
+    def fake_retrieve(query, top_k, filter, namespaces=None):
+        calls.append(filter)
+        assert namespaces == ["shared", "century-city"]
+        return {"matches": [
+            {"id": "b", "score": 0.5, "metadata": {"snippet": "low", "file_path": "b.pdf", "tags": ["RFI", "0016.2"]}},
+            {"id": "a", "score": 0.9, "metadata": {"snippet": "high", "file_path": "a.pdf", "tags": ["RFI", "0004"]}},
+        ]}
+    # Stand-in for app.services.pinecone_index, which connects to Pinecone on import
+    monkeypatch.setitem(sys.modules, "app.services.pinecone_index", types.SimpleNamespace(retrieve_docs=fake_retrieve))
+    chunks = query_rfi_chunks("drift", ["004", "0016.2"], top_k=5, namespaces=["shared", "century-city"])
+    assert len(calls) == 1
+    assert calls[0]["doc_type"] == {"$eq": "RFI"}
+    assert {"004", "0004", "0016.2"} <= set(calls[0]["tags"]["$in"])
+    assert [c["snippet"] for c in chunks] == ["high", "low"]
+    assert [c["metadata"]["rfi"] for c in chunks] == ["004", "0016.2"]
+
+def test_vector_chunks_skip_folder_reads(rfi_root, monkeypatch):
+    hit = {"id": "a", "score": 0.9, "snippet": "indexed text", "metadata": {"file_path": "a.pdf", "rfi": "0004"}}
+    monkeypatch.setattr(rfi_lookup, "query_rfi_chunks", lambda query, tags, top_k=None, namespaces=None: [hit])
+    state = {"rewritten_query": "drift", "rfi_matches": [{"Link": str(rfi_root / "0004")}]}
+    state = rfi_combine_context(None)(match_rfis(None)(state))
+    assert state["folder_contents"] == []
+    assert state["ranked_chunks"][-1]["snippet"] == "indexed text"
+
+def test_matched_folders_are_capped(monkeypatch):
+    seen = {}
+    monkeypatch.setattr(rfi_lookup, "RFI_MAX_FOLDERS", 3)
+    monkeypatch.setattr(rfi_lookup, "RFI_READ_FOLDERS", "fallback")
+    monkeypatch.setattr(rfi_lookup, "query_rfi_chunks", lambda query, tags, top_k=None, namespaces=None: seen.setdefault("tags", tags) and [])
+    monkeypatch.setattr(rfi_lookup, "read_rfi_folders", lambda paths: seen.setdefault("read", paths) and [])
+    state = match_rfis(None)({"rfi_matches": [{"Link": f"N:\\RFI's\\{i:04d}"} for i in range(1, 2001)]})
+    assert state["rfi_folder_paths"] == ["N:\\RFI's\\0001", "N:\\RFI's\\0002", "N:\\RFI's\\0003"]
+    assert seen["tags"] == ["0001", "0002", "0003"] and len(seen["read"]) == 3
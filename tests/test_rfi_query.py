@@ -0,0 +1,81 @@
+# File: tests/test_rfi_query.py
+# Description: Tests the structured (no code generation) query layer over the RFI log
+import sys
+from pathlib import Path
+import pandas as pd
+import pytest
+
+# Ensure app folder is in sys.path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from app.services.rfi_query import RFIQuery, UnsupportedQuery, run_rfi_query, is_supported, to_records, format_result
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "RFI #": [1.0, 4.0, 16.0, 16.2, 20.0],
+        "Link": ["N:\\RFI's\\001", "N:\\RFI's\\004", "N:\\RFI's\\0016", "N:\\RFI's\\0016.2", "N:\\RFI's\\0020"],
+        "Status": ["A", "W - Arch", "U", "W - Arch", "IP "],
+        "RFI Description": ["Slab", "Drift", "Beam (revised)", "Beam follow-up", "Column"],
+        "Date Received": pd.to_datetime(["2022-08-08", "2022-09-01", "2023-01-10", "2023-02-01", "2023-03-15"]),
+        "Date Requested": ["2022-08-13 00:00:00", "2022-09-06 00:00:00", "", "2023-02-08 00:00:00", "2023-03-20 00:00:00"],
+        "Date Sent": pd.to_datetime(["2022-08-08", None, None, None, None]),
+        " Business Days": ["0.0", "", "", "", ""],
+        "Ball in Court": ["", "DT", "DT/YC", "JK", "yc"],
+    })
+
+def test_count_open_with_architect(df):
+    query = RFIQuery(supported=True, operation="count", status=["W - Arch"])
+    assert run_rfi_query(df, query) == 2
+
+def test_status_is_whitespace_insensitive(df):
+    query = RFIQuery(supported=True, operation="list", status=["IP"])
+    assert run_rfi_query(df, query)["RFI #"].tolist() == [20.0]
+
+def test_ball_in_court_matches_shared_assignments(df):
+    query = RFIQuery(supported=True, operation="list", ball_in_court=["YC"])
+    assert run_rfi_query(df, query)["RFI #"].tolist() == [16.0, 20.0]
+
+def test_rfi_numbers_match_zero_padded_and_follow_ups(df):
+    query = RFIQuery(supported=True, operation="list", rfi_numbers=["0016", "0016.2"])
+    assert run_rfi_query(df, query)["RFI #"].tolist() == [16.0, 16.2]
+
+def test_date_range_on_string_column(df):
+    query = RFIQuery(supported=True, operation="count", date_field="Date Requested", date_from="2023-01-01", date_to="2023-02-28")
+    assert run_rfi_query(df, query) == 1
+
+def test_date_range_requires_field(df):
+    with pytest.raises(UnsupportedQuery):
+        run_rfi_query(df, RFIQuery(supported=True, operation="count", date_from="2023-01-01"))
+
+def test_group_count(df):
+    query = RFIQuery(supported=True, operation="group_count", group_by="Status")
+    result = run_rfi_query(df, query)
+    assert dict(zip(result["Status"], result["Count"]))["W - Arch"] == 2
+
+def test_top_n_uses_padded_column_name(df):
+    query = RFIQuery(supported=True, operation="top_n", sort_by="Date Received", limit=2)
+    assert run_rfi_query(df, query)["RFI #"].tolist() == [20.0, 16.2]
+
+def test_records_have_no_nat(df):
+    records = to_records(run_rfi_query(df, RFIQuery(supported=True, rfi_numbers=["4"])))
+    assert records[0]["Date Sent"] is None
+    assert records[0]["Link"] == "N:\\RFI's\\004"
+
+def test_format_result_has_answer_card_sections(df):
+    query = RFIQuery(supported=True, operation="count", status=["U"])
+    text = format_result(run_rfi_query(df, query), query)
+    assert text.startswith("=== FINAL ANSWER ===\n1\n")
+    assert "=== ANALYSIS ===" in text and "=== CODE ===" in text
+
+@pytest.mark.parametrize("query,query_class,query_subclass,expected", [
+    (RFIQuery(supported=True, operation="count"), "excel_insight", "no_llm", True),
+    (RFIQuery(supported=True, operation="count"), "excel_insight", "needs_llm", False),
+    (RFIQuery(supported=False, operation="count"), "excel_insight", "no_llm", False),
+    (RFIQuery(supported=True, operation="group_count"), "excel_insight", "no_llm", False),
+    (RFIQuery(supported=True, operation="list"), "rfi_lookup", None, True),
+    (RFIQuery(supported=True, operation="count"), "rfi_lookup", None, False),
+    (None, "excel_insight", "no_llm", False),
+])
+def test_is_supported(query, query_class, query_subclass, expected):
+    assert is_supported(query, query_class, query_subclass) is expected
@@ -0,0 +1,72 @@
+# File: tests/test_single_flight.py
+# Description: Single-flight registry and coalescing of identical concurrent requests in the graph
+import asyncio
+
+import pytest
+
+import app.services.single_flight as single_flight_module
+from app.services.metrics import metrics
+from app.services.single_flight import SingleFlight, flight_scope, lead
+from benchmarks.fakes import Corpus, FakeSupabase
+from benchmarks.graph_bench import install_fakes, reset_caches, run_request
+
+
+def test_followers_wait_for_the_leader_result():
+    flights = SingleFlight(max_age_seconds=5)
+    token, future, _ = flights.join("k")
+    follower, shared, wait = flights.join("k")
+    assert token is not None and follower is None and shared is future and 0 < wait <= 5
+    flights.finish(token, {"final_answer": "42"})
+    assert shared.result(timeout=0) == {"final_answer": "42"}
+    # The flight is closed: the next caller leads a new one
+    assert flights.join("k")[0] not in (None, token)
+
+def test_stale_flights_are_replaced_and_old_leaders_cannot_close_new_ones():
+    flights = SingleFlight(max_age_seconds=0)
+    old, old_future, _ = flights.join("k")
+    new, _, _ = flights.join("k")
+    assert new != old and old_future.result(timeout=0) is None
+    flights.finish(old, {"final_answer": "late"})
+    assert len(flights) == 1
+
+def test_flight_scope_releases_followers_when_the_leader_raises(monkeypatch):
+    flights = SingleFlight(max_age_seconds=60)
+    monkeypatch.setattr(single_flight_module, "single_flight", flights)
+    with pytest.raises(RuntimeError):
+        with flight_scope():
+            token, _, _ = flights.join("k")
+            lead(token)
+            _, future, _ = flights.join("k")
+            raise RuntimeError("node failed")
+    assert future.result(timeout=0) is None
+    assert len(flights) == 0
+
+def test_identical_concurrent_requests_share_one_execution(monkeypatch):
+    from app.graph.assistant import build_assistant_graph
+    from app.services.thread_store import ThreadStore
+
+    corpus = Corpus.load(latency_scale=0.05)
+    install_fakes(corpus, patch=monkeypatch.setattr)
+    case = next(c for c in corpus.cases if c["name"] == "coupling_beam")
+    reset_caches()
+    hits_before = metrics.value("assistant_cache_lookups_total", cache="coalesce", result="hit")
+
+    async def run():
+        graph = build_assistant_graph()
+        store = ThreadStore(FakeSupabase(corpus), spool_dir=None)
+        await store.start()
+        results = await asyncio.gather(*(run_request(graph, store, case, f"burst-{i}") for i in range(4)))
+        await store.close()
+        return results
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        reset_caches()
+
+    traces = [trace for trace, ok, _ in results]
+    assert all(ok for _, ok, _ in results)
+    assert metrics.value("assistant_cache_lookups_total", cache="coalesce", result="hit") == hits_before + 3
+    assert sum(trace.last_span("rerank_chunks") is not None for trace in traces) == 1
+    # Every request, leader or follower, still writes its own thread summary
+    assert all(trace.last_span("generate_answer") is not None for trace in traces)
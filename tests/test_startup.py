@@ -0,0 +1,54 @@
+# File: tests/test_startup.py
+# Description: Importing the assistant stays cheap; the graph is built on first use
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def _loaded_after_import(module: str, candidates: tuple[str, ...]) -> list[str]:
+    code = f"import sys, {module}; print(','.join(m for m in {candidates!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, env=os.environ.copy())
+    assert proc.returncode == 0, proc.stderr
+    return [m for m in proc.stdout.strip().split(",") if m]
+
+def test_assistant_import_defers_heavy_modules():
+    heavy = ("langgraph", "langchain_openai", "pinecone", "matplotlib", "pandas")
+    assert _loaded_after_import("app.graph.assistant", heavy) == []
+
+def test_pinecone_index_import_does_not_connect():
+    assert _loaded_after_import("app.services.pinecone_index", ("pinecone",)) == []
+
+def test_warmup_status_starts_cold(monkeypatch):
+    from app.graph import assistant
+    # Other tests may already have built the graph in this process
+    monkeypatch.setattr(assistant, "_status", {"state": "cold", "error": None, "seconds": None})
+    monkeypatch.setattr(assistant, "_graph", None)
+    status = assistant.warmup_status()
+    assert status["state"] == "cold" and status["ready"] is False
+
+def test_failed_build_is_reported_and_retried(monkeypatch):
+    from app.graph import assistant
+    calls = []
+
+    def failing_build():
+        calls.append(1)
+        raise FileNotFoundError("RFI log missing")
+
+    monkeypatch.setattr(assistant, "build_assistant_graph", failing_build)
+    monkeypatch.setattr(assistant, "_status", {"state": "cold", "error": None, "seconds": None})
+    monkeypatch.setattr(assistant, "_graph", None)
+    with pytest.raises(FileNotFoundError):
+        assistant.get_assistant_graph()
+    assert assistant.warmup_status()["state"] == "failed"
+    assert "RFI log missing" in assistant.warmup_status()["error"]
+
+    graph = object()
+    monkeypatch.setattr(assistant, "build_assistant_graph", lambda: graph)
+    assert assistant.get_assistant_graph() is graph
+    assert len(calls) == 1
+    status = assistant.warmup_status()
+    assert status["state"] == "ready" and status["ready"] is True and status["error"] is None
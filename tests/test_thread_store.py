@@ -0,0 +1,136 @@
+# File: tests/test_thread_store.py
+# Description: Tests the write-behind thread store against a local fake Supabase client
+import asyncio
+import time
+import pytest
+from app.services.thread_store import ThreadStore
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, db, op, payload=None):
+        self.db, self.op, self.payload, self.filters = db, op, payload, {}
+    def select(self, *cols):
+        return self
+    def eq(self, col, value):
+        self.filters[col] = value
+        return self
+    def maybe_single(self):
+        return self
+    def execute(self):
+        if self.op == "select":
+            self.db.selects += 1
+            row = self.db.rows.get((self.filters["user_id"], self.filters["id"]))
+            return FakeResult(dict(row) if row else None)
+        if self.db.fail_writes:
+            self.db.fail_writes -= 1
+            raise ConnectionError("supabase unavailable")
+        self.db.upserts.append(dict(self.payload))
+        key = (self.payload["user_id"], self.payload["id"])
+        self.db.rows[key] = {**self.db.rows.get(key, {}), **self.payload}
+        return FakeResult([self.payload])
+
+class FakeTable:
+    def __init__(self, db):
+        self.db = db
+    def select(self, *cols):
+        return FakeQuery(self.db, "select")
+    def upsert(self, payload):
+        return FakeQuery(self.db, "upsert", payload)
+
+class FakeSupabase:
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.selects = 0
+        self.upserts = []
+        self.fail_writes = 0
+    def table(self, name):
+        assert name == "threads"
+        return FakeTable(self)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_reads_are_served_from_memory(tmp_path):
+    db = FakeSupabase({("u1", "t1"): {"summary": "prior", "thread_preview": "Drift", "previous_rewrites": "", "user_id": "u1", "id": "t1"}})
+    store = ThreadStore(db, spool_dir=tmp_path)
+    assert run(store.get("u1", "t1"))["summary"] == "prior"
+    assert run(store.get("u1", "t1"))["thread_preview"] == "Drift"
+    assert run(store.get("u1", "missing")) == {}
+    assert db.selects == 2
+
+def test_cached_rows_expire_so_other_workers_writes_are_seen(tmp_path):
+    db = FakeSupabase({("u1", "t1"): {"summary": "mine", "previous_rewrites": "[a]"}})
+    store = ThreadStore(db, spool_dir=tmp_path, cache_ttl=0.05)
+    assert run(store.get("u1", "t1"))["summary"] == "mine"
+    db.rows[("u1", "t1")] = {"summary": "theirs", "previous_rewrites": "[a][b]"}    # another worker's turn
+    assert run(store.get("u1", "t1"))["summary"] == "mine"
+    time.sleep(0.06)
+    assert run(store.get("u1", "t1")) == {"summary": "theirs", "previous_rewrites": "[a][b]"}
+    # A write carries only the fields it sets, never the rest of a cached row
+    store.put("u1", "t1", thread_preview="Drift")
+    run(store.flush())
+    assert db.upserts == [{"user_id": "u1", "id": "t1", "thread_preview": "Drift"}]
+
+def test_writes_coalesce_per_thread(tmp_path):
+    db = FakeSupabase()
+    store = ThreadStore(db, spool_dir=tmp_path)
+    store.put("u1", "t1", summary="one", thread_preview="A")
+    store.put("u1", "t1", summary="two")
+    store.put("u1", "t2", summary="other")
+    assert run(store.get("u1", "t1")) == {"summary": "two", "thread_preview": "A"}
+    assert db.upserts == []
+    assert run(store.flush()) == 0
+    assert sorted(db.upserts, key=lambda r: r["id"]) == [
+        {"user_id": "u1", "id": "t1", "summary": "two", "thread_preview": "A"},
+        {"user_id": "u1", "id": "t2", "summary": "other"},
+    ]
+    assert not list(tmp_path.iterdir())
+
+def test_failed_writes_are_spooled_and_replayed(tmp_path):
+    db = FakeSupabase()
+    db.fail_writes = 1
+    store = ThreadStore(db, spool_dir=tmp_path)
+    store.put("u1", "t1", summary="kept")
+    assert run(store.flush()) == 1
+    assert store.failures == 1
+    assert len(list(tmp_path.glob("thread_writes.*.json"))) == 1
+
+    # Simulate the process dying: a new store (new pid) adopts the spool of the dead one
+    spool = next(tmp_path.glob("thread_writes.*.json"))
+    spool.rename(tmp_path / "thread_writes.999999999.json")
+    replacement = ThreadStore(db, spool_dir=tmp_path)
+    assert run(replacement.flush()) == 0
+    assert db.upserts == [{"user_id": "u1", "id": "t1", "summary": "kept"}]
+
+def test_newer_write_during_flush_is_not_lost(tmp_path):
+    db = FakeSupabase()
+    store = ThreadStore(db, spool_dir=tmp_path)
+    store.put("u1", "t1", summary="old")
+    original = db.table
+    def table(name):
+        store.put("u1", "t1", summary="new")    # lands while the upsert is in flight
+        db.table = original
+        return original(name)
+    db.table = table
+    assert run(store.flush()) == 1
+    assert run(store.flush()) == 0
+    assert db.rows[("u1", "t1")]["summary"] == "new"
+
+def test_background_flusher_and_close(tmp_path):
+    db = FakeSupabase()
+    store = ThreadStore(db, flush_interval=0.01, spool_dir=tmp_path)
+
+    async def scenario():
+        await store.start()
+        store.put("u1", "t1", summary="bg")
+        await asyncio.sleep(0.1)
+        flushed = list(db.upserts)
+        store.put("u1", "t1", summary="final")
+        await store.close()
+        return flushed
+
+    assert run(scenario()) == [{"user_id": "u1", "id": "t1", "summary": "bg"}]
+    assert db.rows[("u1", "t1")]["summary"] == "final"
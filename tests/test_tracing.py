@@ -0,0 +1,119 @@
+# File: tests/test_tracing.py
+# Description: Node spans, LLM usage accounting and the Prometheus rendering
+import asyncio
+import uuid
+from typing import TypedDict
+
+import pytest
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.messages import AIMessage
+
+from app.clients.llm_callbacks import UsageCallback
+from app.services.metrics import MetricsRegistry, metrics
+from app.services.tracing import record_cache, record_llm_call, record_retrieval, trace_request, traced_node
+
+
+def test_registry_renders_counters_and_cumulative_histograms():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.describe("jobs_total", "counter", "Jobs run")
+    registry.inc("jobs_total", kind="a")
+    registry.inc("jobs_total", 2, kind="a")
+    registry.observe("job_seconds", 0.05, kind="a")
+    registry.observe("job_seconds", 0.5, kind="a")
+    registry.observe("job_seconds", 5.0, kind="a")
+    text = registry.render()
+    assert "# HELP jobs_total Jobs run" in text
+    assert 'jobs_total{kind="a"} 3' in text
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="a",le="1"} 2' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 3' in text
+    assert 'job_seconds_count{kind="a"} 3' in text
+    assert 'job_seconds_sum{kind="a"} 5.55' in text
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc("odd_total", path='a"b\\c')
+    assert 'odd_total{path="a\\"b\\\\c"} 1' in registry.render()
+
+def test_traced_node_records_span_with_llm_usage_and_annotations(capsys, monkeypatch):
+    monkeypatch.setattr("app.services.tracing.TRACE_LOG_ENABLED", True)
+
+    def node(state):
+        record_llm_call("gpt-test", 0.25, prompt_tokens=100, completion_tokens=20)
+        record_cache("answer", False)
+        record_retrieval("pinecone", 15)
+        return state
+
+    with trace_request("unit") as trace:
+        traced_node("retrieve", node)({})
+    span = trace.last_span("retrieve")
+    assert span.llm_calls == 1 and span.prompt_tokens == 100 and span.completion_tokens == 20
+    assert span.llm_ms == pytest.approx(250)
+    assert span.attributes == {"answer_cache_hit": False, "pinecone_count": 15}
+    assert '"event": "trace"' in capsys.readouterr().out
+    assert trace.timings()["prompt_tokens"] == 100
+
+def test_traced_node_records_errors():
+    def broken(state):
+        raise RuntimeError("boom")
+
+    before = metrics.value("assistant_node_errors_total", node="broken")
+    with pytest.raises(RuntimeError):
+        with trace_request("unit") as trace:
+            traced_node("broken", broken)({})
+    assert trace.last_span("broken").error == "RuntimeError: boom"
+    assert trace.attributes["status"] == "error"
+    assert metrics.value("assistant_node_errors_total", node="broken") == before + 1
+
+def test_spans_reach_the_trace_from_langgraph_worker_threads():
+    from langgraph.graph import StateGraph
+
+    class State(TypedDict, total=False):
+        n: int
+
+    def first(state: State) -> State:
+        record_llm_call("gpt-test", 0.01, prompt_tokens=7)
+        return {"n": 1}
+
+    def second(state: State) -> State:
+        return {"n": state["n"] + 1}
+
+    builder = StateGraph(State)
+    builder.add_node("first", traced_node("first", first))
+    builder.add_node("second", traced_node("second", second))
+    builder.set_entry_point("first")
+    builder.add_edge("first", "second")
+    builder.set_finish_point("second")
+    graph = builder.compile()
+
+    async def run():
+        with trace_request("unit") as trace:
+            seen = []
+            async for update in graph.astream({}, stream_mode="updates"):
+                for name in update:
+                    seen.append((name, trace.last_span(name) is not None))
+        return trace, seen
+
+    trace, seen = asyncio.run(run())
+    assert seen == [("first", True), ("second", True)]
+    assert [s.name for s in trace.spans] == ["first", "second"]
+    assert trace.last_span("first").prompt_tokens == 7
+
+def test_usage_callback_reads_token_usage_and_usage_metadata():
+    callback = UsageCallback()
+
+    def node(state):
+        run_id = uuid.uuid4()
+        callback.on_chat_model_start({}, [[]], run_id=run_id)
+        callback.on_llm_end(LLMResult(generations=[[]], llm_output={
+            "token_usage": {"prompt_tokens": 30, "completion_tokens": 5}, "model_name": "gpt-4o-mini"}), run_id=run_id)
+        run_id = uuid.uuid4()
+        callback.on_chat_model_start({}, [[]], run_id=run_id)
+        message = AIMessage(content="ok", usage_metadata={"input_tokens": 3, "output_tokens": 2, "total_tokens": 5})
+        callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+        return state
+
+    with trace_request("unit") as trace:
+        traced_node("classify", node)({})
+    span = trace.last_span("classify")
+    assert (span.llm_calls, span.prompt_tokens, span.completion_tokens) == (2, 33, 7)
@@ -0,0 +1,66 @@
+# File: tests/test_ttl_cache.py
+# Description: Tests the LRU/TTL cache and its shared SQLite tier
+import time
+from app.services.ttl_cache import TTLCache, SQLiteCacheBackend, create_cache
+
+def test_lru_eviction_and_stats():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1          # a becomes most recent
+    cache.set("c", 3)                   # evicts b
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1, 1)
+
+def test_entries_expire():
+    cache = TTLCache(max_entries=4, ttl_seconds=0.05)
+    cache.set("a", True)
+    assert cache.get("a") is True
+    time.sleep(0.06)
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+def test_falsy_values_are_cached():
+    cache = TTLCache(max_entries=4, ttl_seconds=60)
+    cache.set("blocked", False)
+    assert cache.get("blocked") is False
+
+def test_eviction_hook_sees_capacity_and_expiry_drops():
+    dropped = []
+    cache = TTLCache(max_entries=1, ttl_seconds=0.05, on_evict=lambda key, value: dropped.append((key, value)))
+    cache.set("a", 1)
+    cache.set("b", 2)                   # capacity
+    time.sleep(0.06)
+    assert cache.get("b") is None       # expiry
+    cache.set("c", 3)
+    assert cache.delete("c") and not cache.delete("c")
+    assert dropped == [("a", 1), ("b", 2)]
+
+def test_shared_backend_across_instances(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    worker_a = create_cache("guard", 8, 60, backend="sqlite", path=path)
+    worker_b = create_cache("guard", 8, 60, backend="sqlite", path=path)
+    other = create_cache("other", 8, 60, backend="sqlite", path=path)
+
+    worker_a.set("q", {"allowed": False, "rule": "injection_0"})
+    assert worker_b.get("q") == {"allowed": False, "rule": "injection_0"}
+    assert worker_b.stats()["shared_hits"] == 1
+    assert worker_b.get("q") == {"allowed": False, "rule": "injection_0"}
+    assert worker_b.stats()["hits"] == 1
+    assert other.get("q") is None
+
+    worker_a.delete("q")
+    worker_b.clear()
+    assert worker_a.get("q") is None
+
+def test_shared_backend_expiry_and_prune(tmp_path):
+    backend = SQLiteCacheBackend(tmp_path / "cache.sqlite3", "ns", max_entries=3)
+    backend.set("old", 1, ttl_seconds=-1)
+    assert TTLCache(4, 60, backend=backend).get("old") is None
+    for i in range(10):
+        backend.set(str(i), i, ttl_seconds=60 + i)
+    backend._prune_locked()
+    rows = backend._conn.execute("SELECT key FROM cache ORDER BY key").fetchall()
+    assert [r[0] for r in rows] == ["7", "8", "9"]